@@ -0,0 +1,239 @@
+"""Inference backends for the sentiment model."""
+
+import inspect
+import json
+import os
+import threading
+
+from typing import Dict, List, Optional, Tuple
+
+
+BACKENDS: Tuple[str, ...] = ('torch', 'onnx')
+DEFAULT_BACKEND: str = os.environ.get('SENTIMENT_BACKEND') or 'torch'
+ONNX_MODEL_DIR: str = os.environ.get('ONNX_MODEL_DIR') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'twitter_tools', 'onnx'
+)
+BATCH_SIZE: int = 32
+
+_backends: Dict[Tuple[str, str, Optional[int]], object] = {}
+_backends_lock = threading.Lock()
+
+
+class TorchBackend():
+    """Full-precision PyTorch inference through tweetnlp."""
+
+    def __init__(self, model: str) -> None:
+        import tweetnlp
+
+        self.model_name = model
+        self.classifier = tweetnlp.load(model)
+        # tweetnlp >= 0.4 only returns probabilities when asked to.
+        self.return_probability = 'return_probability' in inspect.signature(
+            self.classifier.predict
+        ).parameters
+
+    def predict(self, tweets: List[str], batch_size: int = BATCH_SIZE) -> List[dict]:
+        if not tweets:
+            return []
+        if self.return_probability:
+            predictions = self.classifier.predict(
+                list(tweets), batch_size=batch_size, return_probability=True
+            )
+        else:
+            predictions = self.classifier.predict(list(tweets), batch_size=batch_size)
+        return [label_probability(prediction) for prediction in predictions]
+
+
+def label_probability(prediction: dict) -> dict:
+    """Reduce a tweetnlp prediction to its label and the label's probability.
+
+    tweetnlp < 0.4 returns the probability of the predicted label, later
+    versions the probability of every label.
+    """
+    probability = prediction['probability']
+    if isinstance(probability, dict):
+        probability = probability[prediction['label']]
+    return {'label': prediction['label'], 'probability': float(probability)}
+
+
+class OnnxBackend():
+    """Int8 dynamically quantized ONNX Runtime inference on CPU.
+
+    The model is exported from tweetnlp on first use and cached under
+    ``model_dir``; later workers only load the quantized graph and the
+    tokenizer, never the PyTorch weights.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        model_dir: str = ONNX_MODEL_DIR,
+        intra_op_threads: Optional[int] = None
+    ) -> None:
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        self.model_name = model
+        self.export_dir = os.path.join(model_dir, model)
+        if not os.path.exists(os.path.join(self.export_dir, 'model.int8.onnx')):
+            export_onnx(model, self.export_dir)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.export_dir)
+        self.preprocess = tweet_preprocessor()
+        with open(os.path.join(self.export_dir, 'labels.json')) as f:
+            labels = json.load(f)
+        self.id_to_label: Dict[str, str] = labels['id_to_label']
+        self.max_length: int = labels['max_length']
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(self.export_dir, 'model.int8.onnx'),
+            options,
+            providers=['CPUExecutionProvider']
+        )
+
+    def predict(self, tweets: List[str], batch_size: int = BATCH_SIZE) -> List[dict]:
+        import numpy as np
+
+        texts = [self.preprocess(tweet) for tweet in tweets]
+        predictions: List[dict] = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + batch_size],
+                max_length=self.max_length,
+                padding=True,
+                truncation=True,
+                return_tensors='np'
+            )
+            logits = self.session.run(
+                ['logits'],
+                {
+                    'input_ids': encoded['input_ids'].astype(np.int64),
+                    'attention_mask': encoded['attention_mask'].astype(np.int64),
+                }
+            )[0]
+            logits = logits - logits.max(axis=-1, keepdims=True)
+            probs = np.exp(logits)
+            probs /= probs.sum(axis=-1, keepdims=True)
+            for label_id, probability in zip(probs.argmax(-1), probs.max(-1)):
+                predictions.append(
+                    {
+                        'label': self.id_to_label[str(int(label_id))],
+                        'probability': float(probability)
+                    }
+                )
+        return predictions
+
+
+def tweet_preprocessor():
+    """tweetnlp's tweet normalisation, as applied before classification."""
+    try:
+        from tweetnlp.model_text_classification.model import preprocess
+    except ImportError:
+        from tweetnlp.util import get_preprocessor
+
+        preprocess = get_preprocessor()
+    return preprocess
+
+
+def export_onnx(model: str, export_dir: str) -> str:
+    """Export a tweetnlp classifier to ONNX and quantize it to int8."""
+    import torch
+    import tweetnlp
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(export_dir, exist_ok=True)
+    classifier = tweetnlp.load(model).model
+    classifier.model.to('cpu').eval()
+
+    fp32_path = os.path.join(export_dir, 'model.onnx')
+    int8_path = os.path.join(export_dir, 'model.int8.onnx')
+    sample = classifier.tokenizer(['export'], return_tensors='pt')
+    with torch.no_grad():
+        torch.onnx.export(
+            classifier.model,
+            (sample['input_ids'], sample['attention_mask']),
+            fp32_path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['logits'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'logits': {0: 'batch'},
+            },
+            opset_version=14,
+        )
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+
+    classifier.tokenizer.save_pretrained(export_dir)
+    with open(os.path.join(export_dir, 'labels.json'), 'w') as f:
+        json.dump(
+            {
+                'id_to_label': classifier.id_to_label,
+                'max_length': classifier.max_length
+            },
+            f
+        )
+    return int8_path
+
+
+def get_backend(
+    backend: Optional[str] = None,
+    model: str = "sentiment_multilingual",
+    intra_op_threads: Optional[int] = None
+):
+    """Return the process-wide instance of an inference backend."""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, choose from {BACKENDS}.")
+    if intra_op_threads is None and os.environ.get('ONNX_INTRA_OP_THREADS'):
+        intra_op_threads = int(os.environ['ONNX_INTRA_OP_THREADS'])
+
+    key = (backend, model, intra_op_threads if backend == 'onnx' else None)
+    if key not in _backends:
+        # Pipeline score workers ask for the backend concurrently; load
+        # the model once.
+        with _backends_lock:
+            if key not in _backends:
+                if backend == 'onnx':
+                    _backends[key] = OnnxBackend(model, intra_op_threads=intra_op_threads)
+                else:
+                    _backends[key] = TorchBackend(model)
+    return _backends[key]
+
+
+def check_parity(
+    tweets: List[str],
+    model: str = "sentiment_multilingual",
+    intra_op_threads: Optional[int] = None
+) -> Dict[str, float]:
+    """Compare ONNX predictions against the PyTorch path on ``tweets``."""
+    reference = get_backend('torch', model).predict(tweets)
+    candidate = get_backend('onnx', model, intra_op_threads).predict(tweets)
+
+    matches = [r['label'] == c['label'] for r, c in zip(reference, candidate)]
+    deltas = [
+        abs(r['probability'] - c['probability'])
+        for r, c in zip(reference, candidate)
+    ]
+    return {
+        'label_agreement': sum(matches) / len(matches) if matches else 1.0,
+        'max_probability_delta': max(deltas, default=0.0),
+        'mean_probability_delta': sum(deltas) / len(deltas) if deltas else 0.0,
+    }
+
+
+if __name__ == '__main__':
+    sample_tweets = [
+        "The new plan is great, the network has never been faster!",
+        "No signal for three days and customer care keeps hanging up.",
+        "Recharged my prepaid account today.",
+        "Servicio excelente, muy contento con la conexión.",
+        "Encore une panne, c'est inadmissible.",
+    ]
+    print(check_parity(sample_tweets))
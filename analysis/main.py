@@ -1,39 +1,129 @@
 import pandas as pd
-import tweetnlp
 
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from analysis.backends import get_backend
+from profiling.main import profiled
 
 def analyse(
     tweet_table: Dict[str, List[str]],
     exclude_handles: Optional[List[str]] = [],
     period: str = "day",
-    model: str = "sentiment_multilingual"
+    model: str = "sentiment_multilingual",
+    backend: Optional[str] = None,
+    intra_op_threads: Optional[int] = None
 ) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    return analyse_chunks(
+        [tweet_table],
+        exclude_handles=exclude_handles,
+        period=period,
+        model=model,
+        backend=backend,
+        intra_op_threads=intra_op_threads
+    )
 
-    tweet_df = pd.DataFrame(tweet_table)
-    tweet_df_filtered = remove_tweets_from_excluded_handles(tweet_df, exclude_handles)
 
-    model_xml = tweetnlp.load(model)
+def analyse_chunks(
+    tweet_tables: Iterable[Dict[str, List[str]]],
+    exclude_handles: Optional[List[str]] = [],
+    period: str = "day",
+    model: str = "sentiment_multilingual",
+    backend: Optional[str] = None,
+    intra_op_threads: Optional[int] = None
+) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """Score tweet tables one chunk at a time and resample the scores."""
+    _, y_1, y_2 = sentiment_tables(
+        tweet_tables,
+        exclude_handles=exclude_handles,
+        period=period,
+        model=model,
+        backend=backend,
+        intra_op_threads=intra_op_threads
+    )
+    return y_1.to_dict(), y_2.to_dict()
+
+
+@profiled("analyse")
+def sentiment_tables(
+    tweet_tables: Iterable[Dict[str, List[str]]],
+    exclude_handles: Optional[List[str]] = [],
+    period: str = "day",
+    model: str = "sentiment_multilingual",
+    backend: Optional[str] = None,
+    intra_op_threads: Optional[int] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Return the per-tweet scores and the resampled sentiment tables."""
+    model_xml = get_backend(backend, model, intra_op_threads)
+
+    scored = [
+        score_tweets(pd.DataFrame(tweet_table), model_xml, exclude_handles)
+        for tweet_table in tweet_tables
+    ]
+    if scored:
+        tweets = pd.concat(scored, ignore_index=True)
+    else:
+        tweets = pd.DataFrame(columns=SCORED_COLUMNS)
+
+    x = tweets.set_index(pd.DatetimeIndex(tweets.created_at))
+    x = x.select_dtypes(include=['number', 'bool'])
+    periods = {
+        'day': 'D',
+    }
+    binning_period = periods[period]
+    y_1 = x.resample(binning_period).mean()
+    y_2 = x.resample(binning_period).mean()
 
-    tweets = pd.DataFrame(tweet_df_filtered.tweet_text)
+    return tweets, y_1, y_2
 
-    sentiments = []
-    probabilities = []
-    for tweet in tweet_df_filtered.tweet_text:
-        prediction = model_xml.predict(tweet)
-        sentiments.append(prediction['label'])
-        probabilities.append(prediction['probability'])
 
-    tweet_df_filtered["sentiment"] = sentiments
-    tweet_df_filtered["probability"] = probabilities
+SCORED_COLUMNS: List[str] = [
+    'tweet_id',
+    'conversation_id',
+    'author_id',
+    'created_at',
+    'sentiment',
+    'probability',
+    'possibly_sensitive',
+    'retweet_count',
+    'reply_count',
+    'like_count',
+    'quote_count',
+    'lang',
+    'source',
+    'sentiment_score_1',
+    'sentiment_score_2',
+]
+
+
+SENTIMENT_VALUES: Dict[str, float] = {
+    'negative': -1.0,
+    'neutral': 0.0,
+    'positive': 1.0
+}
+
+
+def score_tweets(
+    tweet_df: pd.DataFrame,
+    model_xml,
+    exclude_handles: Optional[List[str]] = []
+) -> pd.DataFrame:
+    """Add per-tweet sentiment scores to a chunk of the Tweets table.
+
+    The tweet text is dropped from the result so that chunks read from the
+    database can be accumulated without holding every tweet in memory.
+    """
+    tweet_df_filtered = remove_tweets_from_excluded_handles(tweet_df, exclude_handles)
+
+    predictions = model_xml.predict(list(tweet_df_filtered.tweet_text))
+    sentiments = [prediction['label'] for prediction in predictions]
+    probabilities = [prediction['probability'] for prediction in predictions]
 
     tweets = tweet_df_filtered[
         [
+            'tweet_id',
+            'conversation_id',
             'author_id',
             'created_at',
-            'tweet_text',
-            'sentiment',
-            'probability',
             'possibly_sensitive',
             'retweet_count',
             'reply_count',
@@ -42,29 +132,45 @@ def analyse(
             'lang',
             'source'
         ]
-    ]
+    ].copy()
+    tweets["sentiment"] = sentiments
+    tweets["probability"] = probabilities
 
-    tweets['sentiment'] = tweets['sentiment'].map(
-        {
-            'negative': -1.0,
-            'neutral': 0.0,
-            'positive': 1.0
-        }
-    )
+    tweets['sentiment'] = tweets['sentiment'].map(SENTIMENT_VALUES)
 
     tweets['sentiment_score_1'] = tweets.sentiment * tweets.probability
 
     tweets['sentiment_score_2'] = tweets.sentiment * tweets.probability * (tweets.retweet_count + tweets.reply_count + tweets.like_count + tweets.quote_count + 1)
 
-    x = tweets.set_index(pd.DatetimeIndex(tweets.created_at))
-    periods = {
-        'day': 'D',
-    }
-    binning_period = periods[period]
-    y_1 = x.resample(binning_period).mean().to_dict()
-    y_2 = x.resample(binning_period).mean().to_dict()
+    return tweets[SCORED_COLUMNS]
 
-    return y_1, y_2
+
+def thread_rollup(
+    tweets: pd.DataFrame,
+    edges: Dict[str, object],
+    group_by: str = "conversation"
+) -> pd.DataFrame:
+    """Aggregate scored tweets per conversation or per root tweet.
+
+    ``edges`` maps tweet ids to their ThreadEdgeRow from the thread index;
+    tweets missing from the index fall back to their conversation.
+    """
+    key = {'conversation': 'conversation_id', 'root': 'root_tweet_id'}[group_by]
+    tweets = tweets.copy()
+    tweets[key] = [
+        getattr(edges.get(tweet_id), key, conversation_id)
+        for tweet_id, conversation_id in zip(tweets.tweet_id, tweets.conversation_id)
+    ]
+    tweets['engagement'] = tweets.retweet_count + tweets.reply_count + tweets.like_count + tweets.quote_count
+    return tweets.groupby(key).agg(
+        tweet_count=('tweet_id', 'count'),
+        sentiment=('sentiment', 'mean'),
+        sentiment_score_1=('sentiment_score_1', 'mean'),
+        sentiment_score_2=('sentiment_score_2', 'sum'),
+        engagement=('engagement', 'sum'),
+        first_tweet_at=('created_at', 'min'),
+        last_tweet_at=('created_at', 'max'),
+    ).reset_index()
 
 
 def remove_tweets_from_excluded_handles(
@@ -73,7 +179,7 @@ def remove_tweets_from_excluded_handles(
 ) -> pd.DataFrame:
     """Remove tweets from excluded handles from the Tweets table."""
     if excluded_handles:
-        tweet_df_filtered = tweets_table[tweets_table.author_id.isin(excluded_handles) is False]
+        tweet_df_filtered = tweets_table[~tweets_table.author_id.isin(excluded_handles)]
     else:
         tweet_df_filtered = tweets_table
     return tweet_df_filtered
@@ -4,3 +4,5 @@ from app import app
 from api.analyse import *
 from api.CRUD import *
 from api.scrape import *
+from api.search import *
+from api.trending import *
@@ -1,20 +1,92 @@
 """Endpoints for sentiment analysis."""
 
-from typing import Dict, List
+from fastapi import Request
+from typing import Dict, Iterable, List, Optional
 
 from app import app
 
-from api.analyse.schema import SentimentInput, SentimentOutput
+from api.analyse.schema import (
+    SentimentInput,
+    SentimentOutput,
+    ThreadSentimentInput,
+    ThreadSentimentOutput,
+)
+from api.formats import columnar_response
 
-from analysis.main import analyse
+
+def _tweet_tables(input: SentimentInput) -> Iterable[Dict[str, List[str]]]:
+    """Tweets from the request body, or the selected stored tweets in chunks."""
+    from database.database import read_tweets
+
+    if input.tweets is not None:
+        return [input.tweets]
+    tweet_ids = input.tweet_ids
+    if input.conversation_ids is not None or input.root_tweet_ids is not None:
+        from database.threads import thread_index
+
+        selected = set(tweet_ids or [])
+        selected |= thread_index.conversation(input.conversation_ids or [])
+        selected |= thread_index.thread(input.root_tweet_ids or [])
+        if not selected:
+            return []
+        tweet_ids = sorted(selected)
+    return read_tweets(
+        search_term=input.search_term,
+        start_time=input.start_time,
+        end_time=input.end_time,
+        tweet_ids=tweet_ids
+    )
 
 
 @app.post("/sentiment", response_model=SentimentOutput)
-def analyse_(input: SentimentInput):
-    """Estimate sentiments."""
-    results: Dict[str, List[str]] = analyse(
-        tweet_table=input.tweets,
+def analyse_(input: SentimentInput, request: Request, table: Optional[str] = None):
+    """Estimate sentiments.
+
+    Tweets are taken from the request body when given, otherwise they are
+    read from the database in chunks. The response format follows the
+    Accept header, see api.formats.
+    """
+    from analysis.main import sentiment_tables
+
+    tweet_sentiment_table, sentiment_table_1, sentiment_table_2 = sentiment_tables(
+        _tweet_tables(input),
         exclude_handles=input.exclude_handles,
-        period=input.period
+        period=input.period,
+        backend=input.backend
+    )
+    return columnar_response(
+        {
+            'tweet_sentiment_table': tweet_sentiment_table,
+            'sentiment_table_1': sentiment_table_1.reset_index(),
+            'sentiment_table_2': sentiment_table_2.reset_index(),
+        },
+        accept=request.headers.get('accept'),
+        accept_encoding=request.headers.get('accept-encoding'),
+        table=table
+    )
+
+
+@app.post("/sentiment/threads", response_model=ThreadSentimentOutput)
+def analyse_threads_(input: ThreadSentimentInput, request: Request):
+    """Roll sentiment and engagement up per conversation or root tweet."""
+    from analysis.main import sentiment_tables, thread_rollup
+    from database.threads import thread_index
+
+    tweet_sentiment_table, _, _ = sentiment_tables(
+        _tweet_tables(input),
+        exclude_handles=input.exclude_handles,
+        period=input.period,
+        backend=input.backend
+    )
+    edges = {}
+    if input.group_by == 'root':
+        edges = thread_index.edges(tweet_sentiment_table.tweet_id)
+    return columnar_response(
+        {
+            'thread_sentiment_table': thread_rollup(
+                tweet_sentiment_table, edges, input.group_by
+            ),
+        },
+        accept=request.headers.get('accept'),
+        accept_encoding=request.headers.get('accept-encoding')
     )
-    return {'tweets': results}
@@ -1,16 +1,48 @@
 """Input/Output schema for /sentiment endpoint."""
 
-from pydantic import BaseModel
-from typing import Dict, List, Optional
+import datetime
+
+from pydantic import BaseModel, root_validator
+from typing import Dict, List, Literal, Optional
 
 
 class SentimentInput(BaseModel):
-    """API model for Sentiment input."""
+    """API model for Sentiment input.
+
+    Either ship the tweets table in ``tweets`` or select stored tweets with
+    ``search_term``, ``start_time``/``end_time``, ``tweet_ids``,
+    ``conversation_ids`` and ``root_tweet_ids``.
+    """
 
-    tweets: Dict[str, List[str]]
+    tweets: Optional[Dict[str, List[str]]] = None
+    search_term: Optional[str] = None
+    start_time: Optional[datetime.datetime] = None
+    end_time: Optional[datetime.datetime] = None
+    tweet_ids: Optional[List[str]] = None
+    conversation_ids: Optional[List[str]] = None
+    root_tweet_ids: Optional[List[str]] = None
     exclude_handles: Optional[List[str]]
     period: Optional[str] = 'day'
     multi_language: bool = True
+    backend: Optional[Literal['torch', 'onnx']] = None
+
+    @root_validator(skip_on_failure=True)
+    def check_tweet_selection(cls, values):
+        selection = (
+            'tweets',
+            'search_term',
+            'start_time',
+            'end_time',
+            'tweet_ids',
+            'conversation_ids',
+            'root_tweet_ids',
+        )
+        if all(values.get(field) is None for field in selection):
+            raise ValueError(
+                "Provide tweets or a search_term, time range, tweet, conversation "
+                "or root tweet selection."
+            )
+        return values
 
 
 class SentimentOutput(BaseModel):
@@ -19,3 +51,15 @@ class SentimentOutput(BaseModel):
     tweet_sentiment_table: Dict[str, List[str]]
     sentiment_table_1: Dict[str, List[str]]
     sentiment_table_2: Dict[str, List[str]]
+
+
+class ThreadSentimentInput(SentimentInput):
+    """API model for thread-level Sentiment input."""
+
+    group_by: Literal['conversation', 'root'] = 'conversation'
+
+
+class ThreadSentimentOutput(BaseModel):
+    """API model for thread-level Sentiment output."""
+
+    thread_sentiment_table: Dict[str, List[str]]
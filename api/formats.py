@@ -0,0 +1,171 @@
+"""Content negotiation for columnar endpoint responses.
+
+Tables are column dictionaries (``Dict[str, List]``) or pandas DataFrames.
+They are written straight to the negotiated format, without validating each
+cell against the endpoint's response model:
+
+- ``application/vnd.apache.arrow.stream``: Arrow IPC stream of one table.
+- ``application/vnd.apache.parquet``: Parquet file of one table.
+- anything else: JSON object holding every table.
+
+JSON and Arrow bodies are compressed with zstd or gzip when the client
+accepts it.
+"""
+
+import datetime
+import gzip
+import io
+import json
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from typing import Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+ARROW_MEDIA_TYPE: str = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE: str = "application/vnd.apache.parquet"
+JSON_MEDIA_TYPE: str = "application/json"
+MIN_COMPRESS_SIZE: int = 1024
+
+
+def columnar_response(
+    tables: Dict[str, object],
+    accept: Optional[str] = None,
+    accept_encoding: Optional[str] = None,
+    table: Optional[str] = None
+) -> Response:
+    """Serialise ``tables`` to the media type requested in ``accept``.
+
+    Binary formats carry a single table, chosen with ``table`` and
+    defaulting to the first one.
+    """
+    accept = accept or ""
+    if ARROW_MEDIA_TYPE in accept or PARQUET_MEDIA_TYPE in accept:
+        name = table or next(iter(tables))
+        if name not in tables:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown table {name!r}, choose from {list(tables)}."
+            )
+        arrow_table = to_arrow(tables[name])
+        if ARROW_MEDIA_TYPE in accept:
+            body, media_type = to_arrow_ipc(arrow_table), ARROW_MEDIA_TYPE
+        else:
+            return Response(
+                content=to_parquet(arrow_table),
+                media_type=PARQUET_MEDIA_TYPE,
+                headers={"Vary": "Accept, Accept-Encoding"}
+            )
+    else:
+        body, media_type = to_json(tables), JSON_MEDIA_TYPE
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    body, encoding = compress(body, accept_encoding)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def to_columns(table) -> Dict[str, List]:
+    """Return a table as plain column lists, with missing values as None."""
+    if isinstance(table, dict):
+        return table
+    return {
+        str(column): table[column].astype(object).where(table[column].notna(), None).tolist()
+        for column in table.columns
+    }
+
+
+def to_arrow(table):
+    import pyarrow as pa
+
+    if isinstance(table, dict):
+        return pa.table(table)
+    return pa.Table.from_pandas(table, preserve_index=False)
+
+
+def to_arrow_ipc(arrow_table) -> bytes:
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table)
+    return sink.getvalue().to_pybytes()
+
+
+def to_parquet(arrow_table) -> bytes:
+    import pyarrow.parquet as pq
+
+    sink = io.BytesIO()
+    pq.write_table(arrow_table, sink, compression="zstd")
+    return sink.getvalue()
+
+
+def to_json(tables: Dict[str, object]) -> bytes:
+    payload = {name: to_columns(table) for name, table in tables.items()}
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default)
+    return json.dumps(payload, default=_json_default).encode("utf-8")
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def compress(body: bytes, accept_encoding: Optional[str]):
+    """Compress ``body`` with the encoding the client prefers.
+
+    Codings are ranked by their q-value, zstd before gzip on ties; those
+    with ``q=0`` are refused.
+    """
+    if len(body) < MIN_COMPRESS_SIZE:
+        return body, None
+    weights = accepted_encodings(accept_encoding)
+    available = ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+    ranked = sorted(
+        (coding for coding in available if weights.get(coding, weights.get("*", 0)) > 0),
+        key=lambda coding: weights.get(coding, weights.get("*", 0)),
+        reverse=True
+    )
+    if not ranked:
+        return body, None
+    if ranked[0] == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body), "zstd"
+    return gzip.compress(body, compresslevel=5), "gzip"
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """Content coding -> q-value of an Accept-Encoding header.
+
+    Codings without a q parameter weigh 1; malformed q-values make the
+    coding unacceptable.
+    """
+    weights: Dict[str, float] = {}
+    for item in (accept_encoding or "").split(","):
+        coding, *parameters = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        weight = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+    return weights
@@ -1,15 +1,55 @@
 """Endpoints for scraping."""
-from typing import Dict, List
+from fastapi import Request
+from typing import Dict, List, Optional
 
 from app import app
 
-from api.scrape.schema import ScrapeInput, ScrapeOutput
-
-from scrape.main import scrape
+from api.formats import columnar_response
+from api.scrape.schema import (
+    MultiScrapeInput,
+    MultiScrapeOutput,
+    PipelineInput,
+    PipelineOutput,
+    ScrapeInput,
+    ScrapeOutput,
+)
 
 
 @app.post("/scrape", response_model=ScrapeOutput)
-def scrape_(input: ScrapeInput):
+def scrape_(input: ScrapeInput, request: Request, table: Optional[str] = None):
     """Scrape tweets using Twitter api."""
+    from scrape.main import scrape
+
     results: Dict[str, List[str]] = scrape(search_term=input.search_string)
-    return {'tweets': results}
+    return columnar_response(
+        {'tweets': results},
+        accept=request.headers.get('accept'),
+        accept_encoding=request.headers.get('accept-encoding'),
+        table=table
+    )
+
+
+@app.post("/scrape/multi", response_model=MultiScrapeOutput)
+def scrape_many_(input: MultiScrapeInput, request: Request, table: Optional[str] = None):
+    """Scrape tweets for several search terms concurrently."""
+    from scrape.main import scrape_many
+
+    results: Dict[str, Dict[str, List[str]]] = scrape_many(
+        input.search_strings,
+        max_workers=input.max_workers
+    )
+    return columnar_response(
+        results,
+        accept=request.headers.get('accept'),
+        accept_encoding=request.headers.get('accept-encoding'),
+        table=table
+    )
+
+
+@app.post("/scrape/pipeline", response_model=PipelineOutput)
+def scrape_pipeline_(input: PipelineInput):
+    """Scrape, score and store tweets with overlapping pipeline stages."""
+    from scrape.pipeline import run_pipeline
+
+    options = input.model_dump(exclude={'search_strings'}, exclude_none=True)
+    return run_pipeline(input.search_strings, **options)
@@ -1,7 +1,7 @@
 """Input/Output schema for /scrape endpoint."""
 
 from pydantic import BaseModel
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 
 
 class ScrapeInput(BaseModel):
@@ -27,3 +27,43 @@ class ScrapeOutput(BaseModel):
     # user_description_hashtags: Dict[str, List[str]]
     # user_description_mentions: Dict[str, List[str]]
     # user_description_url: Dict[str, List[str]]
+
+
+class MultiScrapeInput(BaseModel):
+    """API model for multi-term Scrape input."""
+
+    search_strings: List[str]
+    max_workers: Optional[int] = None
+
+
+class MultiScrapeOutput(BaseModel):
+    """API model for multi-term Scrape output."""
+
+    tweets: Dict[str, List[str]]
+    tweet_search_terms: Dict[str, List[str]]
+
+
+class PipelineInput(BaseModel):
+    """API model for pipelined Scrape input; unset sizes use the defaults."""
+
+    search_strings: List[str]
+    fetch_workers: Optional[int] = None
+    normalise_workers: Optional[int] = None
+    score_workers: Optional[int] = None
+    store_workers: Optional[int] = None
+    queue_size: Optional[int] = None
+    score: bool = True
+    backend: Optional[Literal['torch', 'onnx']] = None
+
+
+class PipelineOutput(BaseModel):
+    """API model for pipelined Scrape output."""
+
+    search_terms: List[str]
+    pages: int
+    tweets: int
+    users: int
+    scored: int
+    elapsed_seconds: float
+    busy_seconds: Dict[str, float]
+    workers: Dict[str, int]
@@ -0,0 +1,48 @@
+"""Endpoint for full-text search over stored tweets."""
+
+import datetime
+
+from fastapi import Query, Request
+from typing import Optional
+
+from app import app
+
+from api.formats import columnar_response
+from api.search.schema import SearchOutput
+
+
+@app.get("/search", response_model=SearchOutput)
+def search_(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    search_term: Optional[str] = None,
+    start_time: Optional[datetime.datetime] = None,
+    end_time: Optional[datetime.datetime] = None,
+    lang: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    table: Optional[str] = None
+):
+    """Search stored tweets without calling the Twitter API.
+
+    Results are ranked best match first; page through them with ``limit``
+    and ``offset``.
+    """
+    from database.search import search_tweets
+
+    return columnar_response(
+        {
+            'tweets': search_tweets(
+                q,
+                search_term=search_term,
+                start_time=start_time,
+                end_time=end_time,
+                lang=lang,
+                limit=limit,
+                offset=offset
+            ),
+        },
+        accept=request.headers.get('accept'),
+        accept_encoding=request.headers.get('accept-encoding'),
+        table=table
+    )
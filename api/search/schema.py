@@ -0,0 +1,10 @@
+"""Input/Output schema for /search endpoint."""
+
+from pydantic import BaseModel
+from typing import Dict, List
+
+
+class SearchOutput(BaseModel):
+    """API model for Search output."""
+
+    tweets: Dict[str, List[str]]
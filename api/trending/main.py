@@ -0,0 +1,37 @@
+"""Endpoints for trending hashtags, mentions and annotations."""
+
+import datetime
+
+from fastapi import Query, Request
+from typing import Literal, Optional
+
+from app import app
+
+from api.formats import columnar_response
+from api.trending.schema import TrendingOutput
+
+
+@app.get("/trending", response_model=TrendingOutput)
+def trending_(
+    request: Request,
+    search_term: str,
+    kind: Literal['hashtag', 'mention', 'annotation'] = 'hashtag',
+    k: int = Query(10, ge=1),
+    start_time: Optional[datetime.datetime] = None,
+    end_time: Optional[datetime.datetime] = None
+):
+    """Most frequent items for a search term, from the streaming counters."""
+    from database.trending import trend_counters
+
+    top = trend_counters.top(search_term, kind, k, start_time, end_time)
+    return columnar_response(
+        {
+            'trending': {
+                'item': [item for item, _, _ in top],
+                'count': [count for _, count, _ in top],
+                'error': [error for _, _, error in top],
+            },
+        },
+        accept=request.headers.get('accept'),
+        accept_encoding=request.headers.get('accept-encoding')
+    )
@@ -0,0 +1,10 @@
+"""Input/Output schema for /trending endpoint."""
+
+from pydantic import BaseModel
+from typing import Dict, List
+
+
+class TrendingOutput(BaseModel):
+    """API model for Trending output."""
+
+    trending: Dict[str, List[str]]
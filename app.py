@@ -1,11 +1,23 @@
-"""FastAPI server."""
+"""FastAPI server.
+
+Heavy dependencies (pandas, tweetnlp, SQLAlchemy engine) are imported by the
+endpoints on first use, so importing this module and forking workers stays
+cheap. The database is connected per process in the startup hook.
+"""
+
+import time
+
+_import_started: float = time.perf_counter()
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
 from typing import Dict, List
 
+from profiling.main import PROFILE_REQUESTS, ProfileRun
+
 
 tags_metadata: List[Dict[str, str]] = [
     {
@@ -16,6 +28,14 @@ tags_metadata: List[Dict[str, str]] = [
         "name": "estimate_sentiments",
         "description": "Estimate sentiment score.",
     },
+    {
+        "name": "search",
+        "description": "Full-text search over stored tweets.",
+    },
+    {
+        "name": "trending",
+        "description": "Trending hashtags, mentions and annotations.",
+    },
 ]
 
 app: FastAPI = FastAPI(
@@ -45,6 +65,36 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Profile requests sent with ``X-Profile: 1`` when PROFILE_REQUESTS is set."""
+    if not PROFILE_REQUESTS or request.headers.get("x-profile", "").lower() not in ("1", "true", "yes"):
+        return await call_next(request)
+    # Snapshots and writing the artifacts block, keep them off the event loop.
+    run = ProfileRun(label=f"{request.method} {request.url.path}")
+    await run_in_threadpool(run.start)
+    try:
+        with run.active():
+            response = await call_next(request)
+    finally:
+        await run_in_threadpool(run.finish)
+    response.headers["X-Profile-Run"] = run.run_id
+    return response
+
+
+@app.on_event("startup")
+def startup() -> None:
+    """Connect to the database and check the schema in this worker."""
+    from database.database import init_database
+
+    started = time.perf_counter()
+    init_database()
+    print(
+        f"Imported app in {import_time:.3f}s, "
+        f"initialised database in {time.perf_counter() - started:.3f}s."
+    )
+
+
 @app.get("/")
 def home():
     """Home route."""
@@ -52,6 +102,10 @@ def home():
 
 from api.scrape.main import scrape_
 from api.analyse.main import analyse_
+from api.search.main import search_
+from api.trending.main import trending_
+
+import_time: float = time.perf_counter() - _import_started
 
 
 if __name__ == "__main__":
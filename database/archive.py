@@ -0,0 +1,329 @@
+"""Monthly archival of cold tweets to compressed Parquet.
+
+Tweets are partitioned by the calendar month of ``created_at``. Months
+older than ``RETENTION_MONTHS`` are moved out of the database by
+``archive_cold_data``: every table holding per-tweet rows (``tweet_table``
+and the tables referencing it) is written to
+``ARCHIVE_DIR/<table>/<YYYY-MM>/part-<n>.parquet``, and the transaction
+that deletes the rows lists the parts in ``archive_parts``. The database
+therefore only holds the hot months, so inserts, index maintenance and
+recent-window queries do not slow down as history accumulates.
+
+``read_archived_tweets`` reads the archived months back for
+``database.database.read_tweets``, so the analysis path sees one table.
+Users and scrape checkpoints are not time-based and stay in the database;
+the full-text index and the thread index only cover hot months.
+
+Run the job with ``python -m database.archive``.
+"""
+
+import datetime
+import os
+import time
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, Table, delete, func, insert, select
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from database.models import ArchivePart, Base, Tweet, TweetSearchTerm
+
+
+ARCHIVE_DIR: str = os.environ.get('ARCHIVE_DIR') or 'archive'
+RETENTION_MONTHS: int = int(os.environ.get('RETENTION_MONTHS') or 6)
+
+
+def tweet_tables() -> List[Tuple[Table, str]]:
+    """(table, tweet id column) of tweet_table and every table referencing it."""
+    tables = [(Tweet.__table__, 'tweet_id')]
+    for table in Base.metadata.sorted_tables:
+        for foreign_key in table.foreign_keys:
+            if foreign_key.target_fullname == 'tweet_table.tweet_id':
+                tables.append((table, foreign_key.parent.name))
+    return tables
+
+
+def month_start(moment: datetime.datetime, months_back: int = 0) -> datetime.datetime:
+    """First instant of the month ``months_back`` months before ``moment``."""
+    index = moment.year * 12 + moment.month - 1 - months_back
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+def month_key(moment: datetime.datetime) -> str:
+    return moment.strftime('%Y-%m')
+
+
+def archived_months(archive_dir: str = ARCHIVE_DIR) -> List[str]:
+    """Months ('YYYY-MM') with archived tweets."""
+    return list(archived_parts(archive_dir))
+
+
+def archive_cold_data(
+    retention_months: int = RETENTION_MONTHS,
+    archive_dir: str = ARCHIVE_DIR,
+    now: Optional[datetime.datetime] = None,
+    vacuum: bool = False
+) -> Dict[str, Dict[str, int]]:
+    """Move every month older than ``retention_months`` to Parquet.
+
+    Returns the archived row counts per month and table.
+    """
+    from database.database import get_engine, session_scope
+
+    cutoff = month_start(now or datetime.datetime.now(), retention_months)
+    with session_scope() as session:
+        oldest = session.execute(
+            select(func.min(Tweet.created_at)).where(Tweet.created_at < cutoff)
+        ).scalar()
+    archived: Dict[str, Dict[str, int]] = {}
+    if oldest is not None:
+        start = month_start(oldest)
+        while start < cutoff:
+            end = month_start(start, -1)
+            counts = archive_month(start, end, archive_dir)
+            if counts:
+                archived[month_key(start)] = counts
+                print(f"Archived {month_key(start)}: {counts[Tweet.__tablename__]} tweets.")
+            start = end
+
+    engine = get_engine()
+    if vacuum and archived and engine.dialect.name == 'sqlite':
+        from database.search import rebuild_search_index
+
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.exec_driver_sql('VACUUM')
+            rebuild_search_index(connection)
+    return archived
+
+
+def archive_month(
+    start: datetime.datetime,
+    end: datetime.datetime,
+    archive_dir: str = ARCHIVE_DIR,
+    chunk_size: Optional[int] = None
+) -> Dict[str, int]:
+    """Archive the tweets created in [start, end) and delete them.
+
+    Each table is streamed into its part chunk_size rows at a time, one row
+    group per chunk. The parts are listed in ``archive_parts`` by the
+    transaction that deletes the archived rows, and readers only see listed
+    parts, so a month is either in the database or in the archive. Parts
+    left behind by an interrupted run are removed by the next one.
+    """
+    from database.database import READ_CHUNK_SIZE, get_engine
+
+    chunk_size = chunk_size or READ_CHUNK_SIZE
+    month = month_key(start)
+    remove_orphan_parts(month, archive_dir)
+    engine = get_engine()
+    # The deletes must match the rows that were read; Postgres' default
+    # read committed would also delete rows committed in between.
+    options = {'isolation_level': 'REPEATABLE READ'} if engine.dialect.name == 'postgresql' else {}
+    in_month = (Tweet.created_at >= start, Tweet.created_at < end)
+    month_tweet_ids = select(Tweet.tweet_id).where(*in_month)
+    tables = [
+        (table, in_month if table is Tweet.__table__ else (table.c[column].in_(month_tweet_ids),))
+        for table, column in tweet_tables()
+    ]
+    counts: Dict[str, int] = {}
+    parts = []
+    try:
+        with engine.connect().execution_options(**options) as connection:
+            with connection.begin():
+                for table, where in tables:
+                    path, rows = _write_part(connection, table, where, archive_dir, month, chunk_size)
+                    counts[table.name] = rows
+                    if path is not None:
+                        parts.append({
+                            'path': os.path.relpath(path, archive_dir),
+                            'table_name': table.name,
+                            'month': month,
+                            'rows': rows,
+                            'created_at': datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None),
+                        })
+                if not counts[Tweet.__tablename__]:
+                    return {}
+                # Children first so foreign keys hold throughout.
+                for table, where in reversed(tables):
+                    connection.execute(delete(table).where(*where))
+                connection.execute(insert(ArchivePart.__table__), parts)
+    except BaseException:
+        remove_orphan_parts(month, archive_dir)
+        raise
+    return counts
+
+
+def archived_parts(archive_dir: str = ARCHIVE_DIR, table_name: str = Tweet.__tablename__) -> Dict[str, List[str]]:
+    """Paths of the archived parts of ``table_name`` by month ('YYYY-MM')."""
+    from database.database import session_scope
+
+    with session_scope() as session:
+        rows = session.execute(
+            select(ArchivePart.month, ArchivePart.path)
+            .where(ArchivePart.table_name == table_name)
+            .order_by(ArchivePart.month, ArchivePart.path)
+        ).all()
+    parts: Dict[str, List[str]] = {}
+    for month, path in rows:
+        parts.setdefault(month, []).append(os.path.join(archive_dir, path))
+    return parts
+
+
+def remove_orphan_parts(month: str, archive_dir: str = ARCHIVE_DIR) -> List[str]:
+    """Remove the month's part files not listed in ``archive_parts``.
+
+    They were written by a run whose transaction did not commit, so their
+    rows are still in the database.
+    """
+    listed = {
+        path
+        for table, _ in tweet_tables()
+        for path in archived_parts(archive_dir, table.name).get(month, [])
+    }
+    removed = []
+    for table, _ in tweet_tables():
+        directory = os.path.join(archive_dir, table.name, month)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith('.parquet') and path not in listed:
+                os.remove(path)
+                removed.append(path)
+    return removed
+
+
+def read_archived_tweets(
+    columns: List[str],
+    search_term: Optional[str] = None,
+    start_time: Optional[datetime.datetime] = None,
+    end_time: Optional[datetime.datetime] = None,
+    tweet_ids: Optional[List[str]] = None,
+    chunk_size: int = 5000,
+    archive_dir: str = ARCHIVE_DIR
+) -> Iterator[Dict[str, List]]:
+    """Yield archived tweets matching the filters, month by month, as
+    column dictionaries of at most chunk_size rows."""
+    if tweet_ids is not None and not tweet_ids:
+        return
+    parts = archived_parts(archive_dir)
+    if not parts:
+        return
+    term_parts = archived_parts(archive_dir, TweetSearchTerm.__tablename__) if search_term is not None else {}
+    import pyarrow.parquet as pq
+
+    # Stored timestamps are naive, compare wall-clock times like the
+    # database does.
+    start_time = start_time.replace(tzinfo=None) if start_time is not None else None
+    end_time = end_time.replace(tzinfo=None) if end_time is not None else None
+    filters = []
+    if start_time is not None:
+        filters.append(('created_at', '>=', start_time))
+    if end_time is not None:
+        filters.append(('created_at', '<', end_time))
+    if tweet_ids is not None:
+        filters.append(('tweet_id', 'in', list(tweet_ids)))
+
+    for month, paths in parts.items():
+        first = datetime.datetime.strptime(month, '%Y-%m')
+        if end_time is not None and first >= end_time:
+            continue
+        if start_time is not None and month_start(first, -1) <= start_time:
+            continue
+        month_filters = [filters] if filters else None
+        if search_term is not None:
+            # Like read_tweets: the tweet's first term, or any term recorded
+            # in the month's archived tweet_search_terms.
+            month_filters = [filters + [('search_term', '==', search_term)]]
+            matched = _matched_tweet_ids(term_parts.get(month, []), search_term)
+            if matched:
+                month_filters.append(filters + [('tweet_id', 'in', matched)])
+        table = pq.read_table(paths, columns=columns, filters=month_filters)
+        if table.num_rows:
+            table = table.sort_by('created_at')
+            for batch in table.to_batches(max_chunksize=chunk_size):
+                yield {column: batch.column(column).to_pylist() for column in columns}
+
+
+def _matched_tweet_ids(paths: List[str], search_term: str) -> List[str]:
+    """Ids of the archived tweets ``search_term`` found, from tweet_search_terms parts."""
+    if not paths:
+        return []
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(paths, columns=['tweet_id'], filters=[('search_term', '==', search_term)])
+    return sorted(set(table.column('tweet_id').to_pylist()))
+
+
+def _write_part(connection, table: Table, where, archive_dir: str, month: str, chunk_size: int):
+    """Stream the rows of ``table`` matching ``where`` into a new part.
+
+    Returns the part's path, or None when no row matched, and the row count.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(table)
+    result = connection.execution_options(yield_per=chunk_size).execute(
+        select(table).where(*where)
+    )
+    path = None
+    writer = None
+    rows = 0
+    try:
+        for partition in result.partitions():
+            if writer is None:
+                path = _part_path(archive_dir, table.name, month)
+                writer = pq.ParquetWriter(path, schema, compression='zstd')
+            writer.write_table(pa.table(
+                {name: [row[i] for row in partition] for i, name in enumerate(schema.names)},
+                schema=schema
+            ))
+            rows += len(partition)
+    finally:
+        if writer is not None:
+            writer.close()
+    if path is not None:
+        # The part must be on disk before the transaction listing it commits.
+        with open(path, 'rb') as part:
+            os.fsync(part.fileno())
+    return path, rows
+
+
+def _arrow_schema(table: Table):
+    """Arrow schema of ``table``; parts of one month must share it."""
+    import pyarrow as pa
+
+    fields = []
+    for column in table.columns:
+        if isinstance(column.type, Boolean):
+            type_ = pa.bool_()
+        elif isinstance(column.type, Integer):
+            type_ = pa.int64()
+        elif isinstance(column.type, Float):
+            type_ = pa.float64()
+        elif isinstance(column.type, DateTime):
+            type_ = pa.timestamp('us')
+        else:
+            type_ = pa.string()
+        fields.append(pa.field(column.name, type_))
+    return pa.schema(fields)
+
+
+def _part_path(archive_dir: str, table_name: str, month: str) -> str:
+    directory = os.path.join(archive_dir, table_name, month)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"part-{time.time_ns()}.parquet")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--retention-months', type=int, default=RETENTION_MONTHS)
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR)
+    parser.add_argument('--vacuum', action='store_true')
+    arguments = parser.parse_args()
+    print(archive_cold_data(
+        retention_months=arguments.retention_months,
+        archive_dir=arguments.archive_dir,
+        vacuum=arguments.vacuum
+    ))
@@ -0,0 +1,91 @@
+"""Cross-scrape cache of user profiles.
+
+Prolific accounts show up in the ``includes`` of nearly every scrape. The
+cache remembers, per ``user_id``, a hash of the profile and when it was
+last written, so DataBaseModel can skip users that are unchanged and were
+written within ``USER_CACHE_TTL`` seconds. Public metrics (followers,
+tweet count, ...) are left out of the hash: they change constantly and are
+refreshed once the TTL expires.
+
+Lookups hit an in-process LRU first and fall back to the ``users`` table.
+"""
+
+import collections
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+
+from typing import Dict, Iterable, Optional, Tuple
+
+
+USER_CACHE_TTL: float = float(os.environ.get('USER_CACHE_TTL') or 24 * 60 * 60)
+USER_CACHE_SIZE: int = int(os.environ.get('USER_CACHE_SIZE') or 100000)
+
+
+def profile_hash(user: dict) -> str:
+    """Hash a raw API user object, ignoring its public metrics."""
+    profile = {key: value for key, value in user.items() if key != 'public_metrics'}
+    return hashlib.sha1(
+        json.dumps(profile, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+
+
+class UserCache():
+    """LRU of user_id -> (profile hash, time written), backed by the users table."""
+
+    def __init__(
+        self,
+        ttl: float = USER_CACHE_TTL,
+        max_size: int = USER_CACHE_SIZE,
+        use_database: bool = True
+    ) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.use_database = use_database
+        self._entries: "collections.OrderedDict[str, Tuple[str, float]]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def prefetch(self, user_ids: Iterable[str]) -> None:
+        """Load entries missing from the LRU from the users table in one query."""
+        if not self.use_database:
+            return
+        with self._lock:
+            missing = [user_id for user_id in set(user_ids) if user_id not in self._entries]
+        if not missing:
+            return
+        from database.database import read_user_fingerprints
+
+        self.store(read_user_fingerprints(missing))
+
+    def is_fresh(self, user_id: str, hash_: str) -> bool:
+        """True when the stored profile matches ``hash_`` and is within the TTL."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return False
+            self._entries.move_to_end(user_id)
+        stored_hash, written_at = entry
+        return stored_hash == hash_ and time.time() - written_at < self.ttl
+
+    def store(self, fingerprints: Dict[str, Tuple[Optional[str], Optional[datetime.datetime]]]) -> None:
+        """Record user_id -> (profile hash, updated_at) pairs."""
+        with self._lock:
+            for user_id, (hash_, updated_at) in fingerprints.items():
+                if hash_ is None or updated_at is None:
+                    continue
+                if updated_at.tzinfo is None:
+                    updated_at = updated_at.replace(tzinfo=datetime.timezone.utc)
+                self._entries[user_id] = (hash_, updated_at.timestamp())
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
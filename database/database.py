@@ -1,26 +1,492 @@
+import contextlib
+import datetime
 import os
+import threading
+import time
 
+from sqlalchemy import bindparam, delete, event, exists, insert, inspect, or_, select, update
+from sqlalchemy.exc import OperationalError, ProgrammingError
 from sqlalchemy.future import create_engine
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
 from dotenv import load_dotenv
-from database.models import Base
+from database.archive import read_archived_tweets
+from database.cache import user_cache
+from database.models import (
+    ROW_MODELS,
+    Base,
+    ConversationIndex,
+    ScrapeCheckpoint,
+    Tweet,
+    TweetSearchTerm,
+    User,
+    UserDescription_URL,
+    UserDescription_hashtag,
+    UserDescription_mention,
+)
+from database.rows import (
+    ScrapeCheckpointRow,
+    ThreadEdgeRow,
+    TweetRow,
+    TweetSearchTermRow,
+    UserRow,
+)
+from database.search import create_search_index
+from database.trending import rebuild_trends, trend_counters
+from profiling.main import profiled
 
 
 class Database:
     def __init__(self, objects) -> None:
         self.objects = objects
 
+    @profiled("commit")
     def commit_data(self) -> None:
-        for item_list in self.objects:
-            session.add_all(item_list)
+        """Write the row lists, in order, in one transaction.
+
+        Lists of ``database.rows`` tuples are written with one executemany
+        Core insert each; lists of ORM objects are added to the session.
+        Tweets that are already stored are skipped with their child rows,
+        so writing a re-fetched page is harmless. Users are upserted,
+        replacing their description entities. The trend counters are
+        updated in the same transaction, and the user cache learns about
+        the new users once it has committed.
+        """
+        written_users: List[UserRow] = []
+        with session_scope() as session:
+            objects = drop_stored_tweets(session, self.objects)
+            for item_list in objects:
+                if not item_list:
+                    continue
+                model = ROW_MODELS.get(type(item_list[0]))
+                if model is None:
+                    session.add_all(item_list)
+                    session.flush()
+                elif model is User:
+                    upsert_users(session, item_list)
+                    written_users += item_list
+                else:
+                    session.execute(
+                        insert(model.__table__),
+                        [row._asdict() for row in item_list]
+                    )
+            trend_counters.add_tables(objects, session)
+        user_cache.store(
+            {user.user_id: (user.profile_hash, user.updated_at) for user in written_users}
+        )
+
+
+def drop_stored_tweets(session: Session, objects: List[list]) -> List[list]:
+    """Remove the rows of tweets (and tweet/term matches) already stored."""
+    tweet_ids = [
+        row.tweet_id
+        for item_list in objects if item_list and isinstance(item_list[0], TweetRow)
+        for row in item_list
+    ]
+    stored: Set[str] = set()
+    matched: Set[Tuple[str, str]] = set()
+    for start in range(0, len(tweet_ids), READ_CHUNK_SIZE):
+        chunk = tweet_ids[start:start + READ_CHUNK_SIZE]
+        stored.update(session.execute(
+            select(Tweet.tweet_id).where(Tweet.tweet_id.in_(chunk))
+        ).scalars())
+    if not stored:
+        return objects
+    stored_ids = list(stored)
+    for start in range(0, len(stored_ids), READ_CHUNK_SIZE):
+        matched.update(session.execute(
+            select(TweetSearchTerm.tweet_id, TweetSearchTerm.search_term).where(
+                TweetSearchTerm.tweet_id.in_(stored_ids[start:start + READ_CHUNK_SIZE])
+            )
+        ).tuples())
+
+    kept: List[list] = []
+    for item_list in objects:
+        if not item_list or not isinstance(item_list[0], tuple):
+            kept.append(item_list)
+        elif isinstance(item_list[0], TweetSearchTermRow):
+            kept.append([
+                row for row in item_list
+                if (row.tweet_id, row.search_term) not in matched
+            ])
+        elif 'originating_tweet_id' in item_list[0]._fields:
+            kept.append([row for row in item_list if row.originating_tweet_id not in stored])
+        elif 'tweet_id' in item_list[0]._fields:
+            kept.append([row for row in item_list if row.tweet_id not in stored])
+        else:
+            kept.append(item_list)
+    return kept
+
+
+def upsert_users(session: Session, users: List[UserRow]) -> None:
+    """Insert users or overwrite the stored profile of existing ones.
+
+    The description URL/hashtag/mention rows of these users are deleted,
+    since the caller writes the current ones in the same transaction.
+    """
+    user_ids = [user.user_id for user in users]
+    for start in range(0, len(user_ids), READ_CHUNK_SIZE):
+        chunk = user_ids[start:start + READ_CHUNK_SIZE]
+        for model in (UserDescription_URL, UserDescription_hashtag, UserDescription_mention):
+            session.execute(delete(model.__table__).where(model.user_id.in_(chunk)))
+
+    values = [user._asdict() for user in users]
+    dialect = session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(User.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={
+                column: statement.excluded[column]
+                for column in UserRow._fields if column != 'user_id'
+            }
+        )
+        session.execute(statement, values)
+    else:
+        update_or_insert_users(session, values)
+
+
+def update_or_insert_users(session: Session, values: List[dict]) -> None:
+    """Upsert users on dialects without ON CONFLICT.
+
+    Stored users are updated in place rather than deleted and re-inserted,
+    since tweet_table.author_id references them.
+    """
+    user_ids = [row['user_id'] for row in values]
+    stored: Set[str] = set()
+    for start in range(0, len(user_ids), READ_CHUNK_SIZE):
+        stored.update(session.execute(
+            select(User.user_id).where(
+                User.user_id.in_(user_ids[start:start + READ_CHUNK_SIZE])
+            )
+        ).scalars())
+    updates = [
+        {'b_' + key: value for key, value in row.items()}
+        for row in values if row['user_id'] in stored
+    ]
+    inserts = [row for row in values if row['user_id'] not in stored]
+    if updates:
+        session.execute(
+            update(User.__table__)
+            .where(User.__table__.c.user_id == bindparam('b_user_id'))
+            .values({
+                column: bindparam('b_' + column)
+                for column in UserRow._fields if column != 'user_id'
+            }),
+            updates
+        )
+    if inserts:
+        session.execute(insert(User.__table__), inserts)
+
+
+def read_thread_edges(column: str, values: List[str]) -> List[ThreadEdgeRow]:
+    """Return the conversation_index rows whose ``column`` is in ``values``."""
+    edges: List[ThreadEdgeRow] = []
+    table = ConversationIndex.__table__
+    with session_scope() as read_session:
+        for start in range(0, len(values), READ_CHUNK_SIZE):
+            rows = read_session.execute(
+                select(*[table.c[field] for field in ThreadEdgeRow._fields]).where(
+                    table.c[column].in_(values[start:start + READ_CHUNK_SIZE])
+                )
+            )
+            edges += [ThreadEdgeRow(*row) for row in rows]
+    return edges
+
+
+def read_user_fingerprints(
+    user_ids: List[str]
+) -> Dict[str, Tuple[Optional[str], Optional[datetime.datetime]]]:
+    """Return user_id -> (profile_hash, updated_at) for the stored users."""
+    fingerprints: Dict[str, Tuple[Optional[str], Optional[datetime.datetime]]] = {}
+    with session_scope() as read_session:
+        for start in range(0, len(user_ids), READ_CHUNK_SIZE):
+            rows = read_session.execute(
+                select(User.user_id, User.profile_hash, User.updated_at).where(
+                    User.user_id.in_(user_ids[start:start + READ_CHUNK_SIZE])
+                )
+            )
+            for user_id, hash_, updated_at in rows:
+                fingerprints[user_id] = (hash_, updated_at)
+    return fingerprints
+
+
+def read_checkpoint(search_term: str) -> Optional[ScrapeCheckpointRow]:
+    """Return the stored scrape checkpoint of ``search_term``, if any."""
+    table = ScrapeCheckpoint.__table__
+    with session_scope() as read_session:
+        row = read_session.execute(
+            select(*[table.c[field] for field in ScrapeCheckpointRow._fields]).where(
+                table.c.search_term == search_term
+            )
+        ).first()
+    return ScrapeCheckpointRow(*row) if row is not None else None
+
+
+def save_checkpoint(checkpoint: ScrapeCheckpointRow) -> None:
+    """Replace the stored scrape checkpoint of ``checkpoint.search_term``."""
+    table = ScrapeCheckpoint.__table__
+    with session_scope() as session:
+        session.execute(delete(table).where(table.c.search_term == checkpoint.search_term))
+        session.execute(insert(table), [checkpoint._asdict()])
+
+
+TWEET_COLUMNS: List[str] = [
+    'tweet_id',
+    'author_id',
+    'created_at',
+    'tweet_text',
+    'conversation_id',
+    'possibly_sensitive',
+    'retweet_count',
+    'reply_count',
+    'like_count',
+    'quote_count',
+    'lang',
+    'source',
+]
+READ_CHUNK_SIZE: int = 5000
+
+
+def read_tweets(
+    search_term: Optional[str] = None,
+    start_time: Optional[datetime.datetime] = None,
+    end_time: Optional[datetime.datetime] = None,
+    tweet_ids: Optional[List[str]] = None,
+    chunk_size: int = READ_CHUNK_SIZE
+) -> Iterator[Dict[str, List]]:
+    """Stream stored tweets as column dictionaries of at most chunk_size rows.
+
+    Months moved to the Parquet archive (see ``database.archive``) are read
+    first, followed by the tweets still in the database. An empty
+    ``tweet_ids`` selects no tweets.
+    """
+    yield from read_archived_tweets(
+        TWEET_COLUMNS,
+        search_term=search_term,
+        start_time=start_time,
+        end_time=end_time,
+        tweet_ids=tweet_ids,
+        chunk_size=chunk_size
+    )
+    columns = [Tweet.__table__.c[column] for column in TWEET_COLUMNS]
+    query = select(*columns)
+    if search_term is not None:
+        # Tweet.search_term only holds the first term that found a tweet;
+        # tweet_search_terms has every one (but not for tweets stored
+        # before it existed).
+        query = query.where(or_(
+            Tweet.search_term == search_term,
+            exists().where(
+                TweetSearchTerm.tweet_id == Tweet.tweet_id,
+                TweetSearchTerm.search_term == search_term
+            )
+        ))
+    if start_time is not None:
+        query = query.where(Tweet.created_at >= start_time)
+    if end_time is not None:
+        query = query.where(Tweet.created_at < end_time)
+
+    if tweet_ids is not None:
+        # Bound the IN list so large selections stay under the driver's
+        # parameter limit; an empty selection runs no query.
+        queries = [
+            query.where(Tweet.tweet_id.in_(tweet_ids[i:i + chunk_size]))
+            for i in range(0, len(tweet_ids), chunk_size)
+        ]
+    else:
+        queries = [query.order_by(Tweet.created_at)]
+
+    with session_scope() as read_session:
+        for query_ in queries:
+            result = read_session.execute(
+                query_.execution_options(yield_per=chunk_size)
+            )
+            for rows in result.partitions():
+                yield {
+                    column: [row[i] for row in rows]
+                    for i, column in enumerate(TWEET_COLUMNS)
+                }
+
+
+_engine = None
+_session_factory = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+
+
+def engine_options(database_uri: str) -> Dict[str, object]:
+    """Build create_engine() keyword arguments from the environment.
+
+    DATABASE_POOL_SIZE, DATABASE_MAX_OVERFLOW, DATABASE_POOL_RECYCLE and
+    DATABASE_POOL_TIMEOUT tune the connection pool; unset values keep
+    SQLAlchemy's defaults.
+    """
+    options: Dict[str, object] = {
+        'echo': os.environ.get('DATABASE_ECHO', '').lower() in ('1', 'true', 'yes'),
+        'pool_pre_ping': True,
+    }
+    if database_uri.startswith('sqlite'):
+        options['connect_args'] = {'check_same_thread': False}
+        if ':memory:' in database_uri or database_uri.rstrip('/') == 'sqlite:':
+            return options
+    pool_settings = {
+        'pool_size': 'DATABASE_POOL_SIZE',
+        'max_overflow': 'DATABASE_MAX_OVERFLOW',
+        'pool_recycle': 'DATABASE_POOL_RECYCLE',
+        'pool_timeout': 'DATABASE_POOL_TIMEOUT',
+    }
+    for option, variable in pool_settings.items():
+        if os.environ.get(variable):
+            options[option] = int(os.environ[variable])
+    if database_uri.startswith('sqlite') and 'pool_size' in options:
+        from sqlalchemy.pool import QueuePool
+
+        options['poolclass'] = QueuePool
+    return options
+
+
+def _enable_sqlite_wal(dbapi_connection, connection_record) -> None:
+    """Let SQLite readers proceed while a writer holds the database."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
+def get_engine():
+    """Return this process's engine, creating it and the schema on first use.
+
+    The engine is keyed on the process id so that a worker forked from a
+    parent which already connected builds its own connection pool instead
+    of sharing the parent's sockets.
+    """
+    global _engine, _session_factory, _engine_pid
+    if _engine is not None and _engine_pid == os.getpid():
+        return _engine
+    with _engine_lock:
+        if _engine is None or _engine_pid != os.getpid():
+            if _engine is not None:
+                _engine.dispose(close=False)
+            load_dotenv()
+            database_uri = os.environ['DATABASE_URI']
+            engine = create_engine(database_uri, **engine_options(database_uri))
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _enable_sqlite_wal)
+            create_schema(engine)
+            _session_factory = sessionmaker(bind=engine)
+            _engine_pid = os.getpid()
+            _engine = engine
+    return _engine
+
+
+def create_schema(engine, attempts: int = 3) -> None:
+    """Create missing tables, indexes and the full-text index, and count
+    stored tweets into the trend counters once.
+
+    Workers started together on a fresh database race to create the
+    schema, and the losers' DDL fails with "already exists" (or "database
+    is locked" on SQLite); the next attempt finds the objects in place.
+    """
+    for attempt in range(attempts):
+        try:
+            Base.metadata.create_all(engine)
+            # create_all skips tables that exist; add the columns and
+            # indexes introduced since they were created.
+            add_missing_columns(engine)
+            drop_stale_foreign_keys(engine)
+            for index in Tweet.__table__.indexes:
+                index.create(engine, checkfirst=True)
+            create_search_index(engine)
+            rebuild_trends(engine)
+            return
+        except (OperationalError, ProgrammingError):
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.1 * (attempt + 1))
+
+
+def add_missing_columns(engine) -> None:
+    """Add model columns missing from existing tables.
+
+    Only nullable, non-key columns are added, so existing rows stay valid;
+    they hold NULL until the next write of the row.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or column.primary_key or not column.nullable:
+                    continue
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} "
+                    f"{column.type.compile(dialect=engine.dialect)}"
+                )
+                print(f"Added column {table.name}.{column.name}.")
+
+
+def drop_stale_foreign_keys(engine) -> None:
+    """Drop foreign keys of existing tables that the models no longer declare.
+
+    SQLite cannot drop constraints and does not enforce them unless asked
+    to, so only other databases are changed.
+    """
+    if engine.dialect.name == 'sqlite':
+        return
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            declared = {
+                (tuple(foreign_key.parent.name for foreign_key in constraint.elements),
+                 constraint.referred_table.name)
+                for constraint in table.foreign_key_constraints
+            }
+            for foreign_key in inspector.get_foreign_keys(table.name):
+                key = (tuple(foreign_key['constrained_columns']), foreign_key['referred_table'])
+                if key in declared or not foreign_key.get('name'):
+                    continue
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"DROP CONSTRAINT {preparer.quote(foreign_key['name'])}"
+                )
+                print(f"Dropped foreign key {table.name}.{foreign_key['name']}.")
+
+
+@contextlib.contextmanager
+def session_scope() -> Iterator[Session]:
+    """Run one unit of work in its own session.
+
+    Commits on success and rolls back on error; the session is closed
+    afterwards, returning its connection to the pool.
+    """
+    get_engine()
+    session = _session_factory()
+    try:
+        yield session
         session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
         session.close()
 
 
-load_dotenv()
-database_uri = os.environ['DATABASE_URI']
-
-engine = create_engine(database_uri, echo=True)
-session = Session(bind=engine)
-Base.metadata.create_all(engine)
+def init_database() -> None:
+    """Connect and check the schema now rather than on the first query."""
+    get_engine()
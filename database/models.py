@@ -1,18 +1,42 @@
 import datetime
 from sqlalchemy import (
+    BigInteger,
     Column,
     Integer,
     DateTime,
     Boolean,
     Float,
     ForeignKey,
+    LargeBinary,
     UnicodeText,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
-from typing import List
+from typing import TYPE_CHECKING, List, Optional, Sequence, Set, Tuple, Union
+
+from database.cache import profile_hash
+from profiling.main import profiled
+
+from database.rows import (
+    ContextAnnotationRow,
+    ReferencedTweetRow,
+    TweetEntityAnnotationRow,
+    TweetEntityHashtagRow,
+    TweetEntityMentionRow,
+    TweetEntityURLRow,
+    TweetRow,
+    TweetSearchTermRow,
+    TweetSentimentRow,
+    ThreadEdgeRow,
+    UserDescriptionHashtagRow,
+    UserDescriptionMentionRow,
+    UserDescriptionURLRow,
+    UserRow,
+)
 
-from scrape.twitter import Response
+if TYPE_CHECKING:
+    from database.cache import UserCache
+    from scrape.twitter import Response
 
 Base = declarative_base()
 
@@ -22,7 +46,7 @@ class Tweet(Base):
 
     tweet_id = Column("tweet_id", UnicodeText, primary_key=True)
     author_id = Column("author_id", UnicodeText, ForeignKey("users.user_id"))
-    created_at = Column("created_at", DateTime)
+    created_at = Column("created_at", DateTime, index=True)
     reply_settings = Column("reply_settings", UnicodeText)
     tweet_text = Column("tweet_text", UnicodeText)
     conversation_id = Column("conversation_id", UnicodeText)
@@ -74,6 +98,20 @@ class Tweet(Base):
         self.search_term = search_term
 
 
+class TweetSearchTerm(Base):
+    """Search terms that returned a tweet; a tweet may match several."""
+
+    __tablename__ = "tweet_search_terms"
+
+    id_ = Column("id_", Integer, primary_key=True, autoincrement=True)
+    tweet_id = Column("tweet_id", UnicodeText, ForeignKey("tweet_table.tweet_id"))
+    search_term = Column("search_term", UnicodeText)
+
+    def __init__(self, tweet_id: str, search_term: str) -> None:
+        self.tweet_id = tweet_id
+        self.search_term = search_term
+
+
 class ReferencedTweet(Base):
     __tablename__ = "referenced_tweet_table"
 
@@ -92,6 +130,62 @@ class ReferencedTweet(Base):
         self.referencing_type = referencing_type
 
 
+class ConversationIndex(Base):
+    """Adjacency index over conversations and tweet references.
+
+    One row per stored tweet: its parent (the tweet it replies to, quotes or
+    retweets) and the root it rolls up to. The root is the retweeted or
+    quoted tweet, otherwise the conversation's first tweet, so a whole
+    thread is one indexed lookup instead of self-joins over
+    referenced_tweet_table.
+    """
+
+    __tablename__ = "conversation_index"
+
+    tweet_id = Column("tweet_id", UnicodeText, ForeignKey("tweet_table.tweet_id"), primary_key=True)
+    conversation_id = Column("conversation_id", UnicodeText, index=True)
+    parent_tweet_id = Column("parent_tweet_id", UnicodeText, index=True)
+    root_tweet_id = Column("root_tweet_id", UnicodeText, index=True)
+    reference_type = Column("reference_type", UnicodeText)
+
+    def __init__(
+        self,
+        tweet_id: str,
+        conversation_id: str,
+        parent_tweet_id: str,
+        root_tweet_id: str,
+        reference_type: str,
+    ) -> None:
+        self.tweet_id = tweet_id
+        self.conversation_id = conversation_id
+        self.parent_tweet_id = parent_tweet_id
+        self.root_tweet_id = root_tweet_id
+        self.reference_type = reference_type
+
+
+class TweetSentiment(Base):
+    """Sentiment scored at ingest by the scrape pipeline."""
+
+    __tablename__ = "tweet_sentiment"
+
+    tweet_id = Column("tweet_id", UnicodeText, ForeignKey("tweet_table.tweet_id"), primary_key=True)
+    sentiment = Column("sentiment", Float)
+    probability = Column("probability", Float)
+    model = Column("model", UnicodeText)
+
+    def __init__(
+        self,
+        tweet_id: str,
+        sentiment: float,
+        probability: float,
+        model: str,
+    ) -> None:
+        self.tweet_id = tweet_id
+        self.sentiment = sentiment
+        self.probability = probability
+        self.model = model
+
+
 class ContextAnnotations(Base):
     __tablename__ = "context_annotations"
 
@@ -156,11 +250,9 @@ class TweetEntity_Mentions(Base):
     originating_tweet_id = Column(
         "originating_tweet_id", UnicodeText, ForeignKey("tweet_table.tweet_id")
     )
-    mentioned_username = Column(
-        "mentioned_username",
-        UnicodeText,
-        ForeignKey("users.user_id")
-    )
+    # Mentioned accounts are usually not in users, so neither column is a
+    # foreign key; User.mentions joins on mentioned_user_id.
+    mentioned_username = Column("mentioned_username", UnicodeText)
     mentioned_user_id = Column("mentioned_user_id", UnicodeText)
 
     def __init__(self, tweet_id: str, username: str, user_id: str) -> None:
@@ -226,11 +318,17 @@ class User(Base):
     listed_count = Column("listed_count", Integer)
     profile_url = Column("profile_url", UnicodeText)
     verified = Column("verified", Boolean)
+    profile_hash = Column("profile_hash", UnicodeText)
+    updated_at = Column("updated_at", DateTime)
     user_description_url = relationship("UserDescription_URL")
     user_description_hashtag = relationship("UserDescription_hashtag")
     user_description_mention = relationship("UserDescription_mention")
     tweet_table = relationship("Tweet")
-    mentions = relationship("TweetEntity_Mentions")
+    mentions = relationship(
+        "TweetEntity_Mentions",
+        primaryjoin="User.user_id == foreign(TweetEntity_Mentions.mentioned_user_id)",
+        viewonly=True,
+    )
 
     def __init__(
         self,
@@ -248,7 +346,9 @@ class User(Base):
         number_of_tweets,
         listed_count,
         profile_url,
-        verified
+        verified,
+        profile_hash=None,
+        updated_at=None
     ):
         self.user_id = user_id
         self.display_name = display_name
@@ -265,6 +365,8 @@ class User(Base):
         self.listed_count = listed_count
         self.profile_url = profile_url
         self.verified = verified
+        self.profile_hash = profile_hash
+        self.updated_at = updated_at
 
 
 class UserDescription_URL(Base):
@@ -309,130 +411,330 @@ class UserDescription_mention(Base):
         self.mention = mention
 
 
+class ScrapeCheckpoint(Base):
+    """Pagination state of the latest scrape of each search term.
+
+    While a scrape runs, ``next_token`` is the page after the last one
+    written, so an interrupted scrape resumes there. A complete scrape
+    stores the newest tweet id it saw as ``since_id`` for the next run.
+    """
+
+    __tablename__ = "scrape_checkpoints"
+
+    search_term = Column("search_term", UnicodeText, primary_key=True)
+    status = Column("status", UnicodeText)
+    since_id = Column("since_id", UnicodeText)
+    newest_id = Column("newest_id", UnicodeText)
+    next_token = Column("next_token", UnicodeText)
+    pages = Column("pages", Integer)
+    tweets = Column("tweets", Integer)
+    updated_at = Column("updated_at", DateTime)
+
+    def __init__(
+        self,
+        search_term: str,
+        status: str,
+        since_id: Optional[str],
+        newest_id: Optional[str],
+        next_token: Optional[str],
+        pages: int,
+        tweets: int,
+        updated_at: Optional[datetime.datetime] = None,
+    ) -> None:
+        self.search_term = search_term
+        self.status = status
+        self.since_id = since_id
+        self.newest_id = newest_id
+        self.next_token = next_token
+        self.pages = pages
+        self.tweets = tweets
+        self.updated_at = updated_at
+
+
+
+class TrendWindow(Base):
+    """Heavy-hitter counters of one search term, entity kind and time window.
+
+    ``summary`` is the window's space-saving summary as JSON and ``sketch``
+    its compressed count-min sketch; see ``database.trending``.
+    """
+
+    __tablename__ = "trend_windows"
+
+    search_term = Column("search_term", UnicodeText, primary_key=True)
+    kind = Column("kind", UnicodeText, primary_key=True)
+    window_index = Column("window_index", BigInteger, primary_key=True, autoincrement=False)
+    summary = Column("summary", UnicodeText)
+    sketch = Column("sketch", LargeBinary)
+    updated_at = Column("updated_at", DateTime)
+
+    def __init__(
+        self,
+        search_term: str,
+        kind: str,
+        window_index: int,
+        summary: Optional[str] = None,
+        sketch: Optional[bytes] = None,
+        updated_at: Optional[datetime.datetime] = None,
+    ) -> None:
+        self.search_term = search_term
+        self.kind = kind
+        self.window_index = window_index
+        self.summary = summary
+        self.sketch = sketch
+        self.updated_at = updated_at
+
+
+class ArchivePart(Base):
+    """A Parquet part of an archived month; see ``database.archive``.
+
+    Rows are inserted in the transaction that deletes the archived tweets,
+    so only parts listed here are read back.
+    """
+
+    __tablename__ = "archive_parts"
+
+    path = Column("path", UnicodeText, primary_key=True)
+    table_name = Column("table_name", UnicodeText, index=True)
+    month = Column("month", UnicodeText)
+    rows = Column("rows", BigInteger)
+    created_at = Column("created_at", DateTime)
+
+    def __init__(
+        self,
+        path: str,
+        table_name: str,
+        month: str,
+        rows: int,
+        created_at: Optional[datetime.datetime] = None,
+    ) -> None:
+        self.path = path
+        self.table_name = table_name
+        self.month = month
+        self.rows = rows
+        self.created_at = created_at
+
+
+ROW_MODELS = {
+    TweetRow: Tweet,
+    TweetSearchTermRow: TweetSearchTerm,
+    ReferencedTweetRow: ReferencedTweet,
+    ThreadEdgeRow: ConversationIndex,
+    TweetSentimentRow: TweetSentiment,
+    ContextAnnotationRow: ContextAnnotations,
+    TweetEntityURLRow: TweetEntity_URL,
+    TweetEntityMentionRow: TweetEntity_Mentions,
+    TweetEntityHashtagRow: TweetEntity_Hashtags,
+    TweetEntityAnnotationRow: TweetEntity_Annotations,
+    UserRow: User,
+    UserDescriptionURLRow: UserDescription_URL,
+    UserDescriptionHashtagRow: UserDescription_hashtag,
+    UserDescriptionMentionRow: UserDescription_mention,
+}
+
+
 class DataBaseModel():
-    """DataBaseModel class."""
+    """DataBaseModel class.
+
+    Normalises raw API pages into the tuple rows of ``database.rows``;
+    ``Database.commit_data`` writes them with Core inserts.
+
+    Several responses (one per search term) can be normalised together:
+    tweets and users returned for more than one term are emitted once, and
+    every (tweet, term) match is recorded in ``tweet_search_term_list``.
 
-    def __init__(self, response_object: Response) -> None:
+    With a ``user_cache``, users whose profile is unchanged and was written
+    recently are skipped entirely (see ``database.cache``).
+    """
+
+    def __init__(
+        self,
+        response_object: Union["Response", Sequence["Response"]],
+        user_cache: Optional["UserCache"] = None
+    ) -> None:
+        if isinstance(response_object, (list, tuple)):
+            responses = list(response_object)
+        else:
+            responses = [response_object]
         self.response_object = response_object
-        self.raw_data = response_object.get_raw_data_list()
-        self.raw_includes = response_object.get_raw_includes_list()
-        self.search_term = response_object.get_search_term()
-        self.tweet_object_list: List[Tweet] = []
-        self.referenced_tweet_list: List[ReferencedTweet] = []
-        self.context_annotations_list: List[ContextAnnotations] = []
-        self.te_url_list: List[TweetEntity_URL] = []
-        self.te_mention_list: List[TweetEntity_Mentions] = []
-        self.te_hashtags_list: List[TweetEntity_Hashtags] = []
-        self.te_annotations_list: List[TweetEntity_Annotations] = []
-        self.user_list: List[User] = []
-        self.user_url_object_list: List[UserDescription_URL] = []
-        self.user_hashtag_list: List[UserDescription_hashtag] = []
-        self.user_mention_list: List[UserDescription_mention] = []
+        self.raw_data: List[dict] = []
+        self.raw_includes: List[dict] = []
+        self.search_term = None
+        self.tweet_object_list: List[TweetRow] = []
+        self.tweet_search_term_list: List[TweetSearchTermRow] = []
+        self.referenced_tweet_list: List[ReferencedTweetRow] = []
+        self.thread_edge_list: List[ThreadEdgeRow] = []
+        self.context_annotations_list: List[ContextAnnotationRow] = []
+        self.te_url_list: List[TweetEntityURLRow] = []
+        self.te_mention_list: List[TweetEntityMentionRow] = []
+        self.te_hashtags_list: List[TweetEntityHashtagRow] = []
+        self.te_annotations_list: List[TweetEntityAnnotationRow] = []
+        self.user_list: List[UserRow] = []
+        self.user_url_object_list: List[UserDescriptionURLRow] = []
+        self.user_hashtag_list: List[UserDescriptionHashtagRow] = []
+        self.user_mention_list: List[UserDescriptionMentionRow] = []
+        self.user_cache = user_cache
+        self.cached_user_count: int = 0
         self.unique = UniqueKeys()
+        self.search_term_matches: Set[Tuple[str, str]] = set()
+        for response in responses:
+            self.add_page(
+                response.get_raw_data_list(),
+                response.get_raw_includes_list(),
+                response.get_search_term()
+            )
+
+    @profiled("normalise")
+    def add_page(
+        self,
+        data: List[dict],
+        includes: List[dict],
+        search_term: str
+    ) -> None:
+        """Normalise the tweets and includes of one page (or response)."""
+        self.raw_data = data
+        self.raw_includes = includes
+        self.search_term = search_term
         self.process_tweet_data()
         self.process_includes_data()
 
+    def merge(self, other: "DataBaseModel") -> None:
+        """Append the rows of a model built from later pages.
+
+        Tweets and users already present here are dropped together with
+        their child rows, as if both had been normalised in one pass.
+        """
+        tweet_ids = self.unique.get_tweet_id_list()
+        new_tweet_ids = {
+            tweet.tweet_id for tweet in other.tweet_object_list
+            if tweet.tweet_id not in tweet_ids
+        }
+        self.tweet_object_list += [
+            tweet for tweet in other.tweet_object_list if tweet.tweet_id in new_tweet_ids
+        ]
+        self.thread_edge_list += [
+            edge for edge in other.thread_edge_list if edge.tweet_id in new_tweet_ids
+        ]
+        for row in other.tweet_search_term_list:
+            if (row.tweet_id, row.search_term) not in self.search_term_matches:
+                self.search_term_matches.add((row.tweet_id, row.search_term))
+                self.tweet_search_term_list.append(row)
+        for name in (
+            'referenced_tweet_list',
+            'context_annotations_list',
+            'te_url_list',
+            'te_mention_list',
+            'te_hashtags_list',
+            'te_annotations_list',
+        ):
+            getattr(self, name).extend(
+                row for row in getattr(other, name)
+                if row.originating_tweet_id in new_tweet_ids
+            )
+
+        user_ids = self.unique.get_user_id_list()
+        new_user_ids = {
+            user.user_id for user in other.user_list if user.user_id not in user_ids
+        }
+        self.user_list += [user for user in other.user_list if user.user_id in new_user_ids]
+        for name in ('user_url_object_list', 'user_hashtag_list', 'user_mention_list'):
+            getattr(self, name).extend(
+                row for row in getattr(other, name) if row.user_id in new_user_ids
+            )
+
+        tweet_ids.update(other.unique.get_tweet_id_list())
+        user_ids.update(other.unique.get_user_id_list())
+        self.cached_user_count += other.cached_user_count
+
     def process_tweet_data(self) -> None:
         tweet_objects = self.raw_data
         for tweet_object in tweet_objects:
-            author_id = tweet_object["author_id"]
             tweet_id = tweet_object["id"]
-            created_at = datetime.datetime.strptime(
-                tweet_object["created_at"], "%Y-%m-%dT%H:%M:%S.%f%z"
-            ).astimezone()
-            reply_settings = tweet_object["reply_settings"]
-            tweet_text = tweet_object["text"]
-            conversation_id = tweet_object["conversation_id"]
-            possibly_sensitive = tweet_object["possibly_sensitive"]
-            retweet_count = int(
-                tweet_object["public_metrics"]["retweet_count"]
-            )
-            reply_count = int(tweet_object["public_metrics"]["reply_count"])
-            like_count = int(tweet_object["public_metrics"]["like_count"])
-            quote_count = int(tweet_object["public_metrics"]["quote_count"])
-            lang = tweet_object["lang"]
-            source = tweet_object.get("source")
-            tweet = Tweet(
-                author_id,
+            if (tweet_id, self.search_term) not in self.search_term_matches:
+                self.search_term_matches.add((tweet_id, self.search_term))
+                self.tweet_search_term_list.append(
+                    TweetSearchTermRow(tweet_id, self.search_term)
+                )
+            if tweet_id in self.unique.get_tweet_id_list():
+                continue
+            self.unique.add_tweet_id(tweet_id)
+            public_metrics = tweet_object["public_metrics"]
+            tweet = TweetRow(
                 tweet_id,
-                created_at,
-                reply_settings,
-                tweet_text,
-                conversation_id,
-                possibly_sensitive,
-                retweet_count,
-                reply_count,
-                like_count,
-                quote_count,
-                lang,
-                source,
+                tweet_object["author_id"],
+                datetime.datetime.strptime(
+                    tweet_object["created_at"], "%Y-%m-%dT%H:%M:%S.%f%z"
+                ).astimezone(),
+                tweet_object["reply_settings"],
+                tweet_object["text"],
+                tweet_object["conversation_id"],
+                tweet_object["possibly_sensitive"],
+                int(public_metrics["retweet_count"]),
+                int(public_metrics["reply_count"]),
+                int(public_metrics["like_count"]),
+                int(public_metrics["quote_count"]),
+                tweet_object["lang"],
+                tweet_object.get("source"),
                 self.search_term
             )
             self.tweet_object_list.append(tweet)
 
-            if "referenced_tweets" in tweet_object.keys():
+            references = {}
+            if "referenced_tweets" in tweet_object:
                 for item_ in tweet_object["referenced_tweets"]:
-                    referencing_type = item_["type"]
-                    referencing_id = item_["id"]
-                    rt = ReferencedTweet(
+                    rt = ReferencedTweetRow(
                         tweet_id,
-                        referencing_id,
-                        referencing_type
+                        item_["id"],
+                        item_["type"]
                     )
                     self.referenced_tweet_list.append(rt)
+                    references[item_["type"]] = item_["id"]
+            self.thread_edge_list.append(
+                thread_edge(tweet_id, tweet_object["conversation_id"], references)
+            )
 
-            if "context_annotations" in tweet_object.keys():
+            if "context_annotations" in tweet_object:
                 for item_ in tweet_object["context_annotations"]:
-                    annotation_id = item_["domain"]["id"]
-                    annotation_name = item_["domain"]["name"]
-                    try:
-                        annotation_description = item_["domain"]["description"]
-                    except KeyError:
-                        annotation_description = None
-                    annotation_entity_id = item_["entity"]["id"]
-                    annotation_entity_name = item_["entity"]["name"]
-                    ca = ContextAnnotations(
+                    ca = ContextAnnotationRow(
                         tweet_id,
-                        annotation_id,
-                        annotation_name,
-                        annotation_description,
-                        annotation_entity_id,
-                        annotation_entity_name,
+                        item_["domain"]["id"],
+                        item_["domain"]["name"],
+                        item_["domain"].get("description"),
+                        item_["entity"]["id"],
+                        item_["entity"]["name"],
                     )
                     self.context_annotations_list.append(ca)
 
-            if "entities" in tweet_object.keys():
-                if "urls" in tweet_object["entities"]:
-                    for item_ in tweet_object["entities"]["urls"]:
-                        url_status = item_.get("status")
-                        url_title = item_.get("title")
-                        url_description = item_.get("description")
-                        te_url = TweetEntity_URL(
+            if "entities" in tweet_object:
+                entities = tweet_object["entities"]
+                if "urls" in entities:
+                    for item_ in entities["urls"]:
+                        te_url = TweetEntityURLRow(
                             tweet_id,
                             item_["expanded_url"],
-                            url_status,
-                            url_title,
-                            url_description,
+                            item_.get("status"),
+                            item_.get("title"),
+                            item_.get("description"),
                         )
                         self.te_url_list.append(te_url)
 
-                if "mentions" in tweet_object.keys():
-                    for item_ in tweet_object["mentions"]:
-                        te_mention = TweetEntity_Mentions(
+                if "mentions" in entities:
+                    for item_ in entities["mentions"]:
+                        te_mention = TweetEntityMentionRow(
                             tweet_id, item_['username'], item_["id"]
                         )
                         self.te_mention_list.append(te_mention)
 
-                if "hashtags" in tweet_object.keys():
-                    for item_ in tweet_object["hashtags"]:
-                        te_hashtag = TweetEntity_Hashtags(
+                if "hashtags" in entities:
+                    for item_ in entities["hashtags"]:
+                        te_hashtag = TweetEntityHashtagRow(
                             tweet_id, item_["tag"]
                         )
                         self.te_hashtags_list.append(te_hashtag)
 
-                if "annotations" in tweet_object.keys():
-                    for item_ in tweet_object["annotations"]:
-                        te_annotation = TweetEntity_Annotations(
+                if "annotations" in entities:
+                    for item_ in entities["annotations"]:
+                        te_annotation = TweetEntityAnnotationRow(
                             tweet_id,
                             item_.get("normalized_text"),
                             item_.get("type"),
@@ -443,75 +745,73 @@ class DataBaseModel():
     def process_includes_data(self):
         includes = self.raw_includes
         for item_ in includes:
-            if 'users' in item_.keys():
+            if 'users' in item_:
+                if self.user_cache is not None:
+                    self.user_cache.prefetch(user['id'] for user in item_['users'])
                 for user in item_['users']:
                     user_id = user['id']
-                    display_name = user['name']
-                    username = user['username']
-                    created_at = datetime.datetime.strptime(
-                        user['created_at'],
-                        "%Y-%m-%dT%H:%M:%S.%f%z"
-                    ).astimezone()
-                    user_description = user.get('description')
-                    location = user.get('location')
-                    pinned_tweet_id = user.get('pinned_tweet_id')
-                    profile_image_url = user.get('profile_image_url')
-                    protected = user.get('protected')
-                    followers = user['public_metrics']['followers_count']
-                    following = user['public_metrics']['following_count']
-                    number_of_tweets = user['public_metrics']['tweet_count']
-                    listed_count = user['public_metrics']['listed_count']
-                    profile_url = user.get('url', '')
-                    verified = user.get('verified')
-                    unique_users = self.unique.get_user_id_list()
-                    if not (user_id in unique_users):
-                        user_object = User(
-                            user_id,
-                            display_name,
-                            username,
-                            created_at,
-                            user_description,
-                            location,
-                            pinned_tweet_id,
-                            profile_image_url,
-                            protected,
-                            followers,
-                            following,
-                            number_of_tweets,
-                            listed_count,
-                            profile_url,
-                            verified
-                        )
-                        self.user_list.append(user_object)
-                        self.unique.add_user_id(user_id)
-                    else:
-                        pass
-                    if 'entities' in user.keys():
+                    if user_id in self.unique.get_user_id_list():
+                        continue
+                    hash_ = None
+                    if self.user_cache is not None:
+                        hash_ = profile_hash(user)
+                        if self.user_cache.is_fresh(user_id, hash_):
+                            self.unique.add_user_id(user_id)
+                            self.cached_user_count += 1
+                            continue
+                    public_metrics = user['public_metrics']
+                    user_object = UserRow(
+                        user_id,
+                        user['name'],
+                        user['username'],
+                        datetime.datetime.strptime(
+                            user['created_at'],
+                            "%Y-%m-%dT%H:%M:%S.%f%z"
+                        ).astimezone(),
+                        user.get('description'),
+                        user.get('location'),
+                        user.get('pinned_tweet_id'),
+                        user.get('profile_image_url'),
+                        user.get('protected'),
+                        public_metrics['followers_count'],
+                        public_metrics['following_count'],
+                        public_metrics['tweet_count'],
+                        public_metrics['listed_count'],
+                        user.get('url', ''),
+                        user.get('verified'),
+                        hash_,
+                        datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+                    )
+                    self.user_list.append(user_object)
+                    self.unique.add_user_id(user_id)
+                    if 'entities' in user:
                         if 'url' in user['entities']:
                             for url_dict in user['entities']['url']['urls']:
-                                if 'expanded_url' in url_dict.keys():
+                                if 'expanded_url' in url_dict:
                                     url = url_dict['expanded_url']
                                 else:
                                     url = url_dict['url']
-                                url_object = UserDescription_URL(user_id, url)
+                                url_object = UserDescriptionURLRow(user_id, url)
                                 self.user_url_object_list.append(url_object)
                         if 'description' in user['entities']:
-                            if 'hashtags' in user['entities']['description'].keys():
+                            if 'hashtags' in user['entities']['description']:
                                 for hashtag_dict in user['entities']['description']['hashtags']:
                                     hashtag = hashtag_dict['tag']
-                                    hashtag_object = UserDescription_hashtag(user_id, hashtag)
+                                    hashtag_object = UserDescriptionHashtagRow(user_id, hashtag)
                                     self.user_hashtag_list.append(hashtag_object)
                             if 'mentions' in user['entities']['description']:
                                 for mention_dict in user['entities']['description']['mentions']:
                                     mention = mention_dict['username']
-                                    mention_object = UserDescription_mention(user_id, mention)
+                                    mention_object = UserDescriptionMentionRow(user_id, mention)
                                     self.user_mention_list.append(mention_object)
 
     def get_tables(self):
         object_lists = [
             self.user_list,
             self.tweet_object_list,
+            self.tweet_search_term_list,
             self.referenced_tweet_list,
+            self.thread_edge_list,
             self.context_annotations_list,
             self.te_url_list,
             self.te_mention_list,
@@ -524,12 +824,27 @@ class DataBaseModel():
         return object_lists
 
 
+def thread_edge(tweet_id: str, conversation_id: str, references: dict) -> ThreadEdgeRow:
+    """Place a tweet in the conversation index given its references by type."""
+    for reference_type in ("retweeted", "replied_to", "quoted"):
+        if reference_type in references:
+            parent_tweet_id = references[reference_type]
+            if reference_type == "replied_to":
+                root_tweet_id = conversation_id
+            else:
+                root_tweet_id = parent_tweet_id
+            return ThreadEdgeRow(
+                tweet_id, conversation_id, parent_tweet_id, root_tweet_id, reference_type
+            )
+    return ThreadEdgeRow(tweet_id, conversation_id, None, conversation_id, None)
+
+
 class UniqueKeys():
     """UniqueKeys model."""
 
     def __init__(self):
-        self.tweet_id_list: List[str] = []
-        self.author_id_list: List[str] = []
+        self.tweet_id_list: Set[str] = set()
+        self.author_id_list: Set[str] = set()
 
     def get_tweet_id_list(self):
         return (self.tweet_id_list)
@@ -538,7 +853,7 @@ class UniqueKeys():
         return (self.author_id_list)
 
     def add_tweet_id(self, tweet_id):
-        self.tweet_id_list.append(tweet_id)
+        self.tweet_id_list.add(tweet_id)
 
     def add_user_id(self, author_id):
-        self.author_id_list.append(author_id)
+        self.author_id_list.add(author_id)
@@ -0,0 +1,135 @@
+"""Plain tuple rows produced by DataBaseModel.
+
+Each row type mirrors one table in ``database.models`` and its field names
+are the table's column names, so ``row._asdict()`` is a ready-made Core
+insert parameter set. Normalising a response therefore never builds
+instrumented ORM objects.
+"""
+
+import datetime
+
+from typing import NamedTuple, Optional
+
+
+class TweetRow(NamedTuple):
+    tweet_id: str
+    author_id: str
+    created_at: datetime.datetime
+    reply_settings: str
+    tweet_text: str
+    conversation_id: str
+    possibly_sensitive: bool
+    retweet_count: int
+    reply_count: int
+    like_count: int
+    quote_count: int
+    lang: str
+    source: Optional[str]
+    search_term: str
+
+
+class TweetSearchTermRow(NamedTuple):
+    tweet_id: str
+    search_term: str
+
+
+class ReferencedTweetRow(NamedTuple):
+    originating_tweet_id: str
+    referenced_tweet_id: str
+    referencing_type: str
+
+
+class ThreadEdgeRow(NamedTuple):
+    tweet_id: str
+    conversation_id: str
+    parent_tweet_id: Optional[str]
+    root_tweet_id: str
+    reference_type: Optional[str]
+
+
+class TweetSentimentRow(NamedTuple):
+    tweet_id: str
+    sentiment: float
+    probability: float
+    model: str
+
+
+class ContextAnnotationRow(NamedTuple):
+    originating_tweet_id: str
+    annotation_id: str
+    annotation_name: str
+    annotation_description: Optional[str]
+    annotation_entity_id: str
+    annotation_entity_name: str
+
+
+class TweetEntityURLRow(NamedTuple):
+    originating_tweet_id: str
+    url: str
+    url_status: Optional[int]
+    url_title: Optional[str]
+    url_description: Optional[str]
+
+
+class TweetEntityMentionRow(NamedTuple):
+    originating_tweet_id: str
+    mentioned_username: str
+    mentioned_user_id: str
+
+
+class TweetEntityHashtagRow(NamedTuple):
+    originating_tweet_id: str
+    hashtag: str
+
+
+class TweetEntityAnnotationRow(NamedTuple):
+    originating_tweet_id: str
+    annotation_normalised_text: Optional[str]
+    annotation_type: Optional[str]
+    annotation_probability: Optional[float]
+
+
+class UserRow(NamedTuple):
+    user_id: str
+    display_name: str
+    username: str
+    created_at: datetime.datetime
+    user_description: Optional[str]
+    location: Optional[str]
+    pinned_tweet_id: Optional[str]
+    profile_image_url: Optional[str]
+    protected: Optional[bool]
+    followers: int
+    following: int
+    number_of_tweets: int
+    listed_count: int
+    profile_url: str
+    verified: Optional[bool]
+    profile_hash: Optional[str] = None
+    updated_at: Optional[datetime.datetime] = None
+
+
+class UserDescriptionURLRow(NamedTuple):
+    user_id: str
+    url: str
+
+
+class UserDescriptionHashtagRow(NamedTuple):
+    user_id: str
+    hashtag: str
+
+
+class UserDescriptionMentionRow(NamedTuple):
+    user_id: str
+    mention: str
+
+
+class ScrapeCheckpointRow(NamedTuple):
+    search_term: str
+    status: str
+    since_id: Optional[str]
+    newest_id: Optional[str]
+    next_token: Optional[str]
+    pages: int
+    tweets: int
+    updated_at: Optional[datetime.datetime] = None
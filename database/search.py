@@ -0,0 +1,168 @@
+"""Full-text search over stored tweets.
+
+The index is kept up to date by the database at insert time, so the bulk
+Core inserts of Database.commit_data need no extra work:
+
+* SQLite: an external-content FTS5 table, ``tweet_search``, over
+  ``tweet_table.tweet_text`` maintained by insert/update/delete triggers.
+  It is keyed on ``tweet_table``'s implicit rowid, which ``VACUUM`` may
+  renumber, so it is rebuilt after every vacuum.
+* PostgreSQL: a generated ``tweet_tsv`` tsvector column with a GIN index.
+
+Other dialects fall back to an unranked ``LIKE`` scan.
+"""
+
+import datetime
+
+from sqlalchemy import and_, exists, func, literal, literal_column, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+from typing import Dict, List, Optional
+
+from database.models import Tweet, TweetSearchTerm
+
+
+SEARCH_PAGE_SIZE: int = 50
+MAX_SEARCH_PAGE_SIZE: int = 1000
+
+_SQLITE_INDEX: List[str] = [
+    "CREATE VIRTUAL TABLE tweet_search USING fts5("
+    "tweet_text, content='tweet_table', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS tweet_search_insert AFTER INSERT ON tweet_table BEGIN "
+    "INSERT INTO tweet_search(rowid, tweet_text) VALUES (new.rowid, new.tweet_text); END",
+    "CREATE TRIGGER IF NOT EXISTS tweet_search_delete AFTER DELETE ON tweet_table BEGIN "
+    "INSERT INTO tweet_search(tweet_search, rowid, tweet_text) "
+    "VALUES ('delete', old.rowid, old.tweet_text); END",
+    "CREATE TRIGGER IF NOT EXISTS tweet_search_update AFTER UPDATE OF tweet_text ON tweet_table BEGIN "
+    "INSERT INTO tweet_search(tweet_search, rowid, tweet_text) "
+    "VALUES ('delete', old.rowid, old.tweet_text); "
+    "INSERT INTO tweet_search(rowid, tweet_text) VALUES (new.rowid, new.tweet_text); END",
+    # Index the tweets stored before the search table existed.
+    "INSERT INTO tweet_search(tweet_search) VALUES ('rebuild')",
+]
+
+_POSTGRESQL_INDEX: List[str] = [
+    "ALTER TABLE tweet_table ADD COLUMN IF NOT EXISTS tweet_tsv tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(tweet_text, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_tweet_table_tweet_tsv ON tweet_table USING GIN (tweet_tsv)",
+]
+
+
+def create_search_index(engine: Engine) -> None:
+    """Create the dialect's full-text index if it does not exist yet."""
+    dialect = engine.dialect.name
+    with engine.begin() as connection:
+        if dialect == 'sqlite':
+            present = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tweet_search'"
+            )).first()
+            if present is None:
+                for statement in _SQLITE_INDEX:
+                    connection.execute(text(statement))
+        elif dialect == 'postgresql':
+            for statement in _POSTGRESQL_INDEX:
+                connection.execute(text(statement))
+
+
+def rebuild_search_index(connection) -> None:
+    """Re-read every tweet into the SQLite index, e.g. after ``VACUUM``."""
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text("INSERT INTO tweet_search(tweet_search) VALUES ('rebuild')"))
+
+
+def fts5_query(query: str) -> str:
+    """Quote each word so user input cannot break FTS5 syntax.
+
+    Words are ANDed; a trailing ``*`` keeps its prefix-match meaning.
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith('*') and len(word) > 1
+        word = word.rstrip('*').replace('"', '""')
+        if word:
+            terms.append('"' + word + '"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+def search_statement(
+    dialect: str,
+    query: str,
+    columns: List[str],
+    search_term: Optional[str] = None,
+    start_time: Optional[datetime.datetime] = None,
+    end_time: Optional[datetime.datetime] = None,
+    lang: Optional[str] = None,
+    limit: int = SEARCH_PAGE_SIZE,
+    offset: int = 0
+) -> Select:
+    """Ranked search query; higher ``rank`` is a better match."""
+    tweet_table = Tweet.__table__
+    selected = [tweet_table.c[column] for column in columns]
+    if dialect == 'sqlite':
+        rank = -func.bm25(literal_column('tweet_search'))
+        statement = select(*selected, rank.label('rank')).select_from(
+            tweet_table.join(
+                text('tweet_search'),
+                literal_column('tweet_search.rowid') == literal_column('tweet_table.rowid')
+            )
+        ).where(text('tweet_search MATCH :match').bindparams(match=fts5_query(query)))
+    elif dialect == 'postgresql':
+        tsquery = func.websearch_to_tsquery('simple', query)
+        tsv = literal_column('tweet_table.tweet_tsv')
+        rank = func.ts_rank(tsv, tsquery)
+        statement = select(*selected, rank.label('rank')).where(tsv.op('@@')(tsquery))
+    else:
+        rank = literal(0.0)
+        statement = select(*selected, rank.label('rank')).where(and_(*(
+            Tweet.tweet_text.ilike('%' + word + '%') for word in query.split()
+        )))
+
+    if search_term is not None:
+        statement = statement.where(exists().where(
+            TweetSearchTerm.tweet_id == Tweet.tweet_id,
+            TweetSearchTerm.search_term == search_term
+        ))
+    if start_time is not None:
+        statement = statement.where(Tweet.created_at >= start_time)
+    if end_time is not None:
+        statement = statement.where(Tweet.created_at < end_time)
+    if lang is not None:
+        statement = statement.where(Tweet.lang == lang)
+    return statement.order_by(
+        rank.desc(), Tweet.created_at.desc(), Tweet.tweet_id
+    ).limit(limit).offset(offset)
+
+
+def search_tweets(
+    query: str,
+    search_term: Optional[str] = None,
+    start_time: Optional[datetime.datetime] = None,
+    end_time: Optional[datetime.datetime] = None,
+    lang: Optional[str] = None,
+    limit: int = SEARCH_PAGE_SIZE,
+    offset: int = 0
+) -> Dict[str, List]:
+    """One page of stored tweets matching ``query`` as column dictionaries."""
+    from database.database import TWEET_COLUMNS, get_engine, session_scope
+
+    columns = TWEET_COLUMNS + ['rank']
+    if not fts5_query(query):
+        # Nothing but stars and whitespace: no word to match.
+        return {column: [] for column in columns}
+    statement = search_statement(
+        get_engine().dialect.name,
+        query,
+        TWEET_COLUMNS,
+        search_term=search_term,
+        start_time=start_time,
+        end_time=end_time,
+        lang=lang,
+        limit=min(limit, MAX_SEARCH_PAGE_SIZE),
+        offset=offset
+    )
+    with session_scope() as read_session:
+        rows = read_session.execute(statement).all()
+    return {
+        column: [row[i] for row in rows]
+        for i, column in enumerate(columns)
+    }
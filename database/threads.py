@@ -0,0 +1,43 @@
+"""Conversation thread lookups over ``conversation_index``.
+
+DataBaseModel emits one ThreadEdgeRow per tweet at ingest and
+``Database.commit_data`` writes them to ``conversation_index``, whose
+conversation, root and parent columns are indexed. Lookups query that table
+on every call, so edges written by other workers and processes are seen
+as soon as they commit and the process holds no per-thread state.
+"""
+
+from typing import Dict, Iterable, List, Set
+
+from database.rows import ThreadEdgeRow
+
+
+class ThreadIndex():
+    """Conversation -> tweets, root -> tweets and parent -> replies lookups."""
+
+    def conversation(self, conversation_ids: Iterable[str]) -> Set[str]:
+        """Ids of the stored tweets in the given conversations."""
+        return {edge.tweet_id for edge in self.__lookup('conversation_id', conversation_ids)}
+
+    def thread(self, root_tweet_ids: Iterable[str]) -> Set[str]:
+        """Ids of the stored tweets that roll up to the given root tweets."""
+        return {edge.tweet_id for edge in self.__lookup('root_tweet_id', root_tweet_ids)}
+
+    def replies(self, tweet_id: str) -> Set[str]:
+        """Direct replies, quotes and retweets of a tweet."""
+        return {edge.tweet_id for edge in self.__lookup('parent_tweet_id', [tweet_id])}
+
+    def edges(self, tweet_ids: Iterable[str]) -> Dict[str, ThreadEdgeRow]:
+        """Index rows of the given tweets."""
+        return {edge.tweet_id: edge for edge in self.__lookup('tweet_id', tweet_ids)}
+
+    def __lookup(self, column: str, values: Iterable[str]) -> List[ThreadEdgeRow]:
+        from database.database import read_thread_edges
+
+        values = list(dict.fromkeys(values))
+        if not values:
+            return []
+        return read_thread_edges(column, values)
+
+
+thread_index = ThreadIndex()
@@ -0,0 +1,486 @@
+"""Streaming heavy-hitter counters for hashtags, mentions and annotations.
+
+Every committed batch updates, per (search term, kind, time window), a
+space-saving top-k summary and a count-min sketch. Trend queries merge at
+most ``TREND_RETENTION_WINDOWS`` windows, so their cost does not depend on
+how many tweets are archived. Counts are approximate: space-saving never
+under-counts an item it reports and its ``error`` bounds the over-count;
+the count-min sketch over-estimates by at most ``e / width`` of the
+window's total with probability ``1 - exp(-depth)``.
+
+Each window is a row of ``trend_windows`` updated in the transaction that
+stores the tweets, so the counters are shared by every worker and CLI run
+and survive restarts. They count stored tweets only: ``/scrape`` results
+that are not written are left out. Tweets stored before the table existed
+are counted once by ``rebuild_trends``. At most ``TREND_MAX_TERMS`` search
+terms are tracked; the least recently updated one is dropped first.
+"""
+
+import array
+import datetime
+import hashlib
+import heapq
+import json
+import os
+import threading
+import zlib
+
+from collections import Counter, OrderedDict, defaultdict
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from database.models import (
+    ContextAnnotations,
+    Tweet,
+    TweetEntity_Hashtags,
+    TweetEntity_Mentions,
+    TweetSearchTerm,
+    TrendWindow,
+)
+from database.rows import (
+    ContextAnnotationRow,
+    TweetEntityHashtagRow,
+    TweetEntityMentionRow,
+    TweetRow,
+    TweetSearchTermRow,
+)
+
+
+TREND_KINDS: Tuple[str, ...] = ('hashtag', 'mention', 'annotation')
+TREND_CAPACITY: int = int(os.environ.get('TREND_CAPACITY') or 200)
+TREND_WINDOW_SECONDS: int = int(os.environ.get('TREND_WINDOW_SECONDS') or 60 * 60)
+TREND_RETENTION_WINDOWS: int = int(os.environ.get('TREND_RETENTION_WINDOWS') or 7 * 24)
+TREND_MAX_TERMS: int = int(os.environ.get('TREND_MAX_TERMS') or 1000)
+SKETCH_WIDTH: int = 1024
+SKETCH_DEPTH: int = 4
+
+# trend_windows row recording that the stored tweets have been counted.
+_REBUILT_KEY: Tuple[str, str, int] = ('', 'rebuilt', 0)
+
+Increments = Dict[Tuple[str, str, int], Counter]
+
+
+class SpaceSaving():
+    """Space-saving top-k summary (Metwally et al.) over at most ``capacity`` items."""
+
+    def __init__(self, capacity: int = TREND_CAPACITY) -> None:
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []
+
+    def add(self, item: str, count: int = 1) -> None:
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            minimum, evicted = self.__pop_minimum()
+            del self.counts[evicted]
+            del self.errors[evicted]
+            self.counts[item] = minimum + count
+            self.errors[item] = minimum
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self.__rebuild_heap()
+
+    def __pop_minimum(self) -> Tuple[int, str]:
+        # The heap holds stale entries for items whose count has grown or
+        # that were evicted; skip them until a current one surfaces.
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return count, item
+
+    def __rebuild_heap(self) -> None:
+        self._heap = [(count_, item_) for item_, count_ in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, k: int) -> List[Tuple[str, int, int]]:
+        return [
+            (item, count, self.errors[item])
+            for item, count in heapq.nlargest(k, self.counts.items(), key=lambda pair: pair[1])
+        ]
+
+    def dumps(self) -> str:
+        return json.dumps({item: [count, self.errors[item]] for item, count in self.counts.items()})
+
+    @classmethod
+    def loads(cls, data: str, capacity: int = TREND_CAPACITY) -> "SpaceSaving":
+        summary = cls(capacity)
+        for item, (count, error) in json.loads(data).items():
+            summary.counts[item] = count
+            summary.errors[item] = error
+        summary.__rebuild_heap()
+        return summary
+
+
+class CountMinSketch():
+    """Count-min sketch of ``depth`` rows of ``width`` counters.
+
+    Columns come from blake2b rather than ``hash()``, which is salted per
+    process, so a stored sketch answers the same in every process.
+    """
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH) -> None:
+        self.width = width
+        self.depth = depth
+        self.rows: List[array.array] = [array.array('q', [0]) * width for _ in range(depth)]
+
+    def add(self, item: str, count: int = 1) -> None:
+        for row, column in zip(self.rows, self.__columns(item)):
+            row[column] += count
+
+    def estimate(self, item: str) -> int:
+        return min(row[column] for row, column in zip(self.rows, self.__columns(item)))
+
+    def __columns(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=8 * self.depth).digest()
+        return (
+            int.from_bytes(digest[8 * i:8 * (i + 1)], 'little') % self.width
+            for i in range(self.depth)
+        )
+
+    def dumps(self) -> bytes:
+        return zlib.compress(b''.join(row.tobytes() for row in self.rows))
+
+    @classmethod
+    def loads(cls, data: bytes, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH) -> "CountMinSketch":
+        sketch = cls(width, depth)
+        counters = array.array('q')
+        counters.frombytes(zlib.decompress(data))
+        sketch.rows = [counters[i * width:(i + 1) * width] for i in range(depth)]
+        return sketch
+
+
+class TrendCounters():
+    """Windowed heavy-hitter counters keyed by search term and kind.
+
+    Backed by ``trend_windows``; with ``use_database=False`` the windows
+    are kept in process memory instead.
+    """
+
+    def __init__(
+        self,
+        capacity: int = TREND_CAPACITY,
+        window_seconds: int = TREND_WINDOW_SECONDS,
+        retention_windows: int = TREND_RETENTION_WINDOWS,
+        max_terms: int = TREND_MAX_TERMS,
+        use_database: bool = True
+    ) -> None:
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self.retention_windows = retention_windows
+        self.max_terms = max_terms
+        self.use_database = use_database
+        self._windows: Dict[Tuple[str, str], Dict[int, Tuple[SpaceSaving, CountMinSketch]]] = defaultdict(dict)
+        self._terms: "OrderedDict[str, None]" = OrderedDict()
+        self._admitted: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def add_tables(self, tables: Iterable[list], session: Optional[Session] = None) -> None:
+        """Count the entity rows of a DataBaseModel batch.
+
+        ``Database.commit_data`` passes its session so that the counters
+        commit with the rows they count.
+        """
+        increments = self.increments(tables)
+        if not increments:
+            return
+        if not self.use_database:
+            self.__add_to_memory(increments)
+        elif session is not None:
+            self.__add_to_database(session, increments)
+        else:
+            from database.database import session_scope
+
+            with session_scope() as session:
+                self.__add_to_database(session, increments)
+
+    def increments(self, tables: Iterable[list]) -> Increments:
+        """(search term, kind, window) -> item counts of a batch's rows."""
+        created: Dict[str, datetime.datetime] = {}
+        terms: Dict[str, List[str]] = defaultdict(list)
+        entities: List[Tuple[str, str, str]] = []
+        for rows in tables:
+            for row in rows:
+                if isinstance(row, TweetRow):
+                    created[row.tweet_id] = row.created_at
+                elif isinstance(row, TweetSearchTermRow):
+                    terms[row.tweet_id].append(row.search_term)
+                elif isinstance(row, TweetEntityHashtagRow):
+                    entities.append((row.originating_tweet_id, 'hashtag', row.hashtag.lower()))
+                elif isinstance(row, TweetEntityMentionRow):
+                    entities.append((row.originating_tweet_id, 'mention', row.mentioned_username.lower()))
+                elif isinstance(row, ContextAnnotationRow):
+                    entities.append((row.originating_tweet_id, 'annotation', row.annotation_entity_name))
+                else:
+                    # Each list holds one row type; skip lists that are
+                    # not counted after their first row.
+                    break
+        increments: Increments = defaultdict(Counter)
+        for tweet_id, kind, item in entities:
+            if tweet_id not in created or item is None:
+                continue
+            window = self.__window(created[tweet_id])
+            for search_term in terms.get(tweet_id, ()):
+                increments[(search_term, kind, window)][item] += 1
+        return increments
+
+    def top(
+        self,
+        search_term: str,
+        kind: str,
+        k: int = 10,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None
+    ) -> List[Tuple[str, int, int]]:
+        """Most frequent items in [start, end) as (item, count, error)."""
+        counts: Dict[str, int] = defaultdict(int)
+        errors: Dict[str, int] = defaultdict(int)
+        for summary, _ in self.__selected(search_term, kind, start, end):
+            for item, count, error in summary.top(self.capacity):
+                counts[item] += count
+                errors[item] += error
+        ranked = sorted(counts.items(), key=lambda pair: pair[1], reverse=True)[:k]
+        return [(item, count, errors[item]) for item, count in ranked]
+
+    def estimate(
+        self,
+        search_term: str,
+        kind: str,
+        item: str,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None
+    ) -> int:
+        """Approximate number of occurrences of ``item`` in [start, end)."""
+        return sum(
+            sketch.estimate(item)
+            for _, sketch in self.__selected(search_term, kind, start, end)
+        )
+
+    def rebuild(self, session: Session, chunk_size: int = 5000) -> bool:
+        """Count the stored tweets once; False when they already were.
+
+        A marker row is inserted before counting. A concurrent rebuild
+        blocks on it and fails with IntegrityError once the first commits.
+        """
+        if session.get(TrendWindow, _REBUILT_KEY) is not None:
+            return False
+        session.execute(insert(TrendWindow.__table__).values(
+            search_term=_REBUILT_KEY[0],
+            kind=_REBUILT_KEY[1],
+            window_index=_REBUILT_KEY[2],
+            updated_at=datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        ))
+        sources = [
+            ('hashtag', func.lower(TweetEntity_Hashtags.hashtag), TweetEntity_Hashtags.originating_tweet_id),
+            ('mention', func.lower(TweetEntity_Mentions.mentioned_username), TweetEntity_Mentions.originating_tweet_id),
+            ('annotation', ContextAnnotations.annotation_entity_name, ContextAnnotations.originating_tweet_id),
+        ]
+        for kind, item_column, tweet_id_column in sources:
+            rows = session.execute(
+                select(TweetSearchTerm.search_term, Tweet.created_at, item_column)
+                .join(Tweet, Tweet.tweet_id == TweetSearchTerm.tweet_id)
+                .join(tweet_id_column.table, tweet_id_column == Tweet.tweet_id)
+                .execution_options(yield_per=chunk_size)
+            )
+            for chunk in rows.partitions():
+                increments: Increments = defaultdict(Counter)
+                for search_term, created_at, item in chunk:
+                    if item is not None and created_at is not None:
+                        increments[(search_term, kind, self.__window(created_at))][item] += 1
+                self.__add_to_database(session, increments)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._windows.clear()
+            self._terms.clear()
+            self._admitted.clear()
+
+    def __add_to_memory(self, increments: Increments) -> None:
+        with self._lock:
+            for (search_term, kind, window), counts in sorted(increments.items()):
+                if search_term not in self._terms:
+                    if len(self._terms) >= self.max_terms:
+                        evicted, _ = self._terms.popitem(last=False)
+                        for kind_ in TREND_KINDS:
+                            self._windows.pop((evicted, kind_), None)
+                    self._terms[search_term] = None
+                self._terms.move_to_end(search_term)
+                windows = self._windows[(search_term, kind)]
+                if window not in windows:
+                    if len(windows) >= self.retention_windows:
+                        oldest = min(windows)
+                        if window < oldest:
+                            continue
+                        del windows[oldest]
+                    windows[window] = (SpaceSaving(self.capacity), CountMinSketch())
+                summary, sketch = windows[window]
+                for item, count in counts.items():
+                    summary.add(item, count)
+                    sketch.add(item, count)
+
+    def __add_to_database(self, session: Session, increments: Increments) -> None:
+        table = TrendWindow.__table__
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        terms = self.__admit_terms(session, {search_term for search_term, _, _ in increments})
+        keys: Dict[Tuple[str, str], Dict[int, Counter]] = defaultdict(dict)
+        for (search_term, kind, window), counts in increments.items():
+            if search_term in terms:
+                keys[(search_term, kind)][window] = counts
+
+        # Rows are locked in key order so concurrent writers cannot deadlock.
+        for (search_term, kind), windows in sorted(keys.items()):
+            key = (table.c.search_term == search_term, table.c.kind == kind)
+            newest = session.execute(select(func.max(table.c.window_index)).where(*key)).scalar()
+            newest = max(newest if newest is not None else min(windows), max(windows))
+            oldest = newest - self.retention_windows + 1
+            session.execute(delete(table).where(*key, table.c.window_index < oldest))
+            for window in sorted(windows):
+                if window < oldest:
+                    continue
+                row = self.__locked_row(session, search_term, kind, window)
+                summary = SpaceSaving.loads(row.summary, self.capacity)
+                sketch = CountMinSketch.loads(row.sketch)
+                for item, count in windows[window].items():
+                    summary.add(item, count)
+                    sketch.add(item, count)
+                session.execute(update(table).where(*key, table.c.window_index == window).values(
+                    summary=summary.dumps(), sketch=sketch.dumps(), updated_at=now
+                ))
+
+    def __locked_row(self, session: Session, search_term: str, kind: str, window: int):
+        """Create the window's row if it is missing and lock it.
+
+        ``SELECT ... FOR UPDATE`` locks nothing while the row does not
+        exist, so it is inserted first; a concurrent insert of the same key
+        waits for ours and then does nothing instead of failing.
+        """
+        table = TrendWindow.__table__
+        key = (table.c.search_term == search_term, table.c.kind == kind, table.c.window_index == window)
+        values = {
+            'search_term': search_term,
+            'kind': kind,
+            'window_index': window,
+            'summary': SpaceSaving(self.capacity).dumps(),
+            'sketch': CountMinSketch().dumps(),
+        }
+        dialect = session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            session.execute(dialect_insert(table).values(**values).on_conflict_do_nothing(
+                index_elements=['search_term', 'kind', 'window_index']
+            ))
+        elif session.execute(select(table.c.window_index).where(*key)).first() is None:
+            session.execute(insert(table).values(**values))
+        return session.execute(
+            select(table.c.summary, table.c.sketch).where(*key).with_for_update()
+        ).one()
+
+    def __admit_terms(self, session: Session, search_terms: Set[str]) -> Set[str]:
+        """Make room for new search terms by dropping the least recently
+        updated ones; returns the terms that may be counted.
+
+        Terms this process has seen tracked are cached, so the table is
+        only queried for unfamiliar terms and counted when one is new.
+        """
+        with self._lock:
+            if search_terms <= self._admitted:
+                return set(search_terms)
+            unfamiliar = search_terms - self._admitted
+        table = TrendWindow.__table__
+        tracked = set(session.execute(
+            select(table.c.search_term)
+            .where(table.c.kind.in_(TREND_KINDS), table.c.search_term.in_(sorted(unfamiliar)))
+            .distinct()
+        ).scalars())
+        new = sorted(unfamiliar - tracked)
+        if not new:
+            with self._lock:
+                self._admitted |= tracked
+            return set(search_terms)
+        tracked_count = session.execute(
+            select(func.count(table.c.search_term.distinct())).where(table.c.kind.in_(TREND_KINDS))
+        ).scalar()
+        excess = tracked_count + len(new) - self.max_terms
+        stale: List[str] = []
+        if excess > 0:
+            stale = list(session.execute(
+                select(table.c.search_term)
+                .where(table.c.kind.in_(TREND_KINDS), table.c.search_term.not_in(search_terms))
+                .group_by(table.c.search_term)
+                .order_by(func.max(table.c.updated_at))
+                .limit(excess)
+            ).scalars())
+            if stale:
+                session.execute(delete(table).where(
+                    table.c.kind.in_(TREND_KINDS), table.c.search_term.in_(stale)
+                ))
+        room = max(self.max_terms - (tracked_count - len(stale)), 0)
+        admitted = (search_terms - set(new)) | set(new[:room])
+        with self._lock:
+            # The cache goes stale when another process evicts a term or
+            # this transaction rolls back; the next admission of a new term
+            # counts the table again and brings it back under the cap.
+            self._admitted -= set(stale)
+            self._admitted |= admitted
+        return admitted
+
+    def __selected(self, search_term, kind, start, end) -> List[Tuple[SpaceSaving, CountMinSketch]]:
+        # Windows overlapping [start, end).
+        first = self.__window(start) if start is not None else None
+        last = -(-self.__timestamp(end) // self.window_seconds) if end is not None else None
+        if not self.use_database:
+            with self._lock:
+                return [
+                    counters
+                    for window, counters in self._windows.get((search_term, kind), {}).items()
+                    if (first is None or window >= first) and (last is None or window < last)
+                ]
+        from database.database import session_scope
+
+        table = TrendWindow.__table__
+        statement = select(table.c.summary, table.c.sketch).where(
+            table.c.search_term == search_term, table.c.kind == kind
+        )
+        if first is not None:
+            statement = statement.where(table.c.window_index >= first)
+        if last is not None:
+            statement = statement.where(table.c.window_index < last)
+        with session_scope() as session:
+            rows = session.execute(statement).all()
+        return [
+            (SpaceSaving.loads(summary, self.capacity), CountMinSketch.loads(sketch))
+            for summary, sketch in rows
+        ]
+
+    def __window(self, moment: datetime.datetime) -> int:
+        return self.__timestamp(moment) // self.window_seconds
+
+    @staticmethod
+    def __timestamp(moment: datetime.datetime) -> int:
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=datetime.timezone.utc)
+        return int(moment.timestamp())
+
+
+def rebuild_trends(engine) -> bool:
+    """Count the tweets stored before ``trend_windows`` existed, once."""
+    try:
+        with Session(engine) as session:
+            with session.begin():
+                return trend_counters.rebuild(session)
+    except IntegrityError:
+        # Another process rebuilt the counters first.
+        return False
+
+
+trend_counters = TrendCounters()
@@ -0,0 +1,383 @@
+"""HTTP load tests for the FastAPI service.
+
+Starts ``uvicorn loadtest.server:app`` (app.py's app with the Twitter API
+and the sentiment model replaced by ``loadtest.stubs``) on a scratch SQLite
+database, seeds it with one pipeline scrape, then drives a weighted mix of
+``/scrape``, ``/sentiment``, ``/search`` and ``/trending`` requests at each
+requested concurrency. For every level it reports throughput, p50/p95/p99
+latency per endpoint and the peak resident memory of each server process,
+and saves everything to ``<output-dir>/<run id>.json``::
+
+    python -m loadtest.main run --concurrency 1 8 32 --duration 20
+    python -m loadtest.main compare loadtest/results/a.json loadtest/results/b.json
+"""
+
+import asyncio
+import datetime
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+
+DEFAULT_MIX: str = "scrape=1,sentiment=2,search=4,trending=2"
+SEARCH_TERMS: List[str] = ["BSNL", "Jio", "Airtel", "Vodafone"]
+SEARCH_WORDS: List[str] = ["outage", "signal", "refund", "speed", "support"]
+RESULTS_DIR: str = os.path.join("loadtest", "results")
+PERCENTILES: Tuple[int, ...] = (50, 95, 99)
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse ``kind=weight,...`` into request weights."""
+    weights: Dict[str, float] = {}
+    for part in mix.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in REQUESTS:
+            raise ValueError(f"Unknown request kind {kind!r}, choose from {sorted(REQUESTS)}.")
+        weights[kind] = float(weight or 1)
+    return weights
+
+
+def _scrape(rng: random.Random) -> Tuple[str, str, dict]:
+    return "POST", "/scrape", {"json": {
+        "search_string": rng.choice(SEARCH_TERMS),
+        "date_range": None,
+        "exclude_handles": None,
+        "limit_tweets": None,
+    }}
+
+
+def _sentiment(rng: random.Random) -> Tuple[str, str, dict]:
+    return "POST", "/sentiment", {"json": {
+        "search_term": rng.choice(SEARCH_TERMS),
+        "exclude_handles": [],
+    }}
+
+
+def _search(rng: random.Random) -> Tuple[str, str, dict]:
+    return "GET", "/search", {"params": {"q": rng.choice(SEARCH_WORDS), "limit": 50}}
+
+
+def _trending(rng: random.Random) -> Tuple[str, str, dict]:
+    return "GET", "/trending", {"params": {"search_term": rng.choice(SEARCH_TERMS)}}
+
+
+REQUESTS = {
+    "scrape": _scrape,
+    "sentiment": _sentiment,
+    "search": _search,
+    "trending": _trending,
+}
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+
+
+def summarise(samples: List[Tuple[str, int, float]], elapsed: float) -> Dict[str, object]:
+    """Throughput, error count and latency percentiles (ms) of ``samples``."""
+    latencies = sorted(latency * 1000 for _, _, latency in samples)
+    summary: Dict[str, object] = {
+        'requests': len(samples),
+        'errors': sum(1 for _, status, _ in samples if not 200 <= status < 300),
+        'throughput_rps': len(samples) / elapsed if elapsed else 0.0,
+        'latency_ms': {
+            f'p{q}': percentile(latencies, q) for q in PERCENTILES
+        },
+    }
+    summary['latency_ms']['mean'] = sum(latencies) / len(latencies) if latencies else None
+    summary['latency_ms']['max'] = latencies[-1] if latencies else None
+    return summary
+
+
+async def drive(
+    url: str,
+    concurrency: int,
+    duration: float,
+    mix: Dict[str, float],
+    seed: int = 0,
+    timeout: float = 120.0
+) -> Tuple[List[Tuple[str, int, float]], float]:
+    """Keep ``concurrency`` requests in flight for ``duration`` seconds.
+
+    Returns (kind, status, seconds) per completed request and the elapsed
+    time; a status of 0 marks a transport error or timeout.
+    """
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    samples: List[Tuple[str, int, float]] = []
+    started = time.perf_counter()
+    deadline = started + duration
+
+    async def user(client: httpx.AsyncClient, rng: random.Random) -> None:
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            method, path, options = REQUESTS[kind](rng)
+            sent = time.perf_counter()
+            try:
+                response = await client.request(method, path, **options)
+                await response.aread()
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            samples.append((kind, status, time.perf_counter() - sent))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        await asyncio.gather(*(
+            user(client, random.Random(seed * 1000 + i)) for i in range(concurrency)
+        ))
+    return samples, time.perf_counter() - started
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Resident memory of a process, from /proc where available."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def process_tree(pid: int) -> List[int]:
+    """``pid`` and its descendants (Linux only; just ``pid`` elsewhere)."""
+    pids = [pid]
+    for parent in pids:
+        try:
+            for task in os.listdir(f"/proc/{parent}/task"):
+                with open(f"/proc/{parent}/task/{task}/children") as children:
+                    pids += [int(child) for child in children.read().split()]
+        except OSError:
+            continue
+    return pids
+
+
+class MemorySampler():
+    """Record the peak RSS of every process of a server while it runs."""
+
+    def __init__(self, pid: int, interval: float = 0.25) -> None:
+        self.pid = pid
+        self.interval = interval
+        self.peaks: Dict[int, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.__sample, daemon=True)
+
+    def __enter__(self) -> "MemorySampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def __sample(self) -> None:
+        while True:
+            for pid in process_tree(self.pid):
+                rss = rss_bytes(pid)
+                if rss is not None:
+                    self.peaks[pid] = max(rss, self.peaks.get(pid, 0))
+            if self._stop.wait(self.interval):
+                break
+
+    def report(self) -> Dict[str, float]:
+        return {str(pid): peak / 2 ** 20 for pid, peak in sorted(self.peaks.items())}
+
+
+class Server():
+    """``uvicorn loadtest.server:app`` in a subprocess on a scratch database."""
+
+    def __init__(self, port: int, workers: int = 1, env: Optional[Dict[str, str]] = None) -> None:
+        self.port = port
+        self.workers = workers
+        self.url = f"http://127.0.0.1:{port}"
+        self.directory = tempfile.TemporaryDirectory(prefix="loadtest-")
+        self.env = dict(os.environ)
+        self.env.update({
+            'DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'loadtest.db')}",
+            'ARCHIVE_DIR': os.path.join(self.directory.name, 'archive'),
+        })
+        self.env.update(env or {})
+        self.process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "Server":
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "loadtest.server:app",
+                "--host", "127.0.0.1", "--port", str(self.port),
+                "--workers", str(self.workers), "--log-level", "warning",
+            ],
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+        )
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("The load-test server exited during startup.")
+            try:
+                if httpx.get(self.url + "/", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError("The load-test server did not start within 60s.")
+
+    def check(self) -> None:
+        if self.process.poll() is not None:
+            raise RuntimeError(f"The load-test server exited with code {self.process.returncode}.")
+
+    def __exit__(self, *_) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.directory.cleanup()
+
+
+def seed(url: str) -> None:
+    """Store (unscored) tweets for every search term through the pipeline."""
+    response = httpx.post(
+        url + "/scrape/pipeline",
+        json={"search_strings": SEARCH_TERMS, "score": False},
+        timeout=300
+    )
+    response.raise_for_status()
+
+
+def run(
+    concurrency: List[int],
+    duration: float = 10.0,
+    mix: str = DEFAULT_MIX,
+    workers: int = 1,
+    port: int = 8765,
+    url: Optional[str] = None,
+    output_dir: str = RESULTS_DIR,
+    label: Optional[str] = None,
+    seed_data: bool = True,
+) -> Dict[str, object]:
+    """Run one load test per concurrency level and save the results."""
+    from loadtest import stubs
+
+    weights = parse_mix(mix)
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    run_id = started_at.strftime('%Y%m%dT%H%M%S') + (f"-{label}" if label else "")
+    results: Dict[str, object] = {
+        'run_id': run_id,
+        'started_at': started_at.isoformat(),
+        'config': {
+            'concurrency': concurrency,
+            'duration_seconds': duration,
+            'mix': weights,
+            'workers': workers if url is None else None,
+            'url': url,
+            'twitter_latency_seconds': stubs.TWITTER_LATENCY,
+            'pages_per_query': stubs.PAGES,
+            'page_size': stubs.PAGE_SIZE,
+            'model_latency_seconds': stubs.MODEL_LATENCY,
+        },
+        'levels': [],
+    }
+
+    server = Server(port, workers) if url is None else None
+    if server is not None:
+        server.__enter__()
+        url = server.url
+    try:
+        if seed_data:
+            seed(url)
+        if server is not None:
+            server.check()
+        for level in concurrency:
+            if server is not None:
+                with MemorySampler(server.process.pid) as sampler:
+                    samples, elapsed = asyncio.run(drive(url, level, duration, weights))
+                memory = sampler.report()
+                server.check()
+            else:
+                samples, elapsed = asyncio.run(drive(url, level, duration, weights))
+                memory = {}
+            summary = summarise(samples, elapsed)
+            summary['concurrency'] = level
+            summary['elapsed_seconds'] = elapsed
+            summary['peak_rss_mb'] = memory
+            summary['endpoints'] = {
+                kind: summarise([s for s in samples if s[0] == kind], elapsed)
+                for kind in weights
+            }
+            results['levels'].append(summary)
+            print(_format_level(run_id, summary))
+    finally:
+        if server is not None:
+            server.__exit__()
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{run_id}.json")
+    with open(path, 'w') as output:
+        json.dump(results, output, indent=2)
+    print(f"Saved results to {path}.")
+    return results
+
+
+def compare(paths: List[str]) -> None:
+    """Print the levels of several saved runs next to each other."""
+    print(f"{'run':<32}{'conc':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>6}{'rss':>9}")
+    for path in paths:
+        with open(path) as saved:
+            results = json.load(saved)
+        for level in results['levels']:
+            print(_format_level(results['run_id'], level))
+
+
+def _format_level(run_id: str, level: Dict[str, object]) -> str:
+    latency = level['latency_ms']
+    rss = max(level['peak_rss_mb'].values(), default=None)
+    cells = [latency[f'p{q}'] for q in PERCENTILES]
+    return (
+        f"{run_id:<32}{level['concurrency']:>6}{level['throughput_rps']:>9.1f}"
+        + "".join(f"{cell:>9.1f}" if cell is not None else f"{'-':>9}" for cell in cells)
+        + f"{level['errors']:>6}"
+        + (f"{rss:>9.1f}" if rss is not None else f"{'-':>9}")
+    )
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="run a load test")
+    run_parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    run_parser.add_argument('--duration', type=float, default=10.0)
+    run_parser.add_argument('--mix', default=DEFAULT_MIX)
+    run_parser.add_argument('--workers', type=int, default=1)
+    run_parser.add_argument('--port', type=int, default=8765)
+    run_parser.add_argument('--url', help="test a running server instead of starting one")
+    run_parser.add_argument('--output-dir', default=RESULTS_DIR)
+    run_parser.add_argument('--label')
+    run_parser.add_argument('--no-seed', dest='seed_data', action='store_false')
+    compare_parser = commands.add_parser('compare', help="compare saved runs")
+    compare_parser.add_argument('paths', nargs='+')
+    arguments = vars(parser.parse_args())
+    command = arguments.pop('command')
+    if command == 'run':
+        run(**arguments)
+    else:
+        compare(arguments['paths'])
@@ -0,0 +1,11 @@
+"""ASGI entry point: app.py's app with the load-test stand-ins installed.
+
+Run with ``uvicorn loadtest.server:app``; ``loadtest.main`` starts it for
+you.
+"""
+
+from loadtest.stubs import install
+
+install()
+
+from app import app  # noqa: E402
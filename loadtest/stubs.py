@@ -0,0 +1,152 @@
+"""Local stand-ins for the Twitter API and the sentiment model.
+
+``install()`` swaps them into the current process so the real endpoints,
+normalisation and database code run unchanged while the two external
+costs become a fixed, configurable latency:
+
+* ``LOADTEST_TWITTER_LATENCY`` seconds per recent-search page, with
+  ``LOADTEST_PAGES`` pages of ``LOADTEST_PAGE_SIZE`` tweets per query;
+* ``LOADTEST_MODEL_LATENCY`` seconds per scored tweet.
+"""
+
+import datetime
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+import types
+
+from typing import Dict, List, Optional
+
+
+TWITTER_LATENCY: float = float(os.environ.get('LOADTEST_TWITTER_LATENCY') or 0.25)
+PAGES: int = int(os.environ.get('LOADTEST_PAGES') or 3)
+PAGE_SIZE: int = int(os.environ.get('LOADTEST_PAGE_SIZE') or 100)
+MODEL_LATENCY: float = float(os.environ.get('LOADTEST_MODEL_LATENCY') or 0.002)
+USERS: int = 200
+
+WORDS: List[str] = [
+    "network", "signal", "outage", "great", "slow", "support", "refund",
+    "fibre", "tower", "billing", "thanks", "worst", "speed", "recharge",
+]
+HASHTAGS: List[str] = ["outage", "5g", "broadband", "customerservice", "fail"]
+LABELS: List[str] = ["negative", "neutral", "positive"]
+
+_tweet_ids = itertools.count(1_700_000_000_000_000_000)
+_tweet_ids_lock = threading.Lock()
+
+
+class FakeTwitterResponse():
+    """The parts of requests.Response used by scrape.twitter."""
+
+    def __init__(self, body: dict) -> None:
+        self.status_code = 200
+        self.content = json.dumps(body).encode()
+        self.headers = {
+            'x-rate-limit-remaining': '100000',
+            'x-rate-limit-reset': str(int(time.time()) + 900),
+        }
+
+    def json(self) -> dict:
+        return json.loads(self.content)
+
+
+def fake_search(url: str, headers: Optional[dict] = None, params: Optional[dict] = None, **_) -> FakeTwitterResponse:
+    """Answer a recent-search request with a synthetic page."""
+    time.sleep(TWITTER_LATENCY)
+    params = params or {}
+    page = int(params.get('next_token') or 0)
+    return FakeTwitterResponse(fake_page(params.get('query', ''), page))
+
+
+def fake_page(query: str, page: int, size: int = PAGE_SIZE, pages: int = PAGES) -> dict:
+    """One page of tweets mentioning ``query`` with their authors."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    with _tweet_ids_lock:
+        tweet_ids = [str(next(_tweet_ids)) for _ in range(size)]
+    tweets = []
+    authors: Dict[str, dict] = {}
+    for i, tweet_id in enumerate(tweet_ids):
+        author_id = str(int(tweet_id) % USERS + 1)
+        words = [WORDS[(int(tweet_id) >> k) % len(WORDS)] for k in range(6)]
+        hashtag = HASHTAGS[int(tweet_id) % len(HASHTAGS)]
+        tweets.append({
+            "id": tweet_id,
+            "author_id": author_id,
+            "created_at": _timestamp(now - datetime.timedelta(seconds=page * size + i)),
+            "reply_settings": "everyone",
+            "text": f"@{query} {' '.join(words)} #{hashtag}",
+            "conversation_id": tweet_id,
+            "possibly_sensitive": False,
+            "lang": "en",
+            "public_metrics": {
+                "retweet_count": i % 7,
+                "reply_count": i % 3,
+                "like_count": i % 11,
+                "quote_count": 0,
+            },
+            "entities": {
+                "mentions": [{"username": query, "id": "1"}],
+                "hashtags": [{"tag": hashtag}],
+            },
+        })
+        authors[author_id] = {
+            "id": author_id,
+            "name": f"User {author_id}",
+            "username": f"user{author_id}",
+            "created_at": "2015-01-01T00:00:00.000Z",
+            "protected": False,
+            "verified": False,
+            "public_metrics": {
+                "followers_count": int(author_id) * 10,
+                "following_count": 100,
+                "tweet_count": 1000,
+                "listed_count": 1,
+            },
+        }
+    meta = {
+        "result_count": size,
+        "newest_id": tweet_ids[0],
+        "oldest_id": tweet_ids[-1],
+    }
+    if page + 1 < pages:
+        meta["next_token"] = str(page + 1)
+    return {"data": tweets, "includes": {"users": list(authors.values())}, "meta": meta}
+
+
+class StubBackend():
+    """Sentiment backend answering after a fixed per-tweet delay."""
+
+    def predict(self, tweets: List[str], batch_size: int = 32) -> List[dict]:
+        time.sleep(MODEL_LATENCY * len(tweets))
+        predictions = []
+        for tweet in tweets:
+            digest = hashlib.blake2b(tweet.encode(), digest_size=2).digest()
+            predictions.append({
+                'label': LABELS[digest[0] % len(LABELS)],
+                'probability': 0.5 + digest[1] / 512,
+            })
+        return predictions
+
+
+def install() -> None:
+    """Route Twitter requests and model inference to the stand-ins."""
+    import analysis.backends
+    import scrape.twitter
+
+    requests = scrape.twitter.requests
+    scrape.twitter.requests = types.SimpleNamespace(
+        get=fake_search,
+        ConnectionError=requests.ConnectionError,
+        Timeout=requests.Timeout,
+    )
+    scrape.twitter._bearer_token = 'loadtest'
+    backend = StubBackend()
+    for name in analysis.backends.BACKENDS:
+        analysis.backends._backends[(name, 'sentiment_multilingual', None)] = backend
+
+
+def _timestamp(moment: datetime.datetime) -> str:
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.000Z')
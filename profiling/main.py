@@ -0,0 +1,243 @@
+"""Opt-in CPU and memory profiling of scrape and analysis runs.
+
+Code paths worth profiling are marked with ``@profiled("<section>")``:
+``response`` (paging through the Twitter API), ``normalise``
+(``DataBaseModel.add_page``), ``commit`` (``Database.commit_data``),
+``analyse`` (``analysis.main.sentiment_tables``) and ``score`` (the
+pipeline's inference stage). Outside a profile run the decorator costs one
+context-variable lookup.
+
+Inside ``with profile_run():`` every marked call on the current context
+(and on worker threads started with a copy of it) is run under cProfile,
+and tracemalloc records how much memory each section allocated. Snapshots
+are only taken when the run starts and ends. When the run ends its
+artifacts are written to ``PROFILE_DIR/<run id>/``:
+
+* ``<section>.prof``: cProfile statistics of all calls of the section,
+  readable with ``pstats`` or snakeviz;
+* ``<section>.txt``: the same, as the top functions by cumulative time;
+* ``run.tracemalloc``: the tracemalloc snapshot taken at the end of the run;
+* ``summary.json``: calls, wall time and memory growth per section, and
+  the top allocation sites of the run.
+
+Enable it per CLI run with ``--profile`` (``scrape.main``,
+``scrape.pipeline``) or per request with an ``X-Profile: 1`` header when
+``PROFILE_REQUESTS`` is set; the response then carries the run id in
+``X-Profile-Run``. Memory figures are process-wide, so they include any
+concurrent work.
+"""
+
+import contextlib
+import contextvars
+import cProfile
+import datetime
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+PROFILE_DIR: str = os.environ.get('PROFILE_DIR') or 'profiles'
+PROFILE_REQUESTS: bool = os.environ.get('PROFILE_REQUESTS', '').lower() in ('1', 'true', 'yes')
+TRACE_FRAMES: int = int(os.environ.get('PROFILE_TRACE_FRAMES') or 10)
+TOP_FUNCTIONS: int = 40
+TOP_ALLOCATIONS: int = 10
+
+_current_run: contextvars.ContextVar = contextvars.ContextVar('profile_run', default=None)
+_thread_state = threading.local()
+_tracing_lock = threading.Lock()
+_tracing_runs: int = 0
+_started_tracing: bool = False
+
+
+class ProfileRun():
+    """Profiles and allocation records of the sections run during one run."""
+
+    def __init__(
+        self,
+        run_id: Optional[str] = None,
+        label: Optional[str] = None,
+        output_dir: str = PROFILE_DIR,
+        memory: bool = True
+    ) -> None:
+        self.run_id = run_id or new_run_id()
+        self.label = label
+        self.directory = os.path.join(output_dir, self.run_id)
+        self.memory = memory
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.sections: Dict[str, Dict[str, float]] = {}
+        self.stats: Dict[str, pstats.Stats] = {}
+        self._started = time.perf_counter()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        """Profile the enclosed block as part of section ``name``."""
+        profile = None
+        if not getattr(_thread_state, 'profiling', False):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                _thread_state.profiling = True
+            except ValueError:
+                # Another profiler is active (Python 3.12+ allows one per
+                # process); record the timing only.
+                profile = None
+        allocated_before = tracemalloc.get_traced_memory()[0] if self.memory else 0
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            if profile is not None:
+                profile.disable()
+                _thread_state.profiling = False
+            allocated = tracemalloc.get_traced_memory()[0] - allocated_before if self.memory else 0
+            self.__record(name, seconds, profile, allocated)
+
+    def __record(self, name, seconds, profile, allocated) -> None:
+        with self._lock:
+            section = self.sections.setdefault(name, {
+                'calls': 0,
+                'profiled_calls': 0,
+                'seconds': 0.0,
+                'allocated_bytes': 0,
+                'max_allocated_bytes': 0,
+            })
+            section['calls'] += 1
+            section['seconds'] += seconds
+            section['allocated_bytes'] += allocated
+            if profile is not None:
+                section['profiled_calls'] += 1
+                if name in self.stats:
+                    self.stats[name].add(profile)
+                else:
+                    self.stats[name] = pstats.Stats(profile)
+            section['max_allocated_bytes'] = max(section['max_allocated_bytes'], allocated)
+
+    def start(self) -> None:
+        if self.memory:
+            _start_tracing()
+            self._baseline = tracemalloc.take_snapshot()
+
+    @contextlib.contextmanager
+    def active(self) -> Iterator['ProfileRun']:
+        """Make this the current run on the context for the enclosed block."""
+        token = _current_run.set(self)
+        try:
+            yield self
+        finally:
+            _current_run.reset(token)
+
+    def finish(self) -> str:
+        """Write the run's artifacts and return their directory."""
+        peak = tracemalloc.get_traced_memory()[1] if self.memory else None
+        snapshot = tracemalloc.take_snapshot() if self.memory else None
+        if self.memory:
+            _stop_tracing()
+        os.makedirs(self.directory, exist_ok=True)
+        summary: Dict[str, object] = {
+            'run_id': self.run_id,
+            'label': self.label,
+            'started_at': self.started_at.isoformat(),
+            'seconds': time.perf_counter() - self._started,
+            'peak_traced_bytes': peak,
+            'sections': {},
+        }
+        if snapshot is not None:
+            snapshot.dump(os.path.join(self.directory, 'run.tracemalloc'))
+            summary['top_allocations'] = _top_allocations(snapshot, self._baseline)
+        with self._lock:
+            for name, section in self.sections.items():
+                section = dict(section)
+                if name in self.stats:
+                    self.stats[name].dump_stats(os.path.join(self.directory, f"{name}.prof"))
+                    report = io.StringIO()
+                    self.stats[name].stream = report
+                    self.stats[name].sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+                    with open(os.path.join(self.directory, f"{name}.txt"), 'w') as output:
+                        output.write(report.getvalue())
+                summary['sections'][name] = section
+        with open(os.path.join(self.directory, 'summary.json'), 'w') as output:
+            json.dump(summary, output, indent=2)
+        print(f"Profile {self.run_id} written to {self.directory}.")
+        return self.directory
+
+
+def new_run_id() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%S-') + uuid.uuid4().hex[:8]
+
+
+def current_run() -> Optional[ProfileRun]:
+    """The profile run active on this context, if any."""
+    return _current_run.get()
+
+
+@contextlib.contextmanager
+def profile_run(
+    run_id: Optional[str] = None,
+    label: Optional[str] = None,
+    output_dir: str = PROFILE_DIR,
+    memory: bool = True
+) -> Iterator[ProfileRun]:
+    """Profile the marked sections run inside the block."""
+    run = ProfileRun(run_id, label, output_dir, memory)
+    run.start()
+    try:
+        with run.active():
+            yield run
+    finally:
+        run.finish()
+
+
+def profiled(name: str) -> Callable:
+    """Mark a function as profile section ``name``."""
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            run = _current_run.get()
+            if run is None:
+                return function(*args, **kwargs)
+            with run.section(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _top_allocations(snapshot, baseline) -> List[Dict[str, object]]:
+    if baseline is not None:
+        stats = snapshot.compare_to(baseline, 'lineno')
+        return [
+            {'line': str(stat.traceback), 'size_diff': stat.size_diff, 'count_diff': stat.count_diff}
+            for stat in stats[:TOP_ALLOCATIONS]
+        ]
+    return [
+        {'line': str(stat.traceback), 'size': stat.size, 'count': stat.count}
+        for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+    ]
+
+
+def _start_tracing() -> None:
+    global _tracing_runs, _started_tracing
+    with _tracing_lock:
+        if _tracing_runs == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            _started_tracing = True
+        _tracing_runs += 1
+
+
+def _stop_tracing() -> None:
+    global _tracing_runs, _started_tracing
+    with _tracing_lock:
+        _tracing_runs -= 1
+        if _tracing_runs == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
@@ -0,0 +1,144 @@
+"""Persisted pagination checkpoints for resumable scrapes.
+
+A checkpoint only moves past a page once that page and every page before
+it have been written, so pages still queued in the pipeline when the
+process dies are fetched again on the next run rather than lost. Re-fetched
+pages are harmless: Database.commit_data skips tweets that are already
+stored.
+
+A scrape the API refused (a non-retryable 4xx, such as a revoked bearer
+token or an expired pagination token) is marked ``failed`` and the next
+run starts afresh instead of resuming from the same token.
+"""
+
+import datetime
+import threading
+
+from typing import Dict, Optional, Set, Tuple
+
+from database.rows import ScrapeCheckpointRow
+
+
+class ScrapeCheckpoints():
+    """Track fetched and written pages per search term and persist progress."""
+
+    def __init__(self, use_database: bool = True) -> None:
+        self.use_database = use_database
+        self.checkpoints: Dict[str, ScrapeCheckpointRow] = {}
+        self._metas: Dict[str, Dict[int, dict]] = {}
+        self._written: Dict[str, Set[int]] = {}
+        self._next_page: Dict[str, int] = {}
+        self._fetched: Dict[str, Tuple[bool, int, bool]] = {}
+        self._versions: Dict[str, int] = {}
+        self._saved: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def start(self, search_term: str) -> Tuple[Optional[str], Optional[str]]:
+        """Return the (next_token, since_id) to start ``search_term`` from.
+
+        An unfinished scrape resumes at its saved token; otherwise (and
+        after a failed one) a new scrape starts at the first page and only
+        asks for tweets newer than the previous complete one.
+        """
+        stored = self.__read(search_term)
+        if stored is not None and stored.status not in ('complete', 'failed') and stored.next_token:
+            checkpoint = stored._replace(status='running')
+            print(f"Resuming {search_term!r} after {stored.pages} pages.")
+        else:
+            checkpoint = ScrapeCheckpointRow(
+                search_term,
+                'running',
+                stored.since_id if stored is not None else None,
+                None,
+                None,
+                0,
+                0
+            )
+        with self._lock:
+            self.checkpoints[search_term] = checkpoint
+            self._metas[search_term] = {}
+            self._written[search_term] = set()
+            self._next_page[search_term] = 0
+            self._fetched.pop(search_term, None)
+        return checkpoint.next_token, checkpoint.since_id
+
+    def fetched(self, search_term: str, page_index: int, meta: dict) -> None:
+        """Record the ``meta`` of a page handed to the pipeline."""
+        with self._lock:
+            self._metas[search_term][page_index] = meta
+
+    def written(self, search_term: str, page_index: int) -> None:
+        """Record a committed page and persist the checkpoint if it moved."""
+        update = None
+        with self._lock:
+            self._written[search_term].add(page_index)
+            checkpoint = self.checkpoints[search_term]
+            moved = False
+            while self._next_page[search_term] in self._written[search_term]:
+                meta = self._metas[search_term].pop(self._next_page[search_term])
+                checkpoint = checkpoint._replace(
+                    newest_id=checkpoint.newest_id or meta.get('newest_id'),
+                    next_token=meta.get('next_token'),
+                    pages=checkpoint.pages + 1,
+                    tweets=checkpoint.tweets + meta.get('result_count', 0)
+                )
+                self._next_page[search_term] += 1
+                moved = True
+            self.checkpoints[search_term] = checkpoint
+            if moved:
+                update = self.__update(search_term)
+        if update is not None:
+            self.__save(search_term, *update)
+
+    def finished(self, search_term: str, complete: bool, pages: int, failed: bool = False) -> None:
+        """Record the end of a fetch after ``pages`` pages."""
+        with self._lock:
+            self._fetched[search_term] = (complete, pages, failed)
+            update = self.__update(search_term)
+        self.__save(search_term, *update)
+
+    def __update(self, search_term: str) -> Tuple[ScrapeCheckpointRow, int]:
+        """Next checkpoint of ``search_term`` and its version; call with _lock held."""
+        checkpoint = self.checkpoints[search_term]
+        if search_term in self._fetched:
+            complete, pages, failed = self._fetched[search_term]
+            if self._next_page[search_term] >= pages:
+                if failed:
+                    checkpoint = checkpoint._replace(status='failed')
+                elif complete:
+                    checkpoint = checkpoint._replace(
+                        status='complete',
+                        since_id=checkpoint.newest_id or checkpoint.since_id,
+                        newest_id=None,
+                        next_token=None
+                    )
+                else:
+                    checkpoint = checkpoint._replace(status='interrupted')
+        checkpoint = checkpoint._replace(
+            updated_at=datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        )
+        self.checkpoints[search_term] = checkpoint
+        self._versions[search_term] = self._versions.get(search_term, 0) + 1
+        return checkpoint, self._versions[search_term]
+
+    def __save(self, search_term: str, checkpoint: ScrapeCheckpointRow, version: int) -> None:
+        # Written outside _lock so that the database round trip does not
+        # hold up the pipeline; a checkpoint older than the last one saved
+        # is dropped rather than written over it.
+        if not self.use_database:
+            return
+        from database.database import save_checkpoint
+
+        with self._save_lock:
+            if version <= self._saved.get(search_term, 0):
+                return
+            save_checkpoint(checkpoint)
+            self._saved[search_term] = version
+
+    def __read(self, search_term: str) -> Optional[ScrapeCheckpointRow]:
+        if not self.use_database:
+            return self.checkpoints.get(search_term)
+        from database.database import read_checkpoint
+
+        return read_checkpoint(search_term)
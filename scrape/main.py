@@ -1,19 +1,76 @@
 """Collect tweets."""
-from typing import Dict, List
+import contextvars
 
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from database.cache import user_cache
 from database.database import Database
 from database.models import DataBaseModel
+from scrape.normalise import PageNormaliser
 from scrape.twitter import Response
 
 
 def scrape(search_term: str) -> Dict[str, List[str]]:
     """Scrape tweets."""
-    response: Response = Response(search_term)
-    database_tables: DataBaseModel = DataBaseModel(response)
+    with PageNormaliser(user_cache) as normaliser:
+        Response(search_term, on_page=normaliser.page_handler(search_term))
+        database_tables: DataBaseModel = normaliser.result(search_term)
     tweet_dict: Dict[str, List[str]] = __get_tweet_dict(database_tables)
     return tweet_dict
 
 
+MAX_SCRAPE_WORKERS: int = 4
+
+
+def collect(
+    search_terms: List[str],
+    max_workers: Optional[int] = None
+) -> DataBaseModel:
+    """Fetch several search terms concurrently and normalise them together.
+
+    All fetches share the process-wide rate limiter and one pool of
+    normalisation workers. Users and tweets returned for more than one term
+    are normalised once.
+    """
+    search_terms = list(dict.fromkeys(search_terms))
+    workers = min(max_workers or MAX_SCRAPE_WORKERS, len(search_terms)) or 1
+    with PageNormaliser(user_cache) as normaliser:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            fetches = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    Response,
+                    search_term,
+                    on_page=normaliser.page_handler(search_term, term_index)
+                )
+                for term_index, search_term in enumerate(search_terms)
+            ]
+            for fetch in fetches:
+                fetch.result()
+        return normaliser.result()
+
+
+def scrape_many(
+    search_terms: List[str],
+    max_workers: Optional[int] = None
+) -> Dict[str, Dict[str, List[str]]]:
+    """Scrape tweets for several search terms."""
+    database_tables: DataBaseModel = collect(search_terms, max_workers)
+    return {
+        'tweets': __get_tweet_dict(database_tables),
+        'tweet_search_terms': __get_search_term_dict(database_tables),
+    }
+
+
+def __get_search_term_dict(database_tables: DataBaseModel) -> Dict[str, List[str]]:
+    """List the search terms that matched each tweet."""
+    return {
+        'tweet_id': [row.tweet_id for row in database_tables.tweet_search_term_list],
+        'search_term': [row.search_term for row in database_tables.tweet_search_term_list],
+    }
+
+
 def __get_tweet_dict(database_tables: DataBaseModel) -> Dict[str, List[str]]:
     """Convert processed response to Python dictionary."""
     return_dict:  Dict[str, List[str]] = {
@@ -32,9 +89,9 @@ def __get_tweet_dict(database_tables: DataBaseModel) -> Dict[str, List[str]]:
     for tweet in database_tables.tweet_object_list:
         for _key in return_dict.keys():
             if _key == "created_at":
-                return_dict[_key].append(tweet.__dict__[_key].strftime('%d-%m-%Y %H:%M:%S.%f %z %Z'))
+                return_dict[_key].append(getattr(tweet, _key).strftime('%d-%m-%Y %H:%M:%S.%f %z %Z'))
             else:
-                return_dict[_key].append(tweet.__dict__[_key])
+                return_dict[_key].append(getattr(tweet, _key))
 
     return return_dict
 
@@ -47,5 +104,20 @@ def database_write(database_model: DataBaseModel) -> None:
 
 
 if __name__ == '__main__':
-    response = scrape("BSNL")
-    database_write(response)
+    import argparse
+    import contextlib
+
+    from profiling.main import PROFILE_DIR, profile_run
+
+    parser = argparse.ArgumentParser(description="Scrape tweets and write them to the database.")
+    parser.add_argument('search_terms', nargs='*', default=["BSNL"])
+    parser.add_argument('--max-workers', type=int)
+    parser.add_argument('--profile', action='store_true', help="write CPU and memory profiles of the run")
+    parser.add_argument('--profile-dir', default=PROFILE_DIR)
+    arguments = parser.parse_args()
+    profile = profile_run(
+        label="scrape.main " + " ".join(arguments.search_terms),
+        output_dir=arguments.profile_dir
+    ) if arguments.profile else contextlib.nullcontext()
+    with profile:
+        database_write(collect(arguments.search_terms, arguments.max_workers))
@@ -0,0 +1,74 @@
+"""Normalise pages on worker threads while later pages download."""
+
+import contextvars
+import os
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from database.models import DataBaseModel
+
+
+NORMALISE_WORKERS: int = int(os.environ.get('NORMALISE_WORKERS') or 2)
+
+
+class PageNormaliser():
+    """Pool of normalisation workers fed by ``Response(on_page=...)``.
+
+    Every decoded page is normalised into its own DataBaseModel on a worker
+    thread as soon as it arrives, so parsing overlaps with the download of
+    the following pages (and with the users-table lookups of the user
+    cache). ``result()`` merges the page models in (term, page) order,
+    which deduplicates tweets and users exactly like a single pass would.
+
+    Use it as a context manager so that the workers are shut down even
+    when fetching a page fails.
+    """
+
+    def __init__(
+        self,
+        user_cache=None,
+        max_workers: int = NORMALISE_WORKERS
+    ) -> None:
+        self.user_cache = user_cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures: List[Tuple[Tuple[int, int], Future]] = []
+        self._lock = threading.Lock()
+        self._pages: dict = {}
+
+    def __enter__(self) -> "PageNormaliser":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # Pages still queued after a failure are not worth normalising.
+        self.executor.shutdown(wait=True, cancel_futures=exc_type is not None)
+
+    def page_handler(self, search_term: str, term_index: int = 0):
+        """Return an ``on_page`` callback for one search term's Response."""
+        def on_page(body: dict) -> None:
+            with self._lock:
+                page_index = self._pages.get(term_index, 0)
+                self._pages[term_index] = page_index + 1
+                future = self.executor.submit(
+                    contextvars.copy_context().run, self.normalise, search_term, body
+                )
+                self.futures.append(((term_index, page_index), future))
+        return on_page
+
+    def normalise(self, search_term: str, body: dict) -> DataBaseModel:
+        model = DataBaseModel([], self.user_cache)
+        model.add_page(
+            body.get("data", []),
+            [body["includes"]] if "includes" in body else [],
+            search_term
+        )
+        return model
+
+    def result(self, search_term: Optional[str] = None) -> DataBaseModel:
+        """Wait for every page and merge them into one DataBaseModel."""
+        merged = DataBaseModel([], self.user_cache)
+        merged.search_term = search_term
+        for _, future in sorted(self.futures, key=lambda item: item[0]):
+            merged.merge(future.result())
+        return merged
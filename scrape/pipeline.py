@@ -0,0 +1,324 @@
+"""Run fetch, normalise, score and store as overlapping pipeline stages.
+
+Each stage is a small pool of threads connected to the next one by a
+bounded queue::
+
+    fetch --pages--> normalise --models--> score --models--> store
+
+When a stage falls behind, its input queue fills up and the stage before it
+blocks on ``put``, so memory stays bounded by the queue sizes and the run
+takes about as long as its slowest stage rather than the sum of all four.
+Tweets seen on an earlier page of the run are dropped before scoring, so
+each one is scored and written once. Users are too, except for the authors
+of a page's own tweets, which travel with the page so that it never
+depends on another page being stored first. A page's matches of tweets
+claimed by another page are held back until that page is stored.
+
+With ``resume`` (the default) each term's pagination is checkpointed as
+its pages are written (see ``scrape.checkpoint``): an interrupted scrape
+continues from its last written page and a finished one only fetches
+newer tweets next time.
+"""
+
+import contextvars
+import os
+import queue
+import threading
+import time
+
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from database.cache import user_cache
+from database.database import Database
+from database.models import DataBaseModel, UniqueKeys
+from database.rows import TweetSentimentRow
+from profiling.main import profiled
+from scrape.checkpoint import ScrapeCheckpoints
+from scrape.main import MAX_SCRAPE_WORKERS
+from scrape.normalise import NORMALISE_WORKERS
+from scrape.twitter import Response
+
+
+PIPELINE_QUEUE_SIZE: int = int(os.environ.get('PIPELINE_QUEUE_SIZE') or 8)
+SCORE_WORKERS: int = int(os.environ.get('SCORE_WORKERS') or 1)
+STORE_WORKERS: int = int(os.environ.get('STORE_WORKERS') or 1)
+
+_DONE = object()
+
+
+class Pipeline():
+    """Scrape several search terms and store (and score) them as they arrive.
+
+    ``score=False`` skips inference; otherwise every new tweet gets a
+    ``tweet_sentiment`` row from the configured backend.
+    """
+
+    def __init__(
+        self,
+        search_terms: List[str],
+        fetch_workers: int = MAX_SCRAPE_WORKERS,
+        normalise_workers: int = NORMALISE_WORKERS,
+        score_workers: int = SCORE_WORKERS,
+        store_workers: int = STORE_WORKERS,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        score: bool = True,
+        backend: Optional[str] = None,
+        model: str = "sentiment_multilingual",
+        resume: bool = True,
+        user_cache=user_cache
+    ) -> None:
+        self.search_terms = list(dict.fromkeys(search_terms))
+        self.workers: Dict[str, int] = {
+            'fetch': max(1, min(fetch_workers, len(self.search_terms))),
+            'normalise': max(1, normalise_workers),
+            'score': max(1, score_workers) if score else 0,
+            'store': max(1, store_workers),
+        }
+        self.queue_size = queue_size
+        self.score = score
+        self.backend = backend
+        self.model = model
+        self.user_cache = user_cache
+        self.checkpoints: Optional[ScrapeCheckpoints] = ScrapeCheckpoints() if resume else None
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.busy: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+        self._unique = UniqueKeys()
+        self._search_term_matches: set = set()
+        self._stored_tweets: set = set()
+        self._held_matches: Dict[str, list] = defaultdict(list)
+        self._finished: Dict[str, int] = defaultdict(int)
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+
+    def run(self) -> Dict[str, object]:
+        """Run every stage to completion and return the run's statistics."""
+        started = time.perf_counter()
+        terms: queue.Queue = queue.Queue()
+        for search_term in self.search_terms:
+            terms.put(search_term)
+        pages: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        models: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        scored: queue.Queue = queue.Queue(maxsize=self.queue_size) if self.score else models
+
+        stages = [
+            ('fetch', self.__fetch, terms, pages, 'normalise'),
+            ('normalise', self.__normalise, pages, models, 'score' if self.score else 'store'),
+            ('store', self.__store, scored, None, None),
+        ]
+        if self.score:
+            stages.insert(2, ('score', self.__score, models, scored, 'store'))
+
+        threads = []
+        for stage, work, inbox, outbox, downstream in stages:
+            for i in range(self.workers[stage]):
+                # Each worker runs in a copy of the caller's context so that
+                # an active profile run follows it.
+                thread = threading.Thread(
+                    target=contextvars.copy_context().run,
+                    args=(self.__worker, stage, work, inbox, outbox, downstream),
+                    name=f"pipeline-{stage}-{i}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+        for thread in threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+        elapsed = time.perf_counter() - started
+        print(f"Pipeline finished in {elapsed:.2f}s.")
+        return {
+            'search_terms': self.search_terms,
+            'pages': self.counts['pages'],
+            'tweets': self.counts['tweets'],
+            'users': self.counts['users'],
+            'scored': self.counts['scored'],
+            'elapsed_seconds': elapsed,
+            'busy_seconds': dict(self.busy),
+            'workers': dict(self.workers),
+        }
+
+    def __worker(self, stage, work, inbox, outbox, downstream) -> None:
+        try:
+            while not self._stop.is_set():
+                if stage == 'fetch':
+                    try:
+                        item = inbox.get_nowait()
+                    except queue.Empty:
+                        break
+                else:
+                    item = self.__get(inbox)
+                    if item is _DONE:
+                        break
+                started = time.perf_counter()
+                work(item, outbox)
+                with self._lock:
+                    self.busy[stage] += time.perf_counter() - started
+        except BaseException as error:
+            with self._lock:
+                self._errors.append(error)
+            self._stop.set()
+        finally:
+            with self._lock:
+                self._finished[stage] += 1
+                last = self._finished[stage] == self.workers[stage]
+            if last and downstream is not None:
+                # The last worker out tells every downstream worker to stop.
+                for _ in range(self.workers[downstream]):
+                    self.__put(outbox, _DONE)
+
+    def __get(self, inbox: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def __put(self, outbox: queue.Queue, item) -> None:
+        # Blocks while the next stage is behind; gives up once the run is
+        # stopped so a failed stage cannot leave the others hanging.
+        while not self._stop.is_set():
+            try:
+                outbox.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def __fetch(self, search_term: str, pages: queue.Queue) -> None:
+        next_token, since_id = None, None
+        if self.checkpoints is not None:
+            next_token, since_id = self.checkpoints.start(search_term)
+        page_count = [0]
+
+        def on_page(body: dict) -> None:
+            if self._stop.is_set():
+                raise RuntimeError("Pipeline stopped.")
+            page_index = page_count[0]
+            page_count[0] += 1
+            if self.checkpoints is not None:
+                self.checkpoints.fetched(search_term, page_index, body.get("meta", {}))
+            self.__put(pages, (search_term, page_index, body))
+        response = Response(
+            search_term, on_page=on_page, next_token=next_token, since_id=since_id
+        )
+        if self.checkpoints is not None:
+            self.checkpoints.finished(
+                search_term, response.complete, response.pages, response.failed
+            )
+
+    def __normalise(self, page, models: queue.Queue) -> None:
+        search_term, page_index, body = page
+        model_ = DataBaseModel([], self.user_cache)
+        model_.add_page(
+            body.get("data", []),
+            [body["includes"]] if "includes" in body else [],
+            search_term
+        )
+        # Keep only what no earlier page of this run produced; merge()
+        # updates the shared keys, so concurrent pages never both win.
+        new = DataBaseModel([], self.user_cache)
+        with self._lock:
+            new.unique = self._unique
+            new.search_term_matches = self._search_term_matches
+            new.merge(model_)
+            # Matches of tweets claimed by a page that is not stored yet
+            # would reference a missing tweet; __store sends them later.
+            claimed = {tweet.tweet_id for tweet in new.tweet_object_list}
+            matches = []
+            for row in new.tweet_search_term_list:
+                if row.tweet_id in claimed or row.tweet_id in self._stored_tweets:
+                    matches.append(row)
+                else:
+                    self._held_matches[row.tweet_id].append(row)
+            new.tweet_search_term_list = matches
+            self.counts['pages'] += 1
+            self.counts['tweets'] += len(new.tweet_object_list)
+            self.counts['users'] += len(new.user_list)
+        # Pages reach the store in any order, so the page that claimed a
+        # user may commit after this one. Carry the authors of this page's
+        # tweets too; they are upserted, so writing them twice is harmless.
+        needed = {tweet.author_id for tweet in new.tweet_object_list}
+        needed -= {user.user_id for user in new.user_list}
+        new.user_list += [user for user in model_.user_list if user.user_id in needed]
+        for name in ('user_url_object_list', 'user_hashtag_list', 'user_mention_list'):
+            getattr(new, name).extend(
+                row for row in getattr(model_, name) if row.user_id in needed
+            )
+        # Empty pages still travel on so that their checkpoint advances.
+        self.__put(models, (new, [], (search_term, page_index)))
+
+    @profiled("score")
+    def __score(self, item, scored: queue.Queue) -> None:
+        from analysis.backends import get_backend
+        from analysis.main import SENTIMENT_VALUES
+
+        model_, rows, page = item
+        tweets = model_.tweet_object_list
+        if tweets:
+            predictions = get_backend(self.backend, self.model).predict(
+                [tweet.tweet_text for tweet in tweets]
+            )
+            rows = [
+                TweetSentimentRow(
+                    tweet.tweet_id,
+                    SENTIMENT_VALUES[prediction['label']],
+                    prediction['probability'],
+                    self.model
+                )
+                for tweet, prediction in zip(tweets, predictions)
+            ]
+        with self._lock:
+            self.counts['scored'] += len(rows)
+        self.__put(scored, (model_, rows, page))
+
+    def __store(self, item, _) -> None:
+        model_, rows, (search_term, page_index) = item
+        Database(model_.get_tables() + [rows]).commit_data()
+        with self._lock:
+            held = []
+            for tweet in model_.tweet_object_list:
+                self._stored_tweets.add(tweet.tweet_id)
+                held += self._held_matches.pop(tweet.tweet_id, [])
+        if held:
+            matches = DataBaseModel([], self.user_cache)
+            matches.tweet_search_term_list = held
+            Database(matches.get_tables()).commit_data()
+        if self.checkpoints is not None:
+            self.checkpoints.written(search_term, page_index)
+
+
+def run_pipeline(search_terms: List[str], **options) -> Dict[str, object]:
+    """Scrape, score and store ``search_terms`` with a Pipeline."""
+    return Pipeline(search_terms, **options).run()
+
+
+if __name__ == '__main__':
+    import argparse
+    import contextlib
+
+    from profiling.main import PROFILE_DIR, profile_run
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('search_terms', nargs='+')
+    parser.add_argument('--fetch-workers', type=int, default=MAX_SCRAPE_WORKERS)
+    parser.add_argument('--normalise-workers', type=int, default=NORMALISE_WORKERS)
+    parser.add_argument('--score-workers', type=int, default=SCORE_WORKERS)
+    parser.add_argument('--store-workers', type=int, default=STORE_WORKERS)
+    parser.add_argument('--queue-size', type=int, default=PIPELINE_QUEUE_SIZE)
+    parser.add_argument('--no-score', dest='score', action='store_false')
+    parser.add_argument('--no-resume', dest='resume', action='store_false')
+    parser.add_argument('--backend', choices=('torch', 'onnx'))
+    parser.add_argument('--profile', action='store_true', help="write CPU and memory profiles of the run")
+    parser.add_argument('--profile-dir', default=PROFILE_DIR)
+    arguments = vars(parser.parse_args())
+    search_terms = arguments.pop('search_terms')
+    profile = profile_run(
+        label="scrape.pipeline " + " ".join(search_terms),
+        output_dir=arguments.pop('profile_dir')
+    ) if arguments.pop('profile') else contextlib.nullcontext()
+    with profile:
+        print(run_pipeline(search_terms, **arguments))
@@ -1,11 +1,20 @@
 import base64
 from dotenv import load_dotenv
 import os
+import random
 import requests
+import threading
 import time
-from typing import List
+from typing import Callable, Optional, List
 import urllib
 
+from profiling.main import profiled
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
 
 class AuthToken():
     """Generate OAuth2 token to authenticate with Twitter APIv2."""
@@ -42,6 +51,58 @@ class AuthToken():
         return self._bearer_token
 
 
+_bearer_token: Optional[str] = None
+_bearer_token_lock = threading.Lock()
+
+
+def get_bearer_token() -> str:
+    """Return the process-wide bearer token, authenticating once."""
+    global _bearer_token
+    with _bearer_token_lock:
+        if _bearer_token is None:
+            _bearer_token = AuthToken().get_bearer_token()
+    return _bearer_token
+
+
+class RateLimiter():
+    """Recent-search rate limit shared by every Response in the process.
+
+    Twitter counts requests per app, so concurrent scrapes draw on one
+    budget: once the last response reported no remaining requests, callers
+    block until the reported reset time.
+    """
+
+    def __init__(self) -> None:
+        self.remaining: Optional[int] = None
+        self.reset_time: float = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self.remaining is not None and self.remaining <= 0:
+                wait = self.reset_time - time.time() + 1
+                if wait > 0:
+                    print(f"Sleeping for {wait} seconds.")
+                    time.sleep(wait)
+                self.remaining = None
+            elif self.remaining is not None:
+                self.remaining -= 1
+
+    def update(self, header) -> None:
+        if "x-rate-limit-remaining" not in header:
+            return
+        with self._lock:
+            self.remaining = int(header["x-rate-limit-remaining"])
+            self.reset_time = int(header["x-rate-limit-reset"])
+
+
+rate_limiter = RateLimiter()
+
+MAX_RETRIES: int = int(os.environ.get('SCRAPE_MAX_RETRIES') or 5)
+BACKOFF_SECONDS: float = float(os.environ.get('SCRAPE_BACKOFF_SECONDS') or 2.0)
+MAX_BACKOFF_SECONDS: float = 300.0
+
+
 class Request():
     """Request model."""
 
@@ -60,7 +121,7 @@ class Request():
         self.search_query = self.__create_search_query()
 
     def __create_request_header(self):
-        bearer_token = AuthToken().get_bearer_token()
+        bearer_token = get_bearer_token()
         request_header = {
             "Authorization": f"Bearer {bearer_token}",
             "Accept-Encoding": "gzip",
@@ -94,39 +155,96 @@ class Request():
 class Response():
     """CollectResponse model."""
 
-    def __init__(self, search_term: str) -> None:
+    @profiled("response")
+    def __init__(
+        self,
+        search_term: str,
+        limiter: RateLimiter = rate_limiter,
+        on_page: Optional[Callable[[dict], None]] = None,
+        next_token: Optional[str] = None,
+        since_id: Optional[str] = None,
+        max_retries: int = MAX_RETRIES
+    ) -> None:
+        """Page through the recent-search results for ``search_term``.
+
+        Each page body is decoded once. With ``on_page``, decoded pages are
+        handed to the callback as they arrive instead of being kept in
+        ``raw_data_list``/``raw_includes_list``.
+
+        Paging starts at ``next_token`` when resuming an interrupted scrape.
+        Connection errors, 429 and 5xx responses are retried up to
+        ``max_retries`` times in a row with exponential backoff; ``complete``
+        tells whether the last page was reached and ``failed`` whether the
+        API refused the request (any other 4xx), which retrying the same
+        request cannot fix.
+        """
         self.SEARCH_TWEET_URL: str = "https://api.twitter.com/2/tweets/search/recent"
         self.search_term: str = search_term
+        self.limiter: RateLimiter = limiter
+        self.on_page = on_page
+        self.max_retries: int = max_retries
         self.raw_data_list: List[dict] = []
         self.raw_includes_list: List[dict] = []
         self.limit_rate_available: int = 1
         self.limit_rate_reset_time: int = 1
-        self.next_token = None
-        self.since_id = None
+        self.next_token = next_token
+        self.since_id = since_id
+        self.pages: int = 0
+        self.complete: bool = False
+        self.failed: bool = False
         self.__get_response()
 
     def __get_response(self):
+        failures = 0
         while True:
             request_ = Request(
                 self.search_term,
                 self.next_token,
                 self.since_id
             )
-            response = requests.get(
-                self.SEARCH_TWEET_URL,
-                headers=request_.get_request_header(),
-                params=request_.get_request_params(),
-            )
-            self.__process_data(response)
+            self.limiter.acquire()
+            try:
+                response = requests.get(
+                    self.SEARCH_TWEET_URL,
+                    headers=request_.get_request_header(),
+                    params=request_.get_request_params(),
+                )
+            except (requests.ConnectionError, requests.Timeout) as error:
+                print(f"Request failed: {error}")
+                response = None
             print("Fetching data.")
-            if response.status_code == 200:
-                if self.__process_meta(response.json()["meta"]):
+            if response is not None and response.status_code == 200:
+                failures = 0
+                body = loads(response.content)
+                self.pages += 1
+                self.__process_data(body)
+                if self.__process_meta(body["meta"]):
+                    self.complete = True
                     break
                 self.__process_headers(response.headers)
+            elif self.__retryable(response) and failures < self.max_retries:
+                self.__back_off(response, failures)
+                failures += 1
             else:
-                print(f"Failed with status code {response.status_code}")
+                if response is not None:
+                    print(f"Failed with status code {response.status_code}")
+                    self.failed = not self.__retryable(response)
                 break
 
+    @staticmethod
+    def __retryable(response) -> bool:
+        return response is None or response.status_code == 429 or response.status_code >= 500
+
+    def __back_off(self, response, failures: int) -> None:
+        if response is not None and response.status_code == 429 and "x-rate-limit-remaining" in response.headers:
+            # The limiter now holds the reset time and sleeps until then.
+            self.__process_headers(response.headers)
+            return
+        wait = min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** failures)
+        wait *= random.uniform(0.5, 1.0)
+        print(f"Retrying in {wait:.1f} seconds.")
+        time.sleep(wait)
+
     def __process_meta(self, response_meta):
         if response_meta["result_count"] == 0:
             print("Fetched all tweets.")
@@ -138,19 +256,16 @@ class Response():
             return True
 
     def __process_headers(self, header):
-        self.limit_rate_available = header["x-rate-limit-remaining"]
-        if self.limit_rate_available == 0:
-            self.limit_rate_reset_time = (
-                int(header["x-rate-limit-reset"]) - time.time() + 1
-            )
-            print(f"Sleeping for {self.limit_rate_reset_time} seconds.")
-            time.sleep(self.limit_rate_reset_time)
-
-    def __process_data(self, response):
-        data_ = response.json()["data"]
-        includes_ = response.json()["includes"]
-        self.raw_data_list += data_
-        self.raw_includes_list.append(includes_)
+        self.limiter.update(header)
+        self.limit_rate_available = self.limiter.remaining
+        self.limit_rate_reset_time = self.limiter.reset_time
+
+    def __process_data(self, body):
+        if self.on_page is not None:
+            self.on_page(body)
+            return
+        self.raw_data_list += body.get("data", [])
+        self.raw_includes_list.append(body.get("includes", {}))
 
     def get_raw_data_list(self):
         return self.raw_data_list
@@ -0,0 +1,176 @@
+"""Unit tests for the monthly Parquet archive."""
+
+import datetime
+import os
+
+import pytest
+
+from sqlalchemy import func, select
+from typing import List
+
+import database.archive
+import database.database
+from database.archive import (
+    _arrow_schema,
+    archive_month,
+    archived_months,
+    month_start,
+    read_archived_tweets,
+    tweet_tables,
+)
+from database.models import ArchivePart, Tweet, TweetSearchTerm
+
+
+def test_month_start_0() -> None:
+    """Months are counted back across year boundaries."""
+    moment = datetime.datetime(2023, 2, 14, 9, 30)
+    assert month_start(moment) == datetime.datetime(2023, 2, 1)
+    assert month_start(moment, 3) == datetime.datetime(2022, 11, 1)
+    assert month_start(moment, -11) == datetime.datetime(2024, 1, 1)
+
+
+def test_tweet_tables_0() -> None:
+    """Every table referencing tweets is archived with tweet_table."""
+    tables = {table.name: column for table, column in tweet_tables()}
+    assert tables["tweet_table"] == "tweet_id"
+    assert tables["tweet_entity_hashtags"] == "originating_tweet_id"
+    assert tables["tweet_search_terms"] == "tweet_id"
+    assert "users" not in tables
+
+
+def use_database(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("DATABASE_URI", f"sqlite:///{tmp_path / 'tweets.db'}")
+    monkeypatch.setattr(database.database, "_engine", None)
+    # Parts go to the default ARCHIVE_DIR, relative to the working directory.
+    monkeypatch.chdir(tmp_path)
+
+
+def store_tweets(created_at: List[datetime.datetime]) -> None:
+    with database.database.session_scope() as session:
+        for i, moment in enumerate(created_at):
+            session.add(Tweet("10", str(i), moment, "everyone", f"tweet {i}", str(i),
+                              False, 0, 0, 0, 0, "en", None, "BSNL"))
+            session.add(TweetSearchTerm(str(i), "BSNL"))
+
+
+def test_read_archived_tweets_0(monkeypatch, tmp_path) -> None:
+    """Archived months are filtered like the database query."""
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    use_database(monkeypatch, tmp_path)
+    schema = _arrow_schema(Tweet.__table__)
+    rows = {name: [None, None] for name in schema.names}
+    rows["tweet_id"] = ["1", "2"]
+    rows["search_term"] = ["BSNL", "Jio"]
+    rows["created_at"] = [datetime.datetime(2022, 11, 2), datetime.datetime(2022, 11, 20)]
+    month = tmp_path / "tweet_table" / "2022-11"
+    os.makedirs(month)
+    pq.write_table(pa.table(rows, schema=schema), month / "part-0.parquet")
+    pq.write_table(pa.table(rows, schema=schema), month / "part-1.parquet")
+    with database.database.session_scope() as session:
+        session.add(ArchivePart(os.path.join("tweet_table", "2022-11", "part-0.parquet"),
+                                "tweet_table", "2022-11", 2))
+
+    def read(**filters):
+        return [
+            tweet_id
+            for chunk in read_archived_tweets(
+                ["tweet_id", "created_at"], archive_dir=str(tmp_path), **filters
+            )
+            for tweet_id in chunk["tweet_id"]
+        ]
+
+    # part-1 is not listed in archive_parts and is not read.
+    assert read() == ["1", "2"]
+    assert read(search_term="Jio") == ["2"]
+    assert read(start_time=datetime.datetime(2022, 11, 10)) == ["2"]
+    assert read(start_time=datetime.datetime(2022, 12, 1)) == []
+
+
+def test_archive_month_0(monkeypatch, tmp_path) -> None:
+    """A month is streamed to Parquet in chunks and leaves the database."""
+    pyarrow = pytest.importorskip("pyarrow")
+    pytest.importorskip("pyarrow.parquet")
+    use_database(monkeypatch, tmp_path)
+    store_tweets([datetime.datetime(2022, 11, 1 + i) for i in range(5)] + [datetime.datetime(2022, 12, 1)])
+    counts = archive_month(datetime.datetime(2022, 11, 1), datetime.datetime(2022, 12, 1), chunk_size=2)
+    assert counts["tweet_table"] == 5
+    assert counts["tweet_search_terms"] == 5
+    assert archived_months() == ["2022-11"]
+    part, = tmp_path.glob("archive/tweet_table/2022-11/*.parquet")
+    assert pyarrow.parquet.ParquetFile(part).num_row_groups == 3
+    tweet_ids = [tweet_id for chunk in database.database.read_tweets() for tweet_id in chunk["tweet_id"]]
+    assert tweet_ids == ["0", "1", "2", "3", "4", "5"]
+    with database.database.session_scope() as session:
+        assert session.execute(select(func.count()).select_from(Tweet)).scalar() == 1
+        assert session.execute(select(func.count()).select_from(TweetSearchTerm)).scalar() == 1
+
+
+def test_archive_month_1(monkeypatch, tmp_path) -> None:
+    """A run that fails before its delete commits archives nothing."""
+    pytest.importorskip("pyarrow")
+    use_database(monkeypatch, tmp_path)
+    store_tweets([datetime.datetime(2022, 11, 2), datetime.datetime(2022, 11, 3)])
+    start, end = datetime.datetime(2022, 11, 1), datetime.datetime(2022, 12, 1)
+    write_part = database.archive._write_part
+    calls = []
+
+    def failing_write_part(*args):
+        calls.append(write_part(*args))
+        if len(calls) == 2:
+            # A part of an earlier run that crashed before committing.
+            os.makedirs(tmp_path / "archive" / "tweet_table" / "2022-11", exist_ok=True)
+            (tmp_path / "archive" / "tweet_table" / "2022-11" / "part-1.parquet").write_bytes(b"")
+            raise RuntimeError("crash")
+        return calls[-1]
+
+    monkeypatch.setattr(database.archive, "_write_part", failing_write_part)
+    with pytest.raises(RuntimeError):
+        archive_month(start, end)
+    assert archived_months() == []
+    assert not list(tmp_path.glob("archive/*/2022-11/*.parquet"))
+    tweet_ids = [tweet_id for chunk in database.database.read_tweets() for tweet_id in chunk["tweet_id"]]
+    assert tweet_ids == ["0", "1"]
+
+    monkeypatch.setattr(database.archive, "_write_part", write_part)
+    assert archive_month(start, end)["tweet_table"] == 2
+    assert len(list(tmp_path.glob("archive/tweet_table/2022-11/*.parquet"))) == 1
+    tweet_ids = [tweet_id for chunk in database.database.read_tweets() for tweet_id in chunk["tweet_id"]]
+    assert tweet_ids == ["0", "1"]
+
+
+def test_read_tweets_0(monkeypatch, tmp_path) -> None:
+    """An empty tweet id selection reads neither archived nor hot tweets."""
+    pytest.importorskip("pyarrow")
+    use_database(monkeypatch, tmp_path)
+    store_tweets([datetime.datetime(2022, 11, 2), datetime.datetime(2022, 12, 2)])
+    archive_month(datetime.datetime(2022, 11, 1), datetime.datetime(2022, 12, 1))
+    assert list(database.database.read_tweets(tweet_ids=[])) == []
+    tweet_ids = [
+        tweet_id for chunk in database.database.read_tweets(tweet_ids=["0", "1"])
+        for tweet_id in chunk["tweet_id"]
+    ]
+    assert tweet_ids == ["0", "1"]
+
+
+def test_read_tweets_1(monkeypatch, tmp_path) -> None:
+    """A tweet found by two search terms is read for either, hot or archived."""
+    pytest.importorskip("pyarrow")
+    use_database(monkeypatch, tmp_path)
+    store_tweets([datetime.datetime(2022, 11, 2), datetime.datetime(2022, 11, 3),
+                  datetime.datetime(2022, 12, 2), datetime.datetime(2022, 12, 3)])
+    with database.database.session_scope() as session:
+        session.add(TweetSearchTerm("0", "Jio"))
+        session.add(TweetSearchTerm("2", "Jio"))
+
+    def read(search_term):
+        return [
+            tweet_id for chunk in database.database.read_tweets(search_term=search_term)
+            for tweet_id in chunk["tweet_id"]
+        ]
+
+    assert read("Jio") == ["0", "2"]
+    archive_month(datetime.datetime(2022, 11, 1), datetime.datetime(2022, 12, 1))
+    assert read("Jio") == ["0", "2"]
+    assert read("BSNL") == ["0", "1", "2", "3"]
+    assert read("Airtel") == []
@@ -0,0 +1,113 @@
+"""Tests for the sentiment inference backends."""
+
+import sys
+import threading
+import time
+import types
+
+import pandas as pd
+import pytest
+
+import analysis.backends
+
+from analysis.backends import TorchBackend, check_parity, get_backend
+from analysis.main import score_tweets
+
+
+class FakeClassifier():
+    """tweetnlp classifier returning fixed label probabilities."""
+
+    PROBABILITIES = {'negative': 0.1, 'neutral': 0.2, 'positive': 0.7}
+
+    def predict(self, text, batch_size=None, return_probability=False):
+        if return_probability:
+            return [{'label': 'positive', 'probability': dict(self.PROBABILITIES)} for _ in text]
+        return [{'label': 'positive'} for _ in text]
+
+
+class LegacyFakeClassifier():
+    """tweetnlp < 0.4 classifier, which always returns the label's probability."""
+
+    def predict(self, text, batch_size=None):
+        return [{'label': 'negative', 'probability': 0.6} for _ in text]
+
+
+def fake_tweetnlp(monkeypatch, classifier) -> None:
+    module = types.SimpleNamespace(load=lambda model: classifier)
+    monkeypatch.setitem(sys.modules, 'tweetnlp', module)
+
+
+def test_torch_backend_0(monkeypatch) -> None:
+    """Per-label probabilities are reduced to the predicted label's."""
+    fake_tweetnlp(monkeypatch, FakeClassifier())
+    backend = TorchBackend("sentiment_multilingual")
+    assert backend.predict(["good", "great"]) == [
+        {'label': 'positive', 'probability': 0.7},
+        {'label': 'positive', 'probability': 0.7},
+    ]
+    assert backend.predict([]) == []
+
+
+def test_torch_backend_1(monkeypatch) -> None:
+    """Older tweetnlp output scores tweets the same way."""
+    fake_tweetnlp(monkeypatch, LegacyFakeClassifier())
+    backend = TorchBackend("sentiment_multilingual")
+    tweets = pd.DataFrame({
+        'tweet_id': ['1', '2'],
+        'conversation_id': ['1', '1'],
+        'author_id': ['10', '11'],
+        'created_at': ['2022-11-01T10:00:00.000Z', '2022-11-01T11:00:00.000Z'],
+        'tweet_text': ["no signal", "still no signal"],
+        'possibly_sensitive': [False, False],
+        'retweet_count': [1, 0],
+        'reply_count': [0, 0],
+        'like_count': [0, 2],
+        'quote_count': [0, 0],
+        'lang': ['en', 'en'],
+        'source': [None, None],
+    })
+    scored = score_tweets(tweets, backend)
+    assert list(scored.sentiment) == [-1.0, -1.0]
+    assert list(scored.probability) == [0.6, 0.6]
+    assert list(scored.sentiment_score_1) == [-0.6, -0.6]
+
+
+def test_get_backend_0(monkeypatch) -> None:
+    """Concurrent callers share one backend and load the model once."""
+    loads = []
+
+    def load(model):
+        loads.append(model)
+        time.sleep(0.05)
+        return FakeClassifier()
+
+    monkeypatch.setitem(sys.modules, 'tweetnlp', types.SimpleNamespace(load=load))
+    monkeypatch.setattr(analysis.backends, '_backends', {})
+    backends = []
+    threads = [
+        threading.Thread(target=lambda: backends.append(get_backend('torch')))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == ["sentiment_multilingual"]
+    assert len({id(backend) for backend in backends}) == 1
+
+
+def test_onnx_parity_0() -> None:
+    """Quantized ONNX labels agree with the PyTorch path."""
+    pytest.importorskip("tweetnlp")
+    pytest.importorskip("onnxruntime")
+
+    tweets = [
+        "The new plan is great, the network has never been faster!",
+        "No signal for three days and customer care keeps hanging up.",
+        "Recharged my prepaid account today.",
+        "Servicio excelente, muy contento con la conexión.",
+        "Encore une panne, c'est inadmissible.",
+    ]
+    parity = check_parity(tweets)
+    assert parity['label_agreement'] >= 0.8
+    assert parity['mean_probability_delta'] < 0.1
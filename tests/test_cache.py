@@ -0,0 +1,40 @@
+"""Unit tests for the user profile cache."""
+
+import datetime
+
+from database.cache import UserCache, profile_hash
+from database.models import DataBaseModel
+
+from tests.test_models import PAGE, FakeResponse
+
+
+def test_profile_hash_0() -> None:
+    """Public metrics do not change the profile hash."""
+    user = dict(PAGE["includes"]["users"][0])
+    busier = dict(user, public_metrics={"followers_count": 99})
+    renamed = dict(user, name="Renamed")
+    assert profile_hash(user) == profile_hash(busier)
+    assert profile_hash(user) != profile_hash(renamed)
+
+
+def test_user_cache_0() -> None:
+    """Fresh, unchanged users are skipped by the normaliser."""
+    user = PAGE["includes"]["users"][0]
+    cache = UserCache(use_database=False)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cache.store({user["id"]: (profile_hash(user), now)})
+    model_ = DataBaseModel(FakeResponse(), cache)
+    assert model_.user_list == []
+    assert model_.user_hashtag_list == []
+    assert model_.cached_user_count == 1
+
+
+def test_user_cache_1() -> None:
+    """Expired entries are written again."""
+    user = PAGE["includes"]["users"][0]
+    cache = UserCache(ttl=60, use_database=False)
+    written = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=5)
+    cache.store({user["id"]: (profile_hash(user), written)})
+    model_ = DataBaseModel(FakeResponse(), cache)
+    assert len(model_.user_list) == 1
+    assert model_.user_list[0].profile_hash == profile_hash(user)
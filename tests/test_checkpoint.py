@@ -0,0 +1,63 @@
+"""Unit tests for resumable scrape checkpoints."""
+
+import types
+
+import scrape.twitter
+
+from scrape.checkpoint import ScrapeCheckpoints
+from scrape.twitter import Response
+
+
+def test_checkpoint_0() -> None:
+    """The token only moves past pages written in order."""
+    checkpoints = ScrapeCheckpoints(use_database=False)
+    assert checkpoints.start("BSNL") == (None, None)
+    checkpoints.fetched("BSNL", 0, {"newest_id": "30", "next_token": "t1", "result_count": 10})
+    checkpoints.fetched("BSNL", 1, {"next_token": "t2", "result_count": 10})
+    checkpoints.written("BSNL", 1)
+    assert checkpoints.checkpoints["BSNL"].next_token is None
+    checkpoints.written("BSNL", 0)
+    assert checkpoints.checkpoints["BSNL"].next_token == "t2"
+    assert checkpoints.checkpoints["BSNL"].pages == 2
+    checkpoints.finished("BSNL", complete=False, pages=2)
+    assert checkpoints.checkpoints["BSNL"].status == "interrupted"
+    assert checkpoints.start("BSNL") == ("t2", None)
+
+
+def test_checkpoint_1() -> None:
+    """A complete scrape keeps its newest tweet id as the next since_id."""
+    checkpoints = ScrapeCheckpoints(use_database=False)
+    checkpoints.start("BSNL")
+    checkpoints.fetched("BSNL", 0, {"newest_id": "30", "result_count": 3})
+    checkpoints.finished("BSNL", complete=True, pages=1)
+    assert checkpoints.checkpoints["BSNL"].status == "running"
+    checkpoints.written("BSNL", 0)
+    checkpoint = checkpoints.checkpoints["BSNL"]
+    assert (checkpoint.status, checkpoint.since_id, checkpoint.tweets) == ("complete", "30", 3)
+    assert checkpoints.start("BSNL") == (None, "30")
+
+
+def test_checkpoint_2() -> None:
+    """A scrape the API refused is marked failed and not resumed."""
+    checkpoints = ScrapeCheckpoints(use_database=False)
+    checkpoints.start("BSNL")
+    checkpoints.fetched("BSNL", 0, {"newest_id": "30", "next_token": "t1", "result_count": 10})
+    checkpoints.written("BSNL", 0)
+    checkpoints.finished("BSNL", complete=False, pages=1, failed=True)
+    assert checkpoints.checkpoints["BSNL"].status == "failed"
+    assert checkpoints.start("BSNL") == (None, None)
+
+
+def test_response_0(monkeypatch) -> None:
+    """A 401 is not retried and marks the response failed."""
+    requests_made = []
+
+    def get(url, headers=None, params=None):
+        requests_made.append(params)
+        return types.SimpleNamespace(status_code=401, headers={}, content=b"{}")
+
+    monkeypatch.setattr(scrape.twitter.requests, "get", get)
+    monkeypatch.setattr(scrape.twitter, "_bearer_token", "revoked")
+    response = Response("BSNL", next_token="t1", max_retries=3)
+    assert len(requests_made) == 1
+    assert response.failed and not response.complete
@@ -0,0 +1,97 @@
+"""Unit tests for database configuration and writes."""
+
+from sqlalchemy import event, insert, inspect, select
+from sqlalchemy.future import create_engine
+from sqlalchemy.orm import Session
+
+from database.database import add_missing_columns, engine_options, update_or_insert_users
+from database.models import Base, DataBaseModel, Tweet, TweetEntity_Mentions, User
+
+from tests.test_models import PAGE, FakeResponse
+
+
+def test_engine_options_0(monkeypatch) -> None:
+    """Pool settings are read from the environment."""
+    monkeypatch.setenv('DATABASE_POOL_SIZE', '10')
+    monkeypatch.setenv('DATABASE_MAX_OVERFLOW', '20')
+    monkeypatch.setenv('DATABASE_POOL_RECYCLE', '1800')
+    options = engine_options('postgresql://localhost/tweets')
+    assert options['pool_size'] == 10
+    assert options['max_overflow'] == 20
+    assert options['pool_recycle'] == 1800
+    assert 'connect_args' not in options
+
+
+def test_engine_options_1(monkeypatch) -> None:
+    """In-memory SQLite keeps its single-connection pool."""
+    monkeypatch.setenv('DATABASE_POOL_SIZE', '10')
+    options = engine_options('sqlite://')
+    assert 'pool_size' not in options
+    assert options['connect_args'] == {'check_same_thread': False}
+
+
+def test_add_missing_columns_0() -> None:
+    """Columns added to a model are added to an existing table."""
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE users (id_ INTEGER PRIMARY KEY, user_id TEXT UNIQUE, username TEXT)"
+        )
+        connection.exec_driver_sql("INSERT INTO users (user_id, username) VALUES ('1', 'bsnl')")
+    add_missing_columns(engine)
+    add_missing_columns(engine)
+    columns = {column['name'] for column in inspect(engine).get_columns('users')}
+    assert {'profile_hash', 'updated_at', 'verified'} <= columns
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql(
+            "SELECT username, profile_hash FROM users"
+        ).all() == [('bsnl', None)]
+
+
+def test_update_or_insert_users_0() -> None:
+    """Users referenced by tweets are updated in place."""
+    engine = create_engine('sqlite://')
+
+    @event.listens_for(engine, 'connect')
+    def enforce_foreign_keys(dbapi_connection, _) -> None:
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    Base.metadata.create_all(engine)
+    user = PAGE["includes"]["users"][0]
+    model_ = DataBaseModel(FakeResponse())
+    rows = [row for row in model_.user_list if row.user_id == user["id"]]
+    tweets = [row for row in model_.tweet_object_list if row.author_id == user["id"]]
+    with Session(engine) as session:
+        update_or_insert_users(session, [row._asdict() for row in rows])
+        session.execute(insert(Tweet.__table__), [row._asdict() for row in tweets])
+        renamed = rows[0]._replace(display_name="Renamed")
+        update_or_insert_users(session, [renamed._asdict()])
+        session.commit()
+        assert session.execute(
+            select(User.display_name).where(User.user_id == user["id"])
+        ).all() == [("Renamed",)]
+
+
+def test_mentions_0() -> None:
+    """Mentions of accounts that are not stored users satisfy foreign keys."""
+    engine = create_engine('sqlite://')
+
+    @event.listens_for(engine, 'connect')
+    def enforce_foreign_keys(dbapi_connection, _) -> None:
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    Base.metadata.create_all(engine)
+    model_ = DataBaseModel(FakeResponse())
+    assert model_.te_mention_list
+    stored_users = {row.user_id for row in model_.user_list} | {row.username for row in model_.user_list}
+    assert any(row.mentioned_username not in stored_users for row in model_.te_mention_list)
+    with Session(engine) as session:
+        update_or_insert_users(session, [row._asdict() for row in model_.user_list])
+        session.execute(insert(Tweet.__table__), [row._asdict() for row in model_.tweet_object_list])
+        session.execute(
+            insert(TweetEntity_Mentions.__table__), [row._asdict() for row in model_.te_mention_list]
+        )
+        session.commit()
+        assert session.execute(select(TweetEntity_Mentions.mentioned_username)).scalars().all() == [
+            row.mentioned_username for row in model_.te_mention_list
+        ]
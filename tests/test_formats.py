@@ -0,0 +1,41 @@
+"""Unit tests for response content negotiation."""
+
+import gzip
+import json
+
+from api.formats import JSON_MEDIA_TYPE, accepted_encodings, columnar_response, compress, zstandard
+
+
+def test_json_response_0() -> None:
+    """Tables are serialised column-wise without compression by default."""
+    response_ = columnar_response({'tweets': {'tweet_id': ['1', '2']}})
+    assert response_.media_type == JSON_MEDIA_TYPE
+    assert json.loads(response_.body) == {'tweets': {'tweet_id': ['1', '2']}}
+    assert 'content-encoding' not in response_.headers
+
+
+def test_compress_0() -> None:
+    """Large bodies are gzipped when the client accepts gzip."""
+    body = b'{"tweet_id": []}' * 100
+    compressed, encoding = compress(body, 'gzip, deflate')
+    assert encoding == 'gzip'
+    assert gzip.decompress(compressed) == body
+
+
+def test_compress_1() -> None:
+    """Small bodies and unsupported encodings are sent as is."""
+    assert compress(b'{}', 'gzip') == (b'{}', None)
+    assert compress(b'{}' * 1000, 'br') == (b'{}' * 1000, None)
+
+
+def test_compress_2() -> None:
+    """Codings are chosen by q-value and q=0 refuses one."""
+    body = b'{"tweet_id": ["1"]}' * 100
+    assert accepted_encodings('gzip;q=0.5, zstd;q=0, br') == {'gzip': 0.5, 'zstd': 0.0, 'br': 1.0}
+    assert compress(body, 'zstd;q=0, gzip;q=0.5')[1] == 'gzip'
+    assert compress(body, 'gzip;q=0') == (body, None)
+    assert compress(body, '*;q=0') == (body, None)
+    assert compress(body, '*')[1] in ('zstd', 'gzip')
+    if zstandard is not None:
+        assert compress(body, 'gzip;q=1, zstd;q=0.8')[1] == 'gzip'
+        assert compress(body, 'gzip;q=0.8, zstd')[1] == 'zstd'
@@ -0,0 +1,36 @@
+"""Unit tests for the load-test harness."""
+
+import pytest
+
+from database.models import DataBaseModel
+from loadtest.main import parse_mix, percentile, summarise
+from loadtest.stubs import StubBackend, fake_page
+
+
+def test_parse_mix_0() -> None:
+    """Weights default to one and unknown request kinds are rejected."""
+    assert parse_mix("search=3,sentiment") == {"search": 3.0, "sentiment": 1.0}
+    with pytest.raises(ValueError):
+        parse_mix("tweet=1")
+
+
+def test_summarise_0() -> None:
+    """Percentiles use the nearest rank and non-2xx responses are errors."""
+    samples = [("search", 200, i / 1000) for i in range(1, 101)] + [("search", 500, 0.5)]
+    summary = summarise(samples, elapsed=2.0)
+    assert summary["requests"] == 101
+    assert summary["errors"] == 1
+    assert summary["latency_ms"]["p50"] == pytest.approx(51.0)
+    assert summary["latency_ms"]["max"] == pytest.approx(500.0)
+    assert percentile([], 99) is None
+
+
+def test_stubs_0() -> None:
+    """Stand-in pages normalise like real ones and get scored."""
+    page = fake_page("BSNL", 0, size=5, pages=2)
+    model_ = DataBaseModel([])
+    model_.add_page(page["data"], [page["includes"]], "BSNL")
+    assert len(model_.tweet_object_list) == 5
+    assert page["meta"]["next_token"] == "1"
+    predictions = StubBackend().predict([t.tweet_text for t in model_.tweet_object_list])
+    assert {p["label"] for p in predictions} <= {"negative", "neutral", "positive"}
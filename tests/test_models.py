@@ -0,0 +1,118 @@
+"""Unit tests for response normalisation."""
+
+from database.models import DataBaseModel
+from database.rows import TweetRow, UserRow
+
+
+PAGE = {
+    "data": [
+        {
+            "id": "1600000000000000001",
+            "author_id": "11",
+            "created_at": "2022-12-06T14:05:10.000Z",
+            "reply_settings": "everyone",
+            "text": "@bsnl_care no signal again #outage",
+            "conversation_id": "1600000000000000000",
+            "possibly_sensitive": False,
+            "public_metrics": {
+                "retweet_count": 1,
+                "reply_count": 2,
+                "like_count": 3,
+                "quote_count": 0
+            },
+            "lang": "en",
+            "referenced_tweets": [
+                {"type": "replied_to", "id": "1600000000000000000"}
+            ],
+            "entities": {
+                "mentions": [{"username": "bsnl_care", "id": "12"}],
+                "hashtags": [{"tag": "outage"}],
+                "annotations": [
+                    {"normalized_text": "BSNL", "type": "Organization", "probability": 0.9}
+                ]
+            }
+        }
+    ],
+    "includes": {
+        "users": [
+            {
+                "id": "11",
+                "name": "Customer",
+                "username": "customer",
+                "created_at": "2015-01-01T00:00:00.000Z",
+                "public_metrics": {
+                    "followers_count": 10,
+                    "following_count": 20,
+                    "tweet_count": 30,
+                    "listed_count": 0
+                },
+                "entities": {"description": {"hashtags": [{"tag": "telecom"}]}}
+            }
+        ]
+    }
+}
+
+
+class FakeResponse():
+    """Response stand-in holding one page."""
+
+    def get_raw_data_list(self):
+        return PAGE["data"]
+
+    def get_raw_includes_list(self):
+        return [PAGE["includes"]]
+
+    def get_search_term(self):
+        return "BSNL"
+
+
+def test_process_tweet_data_0() -> None:
+    """Tweets and their entities become tuple rows."""
+    model_ = DataBaseModel(FakeResponse())
+    tweet = model_.tweet_object_list[0]
+    assert isinstance(tweet, TweetRow)
+    assert tweet.tweet_id == "1600000000000000001"
+    assert tweet.like_count == 3
+    assert tweet.search_term == "BSNL"
+    assert model_.referenced_tweet_list[0].referencing_type == "replied_to"
+    assert model_.te_mention_list[0].mentioned_user_id == "12"
+    assert model_.te_hashtags_list[0].hashtag == "outage"
+    assert model_.te_annotations_list[0].annotation_type == "Organization"
+
+
+def test_process_includes_data_0() -> None:
+    """Users and their description entities become tuple rows."""
+    model_ = DataBaseModel(FakeResponse())
+    assert isinstance(model_.user_list[0], UserRow)
+    assert model_.user_list[0].followers == 10
+    assert model_.user_hashtag_list[0].hashtag == "telecom"
+
+
+class OtherTermResponse(FakeResponse):
+    """The same page returned for a second search term."""
+
+    def get_search_term(self):
+        return "BSNL outage"
+
+
+def test_multiple_responses_0() -> None:
+    """Shared tweets and users are emitted once, with every matching term."""
+    model_ = DataBaseModel([FakeResponse(), OtherTermResponse()])
+    assert len(model_.tweet_object_list) == 1
+    assert len(model_.user_list) == 1
+    assert len(model_.user_hashtag_list) == 1
+    assert len(model_.referenced_tweet_list) == 1
+    assert [row.search_term for row in model_.tweet_search_term_list] == ["BSNL", "BSNL outage"]
+
+
+def test_merge_0() -> None:
+    """Merging page models matches normalising the pages together."""
+    merged = DataBaseModel([])
+    merged.merge(DataBaseModel(FakeResponse()))
+    merged.merge(DataBaseModel(OtherTermResponse()))
+    together = DataBaseModel([FakeResponse(), OtherTermResponse()])
+    for merged_rows, rows in zip(merged.get_tables(), together.get_tables()):
+        if merged_rows and isinstance(merged_rows[0], UserRow):
+            merged_rows = [row._replace(updated_at=None) for row in merged_rows]
+            rows = [row._replace(updated_at=None) for row in rows]
+        assert merged_rows == rows
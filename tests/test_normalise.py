@@ -0,0 +1,32 @@
+"""Unit tests for the threaded page normaliser."""
+
+import pytest
+
+import scrape.main
+
+from scrape.normalise import PageNormaliser
+
+from tests.test_models import PAGE
+
+
+def test_page_normaliser_0(monkeypatch) -> None:
+    """Workers are shut down when fetching a search term fails."""
+    normalisers = []
+
+    class RecordedNormaliser(PageNormaliser):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            normalisers.append(self)
+
+    def failing_response(search_term, on_page=None, **_):
+        on_page(PAGE)
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(scrape.main, "PageNormaliser", RecordedNormaliser)
+    monkeypatch.setattr(scrape.main, "Response", failing_response)
+    with pytest.raises(RuntimeError):
+        scrape.main.collect(["BSNL", "Jio"])
+    with pytest.raises(RuntimeError):
+        scrape.main.scrape("BSNL")
+    assert len(normalisers) == 2
+    assert all(normaliser.executor._shutdown for normaliser in normalisers)
@@ -0,0 +1,99 @@
+"""Unit tests for the pipelined scrape runner."""
+
+import copy
+import time
+
+import scrape.pipeline
+
+from database.rows import TweetRow, TweetSearchTermRow, UserRow
+from scrape.pipeline import Pipeline
+
+from tests.test_models import PAGE
+
+
+class FakeResponse():
+    """Response stand-in handing two pages per term to ``on_page``."""
+
+    def __init__(self, search_term, on_page=None, next_token=None, since_id=None):
+        for tweet_id in ("shared", search_term + "-1"):
+            page = copy.deepcopy(PAGE)
+            page["data"][0]["id"] = tweet_id
+            on_page(page)
+        self.pages = 2
+        self.complete = True
+
+
+class FakeDatabase():
+    """Database stand-in recording the committed tables."""
+
+    committed = []
+
+    def __init__(self, objects):
+        self.objects = objects
+
+    def commit_data(self):
+        FakeDatabase.committed.append(self.objects)
+
+
+def test_pipeline_0(monkeypatch) -> None:
+    """Every page flows through and tweets seen twice are stored once."""
+    monkeypatch.setattr(scrape.pipeline, "Response", FakeResponse)
+    monkeypatch.setattr(scrape.pipeline, "Database", FakeDatabase)
+    FakeDatabase.committed = []
+    stats = Pipeline(
+        ["a", "b", "c"], score=False, queue_size=1, resume=False, user_cache=None
+    ).run()
+    tweet_ids = [
+        row.tweet_id for tables in FakeDatabase.committed for row in tables[1]
+    ]
+    assert stats["pages"] == 6
+    assert sorted(tweet_ids) == ["a-1", "b-1", "c-1", "shared"]
+    assert stats["tweets"] == 4
+
+
+def test_pipeline_1(monkeypatch) -> None:
+    """Each stored batch carries the users its tweets reference."""
+    monkeypatch.setattr(scrape.pipeline, "Response", FakeResponse)
+    monkeypatch.setattr(scrape.pipeline, "Database", FakeDatabase)
+    FakeDatabase.committed = []
+    Pipeline(
+        ["a", "b", "c"], score=False, normalise_workers=2, store_workers=2,
+        resume=False, user_cache=None
+    ).run()
+    for tables in FakeDatabase.committed:
+        rows = [row for rows in tables for row in rows]
+        authors = {row.author_id for row in rows if isinstance(row, TweetRow)}
+        users = {row.user_id for row in rows if isinstance(row, UserRow)}
+        assert authors <= users
+
+
+def test_pipeline_2(monkeypatch) -> None:
+    """Search term matches are stored with or after their tweet."""
+
+    class SlowDatabase(FakeDatabase):
+        """Lets the other pages overtake the page that claimed "shared"."""
+
+        def commit_data(self):
+            if any(isinstance(row, TweetRow) and row.tweet_id == "shared"
+                   for rows in self.objects for row in rows):
+                time.sleep(0.2)
+            super().commit_data()
+
+    monkeypatch.setattr(scrape.pipeline, "Response", FakeResponse)
+    monkeypatch.setattr(scrape.pipeline, "Database", SlowDatabase)
+    FakeDatabase.committed = []
+    Pipeline(
+        ["a", "b", "c"], score=False, fetch_workers=1, store_workers=2,
+        resume=False, user_cache=None
+    ).run()
+    stored = set()
+    matches = []
+    for tables in FakeDatabase.committed:
+        rows = [row for rows in tables for row in rows]
+        stored |= {row.tweet_id for row in rows if isinstance(row, TweetRow)}
+        batch = [(row.tweet_id, row.search_term) for row in rows if isinstance(row, TweetSearchTermRow)]
+        assert {tweet_id for tweet_id, _ in batch} <= stored
+        matches += batch
+    assert sorted(matches) == sorted(
+        [("shared", term) for term in "abc"] + [(term + "-1", term) for term in "abc"]
+    )
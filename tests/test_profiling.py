@@ -0,0 +1,52 @@
+"""Unit tests for the opt-in profiling hooks."""
+
+import contextvars
+import json
+import os
+import threading
+
+from profiling.main import current_run, profile_run, profiled
+
+
+@profiled("build")
+def build(size: int) -> list:
+    return [str(i) for i in range(size)]
+
+
+def test_profiling_0() -> None:
+    """Marked functions run unprofiled outside a profile run."""
+    assert current_run() is None
+    assert build(3) == ["0", "1", "2"]
+
+
+def test_profiling_1(tmp_path) -> None:
+    """A run writes a cProfile dump per section, a snapshot and a summary."""
+    with profile_run(run_id="run", label="test", output_dir=str(tmp_path)) as run:
+        build(1000)
+        build(10)
+    directory = tmp_path / "run"
+    assert run.directory == str(directory)
+    assert {"build.prof", "build.txt", "run.tracemalloc", "summary.json"} <= set(os.listdir(directory))
+    summary = json.loads((directory / "summary.json").read_text())
+    assert summary["label"] == "test"
+    assert summary["sections"]["build"]["calls"] == 2
+    assert summary["sections"]["build"]["profiled_calls"] == 2
+    assert summary["sections"]["build"]["max_allocated_bytes"] > 0
+    assert summary["top_allocations"]
+    assert current_run() is None
+
+
+def test_profiling_2(tmp_path) -> None:
+    """Worker threads started with a copy of the context join the run."""
+    with profile_run(run_id="threads", output_dir=str(tmp_path), memory=False):
+        threads = [
+            threading.Thread(target=contextvars.copy_context().run, args=(build, 100))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    summary = json.loads((tmp_path / "threads" / "summary.json").read_text())
+    assert summary["sections"]["build"]["calls"] == 3
+    assert "run.tracemalloc" not in os.listdir(tmp_path / "threads")
@@ -0,0 +1,90 @@
+"""Unit tests for the full-text tweet search."""
+
+import datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, text
+from sqlalchemy.future import create_engine
+
+from app import app
+from database.models import Base, Tweet, TweetSearchTerm
+from database.rows import TweetRow, TweetSearchTermRow
+from database.search import (
+    create_search_index,
+    fts5_query,
+    rebuild_search_index,
+    search_statement,
+)
+
+
+def tweet(tweet_id: str, text: str, lang: str = "en") -> TweetRow:
+    return TweetRow(
+        tweet_id, "11", datetime.datetime(2022, 12, 6), "everyone", text,
+        tweet_id, False, 0, 0, 0, 0, lang, None, "BSNL"
+    )
+
+
+def test_fts5_query_0() -> None:
+    """User input is quoted word by word and prefix stars are kept."""
+    assert fts5_query('no "signal" outa*') == '"no" """signal""" "outa"*'
+    assert fts5_query("AND ( *") == '"AND" "("'
+
+
+def test_search_statement_0() -> None:
+    """Tweets inserted after the index exists are found, ranked and filtered."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    create_search_index(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Tweet), [
+            tweet("1", "outage outage in Kochi")._asdict(),
+            tweet("2", "no outage today")._asdict(),
+            tweet("3", "signal is fine", lang="ml")._asdict(),
+        ])
+        connection.execute(insert(TweetSearchTerm), [
+            TweetSearchTermRow("1", "BSNL")._asdict(),
+            TweetSearchTermRow("2", "Jio")._asdict(),
+        ])
+    with engine.connect() as connection:
+        ranked = connection.execute(search_statement("sqlite", "outage", ["tweet_id"])).all()
+        assert [row.tweet_id for row in ranked] == ["1", "2"]
+        assert ranked[0].rank > ranked[1].rank
+        by_term = connection.execute(
+            search_statement("sqlite", "outage", ["tweet_id"], search_term="Jio")
+        ).all()
+        assert [row.tweet_id for row in by_term] == ["2"]
+        by_lang = connection.execute(
+            search_statement("sqlite", "sig*", ["tweet_id"], lang="ml")
+        ).all()
+        assert [row.tweet_id for row in by_lang] == ["3"]
+
+
+def test_search_tweets_0(tmp_path, monkeypatch) -> None:
+    """Queries with no words return an empty page instead of failing."""
+    import database.database
+
+    monkeypatch.setenv("DATABASE_URI", f"sqlite:///{tmp_path / 'tweets.db'}")
+    monkeypatch.setattr(database.database, "_engine", None)
+    with TestClient(app) as client:
+        for query in ["*", "   ", "** *"]:
+            response = client.get("/search", params={"q": query})
+            assert response.status_code == 200
+            assert response.json()["tweets"]["tweet_id"] == []
+
+
+def test_rebuild_search_index_0() -> None:
+    """A rebuild re-keys the index to renumbered rowids."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    create_search_index(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Tweet), [tweet("1", "outage in Kochi")._asdict()])
+        # What VACUUM may do to a table without an INTEGER PRIMARY KEY.
+        connection.execute(text("UPDATE tweet_table SET rowid = rowid + 100"))
+    with engine.connect() as connection:
+        assert connection.execute(search_statement("sqlite", "outage", ["tweet_id"])).all() == []
+    with engine.begin() as connection:
+        rebuild_search_index(connection)
+    with engine.connect() as connection:
+        found = connection.execute(search_statement("sqlite", "outage", ["tweet_id"])).all()
+        assert [row.tweet_id for row in found] == ["1"]
@@ -0,0 +1,23 @@
+"""Unit tests for lazy application start-up."""
+
+import os
+import subprocess
+import sys
+
+
+def test_import_app_0() -> None:
+    """Importing the app loads no model, dataframe or database machinery."""
+    script = (
+        "import sys, app; "
+        "import database.database as db; "
+        "heavy = [m for m in ('pandas', 'tweetnlp', 'torch') if m in sys.modules]; "
+        "assert not heavy, heavy; "
+        "assert db._engine is None"
+    )
+    env = dict(os.environ)
+    env.pop('DATABASE_URI', None)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=root, env=env, capture_output=True
+    )
+    assert result.returncode == 0, result.stderr.decode()
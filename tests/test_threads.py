@@ -0,0 +1,52 @@
+"""Unit tests for the conversation thread index."""
+
+from sqlalchemy import insert
+
+from database.models import ConversationIndex, DataBaseModel, thread_edge
+from database.threads import ThreadIndex
+
+from tests.test_models import FakeResponse
+
+
+def test_thread_edge_0() -> None:
+    """Replies roll up to the conversation, retweets and quotes to their target."""
+    reply = thread_edge("3", "1", {"replied_to": "2"})
+    retweet = thread_edge("4", "4", {"retweeted": "2"})
+    quote = thread_edge("5", "5", {"quoted": "2"})
+    original = thread_edge("1", "1", {})
+    assert (reply.parent_tweet_id, reply.root_tweet_id) == ("2", "1")
+    assert (retweet.parent_tweet_id, retweet.root_tweet_id) == ("2", "2")
+    assert (quote.parent_tweet_id, quote.root_tweet_id) == ("2", "2")
+    assert (original.parent_tweet_id, original.root_tweet_id) == (None, "1")
+
+
+def test_thread_index_0(tmp_path, monkeypatch) -> None:
+    """Edges committed at ingest answer conversation, root and reply lookups."""
+    import database.database
+
+    monkeypatch.setenv('DATABASE_URI', f"sqlite:///{tmp_path / 'tweets.db'}")
+    monkeypatch.setattr(database.database, '_engine', None)
+    database.database.Database(DataBaseModel(FakeResponse()).get_tables()).commit_data()
+    index = ThreadIndex()
+    assert index.conversation(["1600000000000000000"]) == {"1600000000000000001"}
+    assert index.thread(["1600000000000000000"]) == {"1600000000000000001"}
+    assert index.replies("1600000000000000000") == {"1600000000000000001"}
+    assert index.thread([]) == set()
+
+
+def test_thread_index_1(tmp_path, monkeypatch) -> None:
+    """A database-backed index sees edges committed after its first lookup."""
+    import database.database
+
+    monkeypatch.setenv('DATABASE_URI', f"sqlite:///{tmp_path / 'tweets.db'}")
+    monkeypatch.setattr(database.database, '_engine', None)
+    edges = DataBaseModel(FakeResponse()).thread_edge_list
+    index = ThreadIndex()
+    assert index.conversation(["1600000000000000000"]) == set()
+    with database.database.session_scope() as session:
+        session.execute(
+            insert(ConversationIndex.__table__), [edge._asdict() for edge in edges]
+        )
+    assert index.conversation(["1600000000000000000"]) == {"1600000000000000001"}
+    assert index.replies("1600000000000000000") == {"1600000000000000001"}
+    assert set(index.edges(["1600000000000000001", "missing"])) == {"1600000000000000001"}
@@ -0,0 +1,139 @@
+"""Unit tests for the streaming trend counters."""
+
+import datetime
+
+from database.models import DataBaseModel
+from database.trending import CountMinSketch, SpaceSaving, TrendCounters
+
+from tests.test_models import FakeResponse
+
+
+def test_space_saving_0() -> None:
+    """Heavy hitters survive evictions and their error bounds the over-count."""
+    summary = SpaceSaving(capacity=3)
+    for item in ["a"] * 10 + ["b"] * 6 + ["c", "d", "e", "f"]:
+        summary.add(item)
+    top = summary.top(2)
+    assert [item for item, _, _ in top] == ["a", "b"]
+    for item, count, error in top:
+        assert count - error <= {"a": 10, "b": 6}[item] <= count
+
+
+def test_trend_counters_0() -> None:
+    """Committed tables are counted per search term and time window."""
+    counters = TrendCounters(window_seconds=3600, use_database=False)
+    counters.add_tables(DataBaseModel(FakeResponse()).get_tables())
+    top = counters.top("BSNL", "hashtag")
+    assert top and all(count > 0 for _, count, _ in top)
+    item = top[0][0]
+    assert counters.estimate("BSNL", "hashtag", item) >= top[0][1]
+    later = datetime.datetime(2100, 1, 1)
+    assert counters.top("BSNL", "hashtag", start=later) == []
+    assert counters.top("other", "hashtag") == []
+
+
+def test_trend_state_0() -> None:
+    """Summaries and sketches load back with the same answers."""
+    summary = SpaceSaving(capacity=2)
+    sketch = CountMinSketch(width=64)
+    for item in ["a", "a", "b", "c"]:
+        summary.add(item)
+        sketch.add(item)
+    loaded = SpaceSaving.loads(summary.dumps(), capacity=2)
+    assert loaded.top(2) == summary.top(2)
+    loaded.add("d")
+    assert len(loaded.counts) == 2
+    assert CountMinSketch.loads(sketch.dumps(), width=64).estimate("a") == sketch.estimate("a") >= 2
+
+
+def test_trend_counters_1() -> None:
+    """Only the most recently updated search terms are tracked."""
+    counters = TrendCounters(max_terms=1, use_database=False)
+    tables = DataBaseModel(FakeResponse()).get_tables()
+    counters.add_tables(tables)
+    other = [
+        [row._replace(search_term="Jio") for row in rows] if rows and hasattr(rows[0], "search_term") else rows
+        for rows in tables
+    ]
+    counters.add_tables(other)
+    assert counters.top("BSNL", "hashtag") == []
+    assert counters.top("Jio", "hashtag")
+
+
+def test_trend_counters_2(tmp_path, monkeypatch) -> None:
+    """Stored counters survive a restart and are rebuilt for older databases."""
+    import database.database
+    from database.database import Database, get_engine, session_scope
+    from database.models import TrendWindow
+    from database.trending import rebuild_trends
+
+    monkeypatch.setenv("DATABASE_URI", f"sqlite:///{tmp_path / 'tweets.db'}")
+    monkeypatch.setattr(database.database, "_engine", None)
+    Database(DataBaseModel(FakeResponse()).get_tables()).commit_data()
+    top = TrendCounters().top("BSNL", "hashtag")
+    assert top and all(count > 0 for _, count, _ in top)
+
+    with session_scope() as session:
+        session.query(TrendWindow).delete()
+    assert TrendCounters().top("BSNL", "hashtag") == []
+    assert rebuild_trends(get_engine())
+    assert not rebuild_trends(get_engine())
+    assert TrendCounters().top("BSNL", "hashtag") == top
+
+
+def test_trend_counters_3(tmp_path, monkeypatch) -> None:
+    """Concurrent commits creating the same windows all count, and the
+    stored counters keep only the most recently updated search terms."""
+    import threading
+
+    import database.database
+    from database.database import session_scope
+
+    monkeypatch.setenv("DATABASE_URI", f"sqlite:///{tmp_path / 'tweets.db'}")
+    monkeypatch.setattr(database.database, "_engine", None)
+    tables = DataBaseModel(FakeResponse()).get_tables()
+    batches = [
+        [
+            [row._replace(created_at=row.created_at + datetime.timedelta(hours=hour))
+             if hasattr(row, "created_at") else row for row in rows]
+            for rows in tables
+        ]
+        for hour in range(5)
+    ]
+    workers = 4
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def commit() -> None:
+        counters = TrendCounters(window_seconds=3600)
+        try:
+            for batch in batches:
+                barrier.wait()
+                with session_scope() as session:
+                    counters.add_tables(batch, session)
+        except Exception as error:
+            errors.append(error)
+            barrier.abort()
+
+    threads = [threading.Thread(target=commit) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    single = TrendCounters(window_seconds=3600, use_database=False)
+    for batch in batches:
+        single.add_tables(batch)
+    expected = single.top("BSNL", "hashtag")
+    assert TrendCounters(window_seconds=3600).top("BSNL", "hashtag") == [
+        (item, count * workers, error) for item, count, error in expected
+    ]
+
+    counters = TrendCounters(window_seconds=3600, max_terms=1)
+    other = [
+        [row._replace(search_term="Jio") for row in rows] if rows and hasattr(rows[0], "search_term") else rows
+        for rows in tables
+    ]
+    counters.add_tables(other)
+    assert counters.top("BSNL", "hashtag") == []
+    assert counters.top("Jio", "hashtag")